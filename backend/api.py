@@ -1,44 +1,35 @@
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, WebSocket, WebSocketDisconnect, Request, Response
 from pydantic import BaseModel
 from typing import List, Dict, Optional, Set
 import os
 import asyncio
 import json
+import logging
 import time
+from datetime import datetime, timezone
 
 # Import core utilities
-from auth import get_gmail_service
-from gmail_utils import fetch_recent_emails
-from summarizer import summarize_email, format_summary
+from gmail_service import refresh_credentials_periodically, snapshot as gmail_credentials_snapshot
+from gmail_utils import fetch_recent_emails, fetch_emails_metadata, list_message_ids_page
+from summarization_backends import get_backend
+from storage_manager import get_storage_manager, build_summary_record
+from email_classifier import EmailClassifier
+from event_extractor import EventExtractor, events_to_dicts
+from poll_scheduler import PollScheduler
+from http_caching import make_etag, not_modified
+from events_store import EventStore, parse_range, EVENTS_DEFAULT_DAYS_AHEAD
+from search_index import SearchIndex, SEARCH_MAX_PAGE_SIZE
+from reminder_scheduler import Reminder, ReminderScheduler
+from notification_dispatcher import NotificationDispatcher, get_transport, KIND_EMAIL, KIND_EVENT
 
 # Handle optional imports - if these fail, provide stub implementations
 try:
-    from email_classifier import classify_email, sort_emails_by_importance, enrich_email_with_classification
-except ImportError:
-    # Provide stub implementations of these functions
-    def classify_email(email_data): return {"category": "unknown", "importance": 2}
-    def sort_emails_by_importance(emails): return emails
-    def enrich_email_with_classification(email): 
-        email["category"] = "unknown"
-        email["importance"] = 2
-        return email
-
-try:
-    from event_extractor import extract_events_from_email, get_upcoming_events, get_todays_events, get_tomorrows_events
-except ImportError:
-    # Provide stub implementations
-    def extract_events_from_email(email): return []
-    def get_upcoming_events(events): return []
-    def get_todays_events(events): return []
-    def get_tomorrows_events(events): return []
-
-try:
-    from notifier import send_push_notification, send_event_notification, notify_important_email
+    from notifier import send_push_notification
 except ImportError:
     # Provide stub implementations
     def send_push_notification(*args, **kwargs): return {"success": False, "error": "Notification module not available"}
-    def send_event_notification(*args, **kwargs): return {"success": False, "error": "Notification module not available"}
-    def notify_important_email(*args, **kwargs): return {"success": False, "error": "Notification module not available"}
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Email Notifier API")
 
@@ -59,6 +50,9 @@ class EmailResponse(BaseModel):
     icon: Optional[str] = None
 
 class EventResponse(BaseModel):
+    id: Optional[str] = None
+    email_id: Optional[str] = None
+    date: Optional[str] = None
     event_type: str
     description: str
     date_str: Optional[str] = None
@@ -100,6 +94,9 @@ class ConnectionManager:
         await self.broadcast(json_data)
 
 manager = ConnectionManager()
+poll_scheduler = PollScheduler()
+reminder_scheduler = ReminderScheduler()
+notification_dispatcher = NotificationDispatcher(get_transport())
 
 # Routes
 @app.get("/")
@@ -112,141 +109,142 @@ async def register_device(registration: DeviceRegistration):
     device_tokens.add(registration.device_token)
     return {"status": "success", "message": "Device registered successfully"}
 
+# --- Read-Through Summary Cache --- #
+# Summaries persisted by main.py (or by an earlier request here) are served from
+# storage; only emails missing from storage are fetched and summarized, in one batch.
+storage_manager = get_storage_manager()
+classifier = EmailClassifier()
+event_extractor = EventExtractor()
+event_store = EventStore()
+search_index = SearchIndex()
+
+async def get_recent_summaries_read_through(max_results: int, only_unread: bool = True) -> List[Dict]:
+    """Summaries for the most recent inbox emails, newest first, summarizing only storage misses."""
+    # Gmail and storage calls block, so they run on worker threads and the event loop keeps serving
+    message_ids, _ = await asyncio.to_thread(
+        list_message_ids_page, page_size=max_results, query='is:unread' if only_unread else '', label_ids=['INBOX']
+    )
+    summaries = await asyncio.to_thread(storage_manager.get_summaries, message_ids)
+    missing = await asyncio.to_thread(
+        fetch_emails_metadata, [message_id for message_id in message_ids if message_id not in summaries]
+    )
+    if missing:
+        # Metadata only carries the snippet, which is what gets summarized here
+        generated = await get_backend().summarize_batch(
+            [(email['subject'], email['sender'], email['snippet'], email['snippet']) for email in missing]
+        )
+        records = {}
+        for email, summary in zip(missing, generated):
+            snippet_email = {**email, 'body': email['snippet']}
+            enriched = classifier.enrich_email_with_classification(snippet_email)
+            events = events_to_dicts(event_extractor.extract_events(snippet_email))
+            records[email['id']] = build_summary_record(email['id'], email, summary, enriched, events)
+        await asyncio.to_thread(storage_manager.store_summaries, records)
+        await asyncio.to_thread(event_store.index_records, records.values())
+        await asyncio.to_thread(search_index.index_records, records.values())
+        summaries.update(records)
+    return [summaries[message_id] for message_id in message_ids if message_id in summaries]
+
+def _last_modified(records: List[Dict]) -> Optional[datetime]:
+    """Latest processed_at among records (naive timestamps are local time)."""
+    latest = None
+    for record in records:
+        try:
+            processed_at = datetime.fromisoformat(str(record.get('processed_at'))).astimezone(timezone.utc)
+        except ValueError:
+            continue
+        latest = processed_at if latest is None or processed_at > latest else latest
+    return latest
+
+def conditional_response(request: Request, response: Response, records: List[Dict]) -> Optional[Response]:
+    """Set ETag/Last-Modified on response; return a 304 response if the client's copy is current."""
+    etag = make_etag(json.dumps(records, sort_keys=True, default=str))
+    return not_modified(request, response, etag, _last_modified(records))
+
+def _email_response(record: Dict) -> EmailResponse:
+    return EmailResponse(
+        id=record['id'],
+        subject=record.get('subject'),
+        sender=record.get('sender'),
+        snippet=record.get('snippet'),
+        summary=record.get('summary'),
+        category=record.get('category'),
+        importance=record.get('importance'),
+        icon=record.get('icon')
+    )
+
 @app.get("/emails", response_model=List[EmailResponse])
-async def get_emails(max_results: int = 10):
+async def get_emails(request: Request, response: Response, max_results: int = 10):
     """Get recent emails with classification and summaries"""
     try:
-        emails = fetch_recent_emails(max_results=max_results)
-        
-        result = []
-        for email in emails:
-            # Generate summary
-            summary = summarize_email(email['subject'], email['from'], email['snippet'], email['snippet'])
-            
-            # Classify and enrich email
-            enriched = enrich_email_with_classification(email)
-            enriched['summary'] = summary
-            
-            # Convert to response format
-            response = EmailResponse(
-                id=email['id'],
-                subject=email['subject'],
-                sender=email['from'],
-                snippet=email['snippet'],
-                summary=summary,
-                category=enriched.get('category'),
-                importance=enriched.get('importance'),
-                icon=enriched.get('icon')
-            )
-            result.append(response)
-            
-        return result
+        records = await get_recent_summaries_read_through(max_results)
+        cached = conditional_response(request, response, records)
+        if cached:
+            return cached
+        return [_email_response(record) for record in records]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/emails/important", response_model=List[EmailResponse])
-async def get_important_emails(max_results: int = 10):
+async def get_important_emails(request: Request, response: Response, max_results: int = 10):
     """Get important emails only"""
     try:
-        service = get_gmail_service()
-        emails = fetch_recent_emails(service, max_results=max_results)
-        
-        result = []
-        for email in emails:
-            # Classify email
-            category, importance = classify_email(email)
-            
-            # Only include important emails
-            if importance >= 2:  # Medium or high importance
-                # Generate summary
-                summary = summarize_email(email['subject'], email['from'], email['snippet'], email['snippet'])
-                
-                # Enrich email
-                enriched = enrich_email_with_classification(email)
-                enriched['summary'] = summary
-                
-                # Convert to response format
-                response = EmailResponse(
-                    id=email['id'],
-                    subject=email['subject'],
-                    sender=email['from'],
-                    snippet=email['snippet'],
-                    summary=summary,
-                    category=enriched.get('category'),
-                    importance=enriched.get('importance'),
-                    icon=enriched.get('icon')
-                )
-                result.append(response)
-            
-        return result
+        records = await get_recent_summaries_read_through(max_results)
+        # Only include important emails (medium or high importance)
+        records = [record for record in records if (record.get('importance') or 0) >= 2]
+        cached = conditional_response(request, response, records)
+        if cached:
+            return cached
+        return [_email_response(record) for record in records]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/events", response_model=List[EventResponse])
-async def get_events(days_ahead: int = 7, max_emails: int = 20):
-    """Extract events from recent emails"""
+def _events_in_range(request: Request, response: Response, start: Optional[str], end: Optional[str],
+                     days_ahead: int):
+    """Events from the read model for a day range, or a 304 response if the client's copy is current."""
+    today = datetime.now().date()
     try:
-        service = get_gmail_service()
-        emails = fetch_recent_emails(service, max_results=max_emails)
-        
-        all_events = []
-        for email in emails:
-            events = extract_events_from_email(email)
-            all_events.extend(events)
-        
-        # Get upcoming events
-        upcoming = get_upcoming_events(all_events, days_ahead=days_ahead)
-        
-        # Convert to response format
-        result = []
-        for event in upcoming:
-            response = EventResponse(
-                event_type=event.event_type,
-                description=event.description,
-                date_str=event.date_str,
-                is_today=event.is_today,
-                is_tomorrow=event.is_tomorrow,
-                days_until=event.days_until,
-                formatted_date=event.to_dict().get('formatted_date')
-            )
-            result.append(response)
-            
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        start_date, end_date = parse_range(start, end, days_ahead, today)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    etag_source, last_modified = event_store.validators(start_date, end_date, today)
+    cached = not_modified(request, response, make_etag(etag_source), last_modified)
+    if cached:
+        return cached
+    return [EventResponse(**event_dict) for event_dict in event_store.query_range(start_date, end_date, today)]
+
+@app.get("/events", response_model=List[EventResponse])
+async def get_events(request: Request, response: Response, start: Optional[str] = None,
+                     end: Optional[str] = None, days_ahead: int = EVENTS_DEFAULT_DAYS_AHEAD):
+    """Events from processed emails dated between start and end (ISO dates; default: the next days_ahead days)"""
+    return _events_in_range(request, response, start, end, days_ahead)
 
 @app.get("/events/today", response_model=List[EventResponse])
-async def get_todays_events(max_emails: int = 20):
+async def get_todays_events_endpoint(request: Request, response: Response):
     """Get events scheduled for today"""
-    try:
-        service = get_gmail_service()
-        emails = fetch_recent_emails(service, max_results=max_emails)
-        
-        all_events = []
-        for email in emails:
-            events = extract_events_from_email(email)
-            all_events.extend(events)
-        
-        # Get today's events
-        today = get_todays_events(all_events)
-        
-        # Convert to response format
-        result = []
-        for event in today:
-            response = EventResponse(
-                event_type=event.event_type,
-                description=event.description,
-                date_str=event.date_str,
-                is_today=event.is_today,
-                is_tomorrow=event.is_tomorrow,
-                days_until=event.days_until,
-                formatted_date=event.to_dict().get('formatted_date')
-            )
-            result.append(response)
-            
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    today = datetime.now().date().isoformat()
+    return _events_in_range(request, response, today, today, 0)
+
+@app.get("/search")
+async def search_summaries(q: str, page: int = 1, page_size: int = 20):
+    """Ranked full-text search over stored summaries (terms match as prefixes)"""
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="q must not be empty")
+    if page < 1 or not 1 <= page_size <= SEARCH_MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"page must be >= 1 and page_size between 1 and {SEARCH_MAX_PAGE_SIZE}")
+    results = await asyncio.to_thread(search_index.search, q, page_size, (page - 1) * page_size)
+    return {"query": q, "page": page, "page_size": page_size, **results}
+
+@app.get("/metrics")
+async def get_metrics():
+    """Operational metrics, including the current poll interval"""
+    return {
+        "poll": poll_scheduler.snapshot(),
+        "reminders": reminder_scheduler.snapshot(),
+        "notifications": notification_dispatcher.snapshot(),
+        "sender_profiles": classifier.profiles.snapshot() if classifier.profiles is not None else None,
+        "gmail_credentials": gmail_credentials_snapshot(),
+    }
 
 @app.post("/notify")
 async def send_notification(notification: NotificationRequest):
@@ -317,39 +315,39 @@ async def process_new_email(background_tasks: BackgroundTasks):
     background_tasks.add_task(process_and_broadcast_email)
     return {"status": "success", "message": "Processing emails in background"}
 
-async def process_and_broadcast_email():
-    """Process new emails and broadcast updates via WebSocket"""
+# IDs returned by the previous poll, to tell new mail from mail that is still unread
+last_polled_ids: Set[str] = set()
+
+async def process_and_broadcast_email() -> int:
+    """Process recent emails and broadcast updates via WebSocket; returns how many are new since the last poll"""
+    global last_polled_ids
+    processed_emails = []
+    new_emails = 0
     try:
-        service = get_gmail_service()
-        emails = fetch_recent_emails(service, max_results=5)
+        # Stored summaries are served as they are; only emails missing from storage are summarized
+        records = await get_recent_summaries_read_through(max_results=5)
+        polled_ids = {record['id'] for record in records}
+        new_emails = len(polled_ids - last_polled_ids)
+        last_polled_ids = polled_ids
         
         all_events = []
-        processed_emails = []
         
-        for email in emails:
-            # Generate summary
-            summary = summarize_email(email['subject'], email['from'], email['snippet'], email['snippet'])
-            
-            # Classify and enrich email
-            enriched = enrich_email_with_classification(email)
-            enriched['summary'] = summary
-            
-            # Extract events
-            events = extract_events_from_email(email)
-            if events:
-                for event in events:
-                    all_events.append(event.to_dict())
+        # Events were extracted when each email was stored; reminders fan out to devices when they fire
+        reminder_scheduler.schedule_records(records)
+        
+        for record in records:
+            all_events.extend(record.get('events') or [])
             
             # Convert to broadcast format
             email_data = {
-                "id": email['id'],
-                "subject": email['subject'],
-                "sender": email['from'],
-                "snippet": email['snippet'],
-                "summary": summary,
-                "category": enriched.get('category'),
-                "importance": enriched.get('importance'),
-                "icon": enriched.get('icon')
+                "id": record['id'],
+                "subject": record.get('subject'),
+                "sender": record.get('sender'),
+                "snippet": record.get('snippet'),
+                "summary": record.get('summary'),
+                "category": record.get('category'),
+                "importance": record.get('importance'),
+                "icon": record.get('icon')
             }
             processed_emails.append(email_data)
         
@@ -375,61 +373,76 @@ async def process_and_broadcast_email():
             })
     except Exception as e:
         print(f"Error processing emails: {str(e)}")
+    return new_emails
 
 # Setup background task to periodically check for new emails
 @app.on_event("startup")
 async def startup_event():
     asyncio.create_task(periodic_email_check())
+    asyncio.create_task(reminder_scheduler.run(send_reminders))
+    asyncio.create_task(notification_dispatcher.run())
+    asyncio.create_task(refresh_credentials_periodically())
+
+async def poll_cycle() -> float:
+    """Run one poll and return the interval to wait before the next one"""
+    new_emails = await process_and_broadcast_email()
+    # Check sooner after new mail, back off toward the ceiling while idle
+    return poll_scheduler.record_poll(new_emails)
 
 async def periodic_email_check():
     """Periodically check for new emails and broadcast updates"""
     while True:
-        await process_and_broadcast_email()
-        # Check every 2 minutes
-        await asyncio.sleep(120)
+        await poll_cycle()
+        await poll_scheduler.wait()
+
+# IDs of recent emails already considered for notification, so repeated checks don't notify about them again
+notified_ids: Set[str] = set()
 
 async def process_and_notify():
-    """Process emails and send notifications for important ones"""
+    """Notify devices about new important emails and schedule reminders for their events"""
+    global notified_ids
     try:
-        service = get_gmail_service()
-        emails = fetch_recent_emails(service, max_results=10)
+        # On a worker thread: throttled Gmail requests back off with blocking sleeps
+        emails = await asyncio.to_thread(fetch_recent_emails, max_results=10)
+        recent_ids = {email['id'] for email in emails}
         
-        for device_token in device_tokens:
-            for email in emails:
-                # Check importance
-                category, importance = classify_email(email)
-                
-                if importance >= 2:  # Medium or high importance
-                    notify_important_email(device_token, email)
-                
-                # Extract and notify about events
-                events = extract_events_from_email(email)
-                today_events = get_todays_events(events)
-                tomorrow_events = get_tomorrows_events(events)
-                
-                # Notify about today's events
-                for event in today_events:
-                    send_event_notification(
-                        device_token=device_token,
-                        event_type=event.event_type,
-                        event_details=event.description,
-                        email_subject=email.get('subject', ''),
-                        email_sender=email.get('from', ''),
-                        event_date=event.date_str
-                    )
-                
-                # Notify about tomorrow's events
-                for event in tomorrow_events:
-                    send_event_notification(
-                        device_token=device_token,
-                        event_type=event.event_type,
-                        event_details=event.description,
-                        email_subject=email.get('subject', ''),
-                        email_sender=email.get('from', ''),
-                        event_date=event.date_str
-                    )
+        for email in emails:
+            if email['id'] in notified_ids:
+                continue
+            snippet_email = {**email, 'body': email['snippet']}
+            # Classify and extract events once per email, whatever the number of devices
+            # The broadcast poll already recorded these emails in the sender profiles
+            category, importance = classifier.classify_email(snippet_email, observe=False)
+            
+            if importance >= 2:  # Medium or high importance
+                notification_dispatcher.enqueue_many(
+                    device_tokens, KIND_EMAIL,
+                    title=email.get('subject', '') or '(no subject)',
+                    message=f"From {email.get('sender', '')}",
+                    data={"emailId": email['id'], "importance": importance}
+                )
+            
+            events = event_extractor.extract_events(snippet_email)
+            reminder_scheduler.schedule(email['id'], events_to_dicts(events), email.get('subject', ''), email.get('sender', ''))
+            notified_ids.add(email['id'])
+        # Forget emails that dropped out of the recent list, so the set stays small
+        notified_ids &= recent_ids
     except Exception as e:
-        print(f"Error in background task: {e}")
+        logger.error(f"Error in background task: {e}", exc_info=True)
+
+async def send_reminders(reminders: List[Reminder]):
+    """Queue due event reminders for every registered device and send them to connected clients"""
+    for reminder in reminders:
+        notification_dispatcher.enqueue_many(
+            device_tokens, KIND_EVENT,
+            title=reminder.event.get('description') or reminder.subject,
+            message=f"{(reminder.event.get('event_type') or 'event').capitalize()} at {reminder.event_at:%H:%M} ({reminder.subject})",
+            data=reminder.to_dict()
+        )
+    await manager.broadcast_json({
+        "type": "notification",
+        "data": [reminder.to_dict() for reminder in reminders]
+    })
 
 if __name__ == "__main__":
     import uvicorn
@@ -2,6 +2,7 @@ import os
 import pickle
 import json # Use json instead of pickle
 import pathlib
+from functools import lru_cache
 from dotenv import load_dotenv
 
 # Load .env variables from the backend directory
@@ -15,7 +16,8 @@ else:
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials # Use Credentials directly
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 
@@ -30,35 +32,56 @@ token_path_str = os.getenv("GOOGLE_TOKEN_PATH", "../token.json")
 CREDS_PATH = (backend_dir / creds_path_str).resolve()
 TOKEN_PATH = (backend_dir / token_path_str).resolve()
 
+# Optional pinned copy of the Gmail discovery document; by default the copy bundled
+# with google-api-python-client is used, so building a service needs no network access
+discovery_path_str = os.getenv("GMAIL_DISCOVERY_DOCUMENT", "")
+
 print(f"DEBUG Auth: Using Credentials Path: {CREDS_PATH}")
 print(f"DEBUG Auth: Using Token Path: {TOKEN_PATH}")
 
-def get_gmail_service():
+def resolve_token_path(token_path=None) -> pathlib.Path:
+    """Absolute token path; relative paths are resolved against the backend directory, like the .env paths."""
+    return (backend_dir / token_path).resolve() if token_path else TOKEN_PATH
+
+def save_credentials(creds, token_path=None):
+    """Write credentials to the token file so the next start can reuse them."""
+    token_path = resolve_token_path(token_path)
+    try:
+        # Use to_json() method and save as JSON
+        with open(token_path, 'w') as token_file:
+            token_file.write(creds.to_json())
+        print(f"DEBUG Auth: Credentials saved to {token_path}")
+    except Exception as e:
+        print(f"Error saving token to {token_path}: {e}")
+
+def get_credentials(token_path=None):
+    """Load (refreshing or re-authenticating if needed) credentials for the token at token_path."""
+    token_path = resolve_token_path(token_path)
     creds = None
 
     # Load token from token.json if it exists
-    if TOKEN_PATH.exists():
+    if token_path.exists():
         try:
             # Use Credentials.from_authorized_user_file for JSON tokens
-            creds = Credentials.from_authorized_user_file(str(TOKEN_PATH), SCOPES)
-            print(f"DEBUG Auth: Loaded credentials from {TOKEN_PATH}")
+            creds = Credentials.from_authorized_user_file(str(token_path), SCOPES)
+            print(f"DEBUG Auth: Loaded credentials from {token_path}")
         except Exception as e:
-             print(f"Error loading token from {TOKEN_PATH}: {e}. Will attempt re-authentication.")
+             print(f"Error loading token from {token_path}: {e}. Will attempt re-authentication.")
              creds = None # Ensure creds is None if loading fails
 
     # If there are no (valid) credentials available, let the user log in.
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
-            print(f"DEBUG Auth: Refreshing expired token from {TOKEN_PATH}...")
+            print(f"DEBUG Auth: Refreshing expired token from {token_path}...")
             try:
                 creds.refresh(Request())
                 print("DEBUG Auth: Token refreshed successfully.")
             except Exception as e:
                 print(f"Error refreshing token: {e}. Deleting invalid token and re-authenticating.")
                 try:
-                    TOKEN_PATH.unlink() # Remove invalid token file
+                    token_path.unlink() # Remove invalid token file
                 except OSError as del_err:
-                    print(f"Error deleting token file {TOKEN_PATH}: {del_err}")
+                    print(f"Error deleting token file {token_path}: {del_err}")
                 creds = None # Force re-authentication
         else:
             print(f"DEBUG Auth: No valid token found or refresh failed. Starting new authentication flow...")
@@ -77,19 +100,44 @@ def get_gmail_service():
                 raise # Re-raise the exception to stop execution if auth fails
 
         # Save the credentials for the next run
-        try:
-            # Use to_json() method and save as JSON
-            with open(TOKEN_PATH, 'w') as token_file:
-                token_file.write(creds.to_json())
-            print(f"DEBUG Auth: Credentials saved to {TOKEN_PATH}")
-        except Exception as e:
-            print(f"Error saving token to {TOKEN_PATH}: {e}")
+        save_credentials(creds, token_path)
 
+    return creds
+
+@lru_cache(maxsize=1)
+def discovery_document() -> dict:
+    """The Gmail v1 discovery document, read and parsed once per process."""
+    if discovery_path_str:
+        with open((backend_dir / discovery_path_str).resolve()) as f:
+            return json.load(f)
+    document = get_static_doc('gmail', 'v1')
+    if document is None:
+        raise FileNotFoundError("google-api-python-client has no bundled gmail.v1 discovery document; "
+                                "set GMAIL_DISCOVERY_DOCUMENT")
+    return json.loads(document)
+
+def build_gmail_service(creds, http=None):
+    """Build a Gmail service from credentials, optionally over a caller-owned transport.
+
+    A service object wraps a single httplib2 transport, which is not thread-safe;
+    pass a fresh AuthorizedHttp per thread to share credentials across threads.
+    Services are built from the cached discovery document, never fetched.
+    """
     try:
         print("DEBUG Auth: Building Gmail service...")
-        service = build('gmail', 'v1', credentials=creds)
+        if http is not None:
+            service = build_from_document(discovery_document(), http=http)
+        else:
+            service = build_from_document(discovery_document(), credentials=creds)
         print("DEBUG Auth: Gmail service built successfully.")
         return service
     except Exception as e:
         print(f"Error building Gmail service: {e}")
-        raise # Re-raise the exception
\ No newline at end of file
+        raise # Re-raise the exception
+
+def get_gmail_service(token_path=None):
+    """Build a new Gmail service for the token at token_path (defaults to TOKEN_PATH).
+
+    Prefer gmail_service.get_gmail_service, which reuses credentials and services.
+    """
+    return build_gmail_service(get_credentials(token_path))
@@ -0,0 +1,268 @@
+"""
+Historical mailbox backfill for Email Summarizer.
+
+Pages through the whole message list (following nextPageToken) and runs every
+page through a bounded pipeline:
+
+    list page -> fetch full messages -> summarize -> classify, extract events, bulk store
+
+Each stage works on one page at a time and hands it on through a small queue,
+so listing, Gmail fetches, model inference and storage writes overlap without
+holding more than a few pages in memory. Summarization runs on a pool of
+worker processes, each with its own model. After every stored page the next
+page token is checkpointed, so an interrupted run resumes where it stopped.
+Messages that could not be fetched are kept in the checkpoint and retried
+first when the backfill is run again.
+
+Run from the backend directory, e.g.:
+    python backfill.py --account default --workers 2
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+script_dir = Path(__file__).resolve().parent
+if (script_dir / '.env').exists():
+    load_dotenv(dotenv_path=script_dir / '.env')
+
+from email_classifier import EmailClassifier
+from event_extractor import EventExtractor, events_to_dicts
+from events_store import EventStore
+from search_index import SearchIndex
+from gmail_utils import get_mailbox_profile, list_message_ids_page
+from mailbox_ingestion import DEFAULT_ACCOUNT_ID, MailboxIngestor
+from storage_manager import build_summary_record, get_storage_manager
+from summarizer import initialize_model, summarize_emails
+
+logger = logging.getLogger(__name__)
+
+# Messages listed per page (Gmail allows up to 500)
+BACKFILL_PAGE_SIZE = int(os.getenv("BACKFILL_PAGE_SIZE", "100"))
+# Summarizer worker processes; each loads its own copy of the model
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", "2"))
+# Pages buffered between two pipeline stages
+BACKFILL_QUEUE_PAGES = int(os.getenv("BACKFILL_QUEUE_PAGES", "2"))
+# Concurrent full-message gets per page
+BACKFILL_FETCH_CONCURRENCY = int(os.getenv("BACKFILL_FETCH_CONCURRENCY", "8"))
+
+
+class BackfillCheckpoint:
+    """Resume state for one account's backfill, saved atomically as JSON."""
+
+    def __init__(self, path: Path, account_id: str):
+        self.path = path
+        self.account_id = account_id
+        self.page_token: Optional[str] = None
+        self.pages = 0
+        self.stored = 0
+        self.skipped = 0
+        self.failed = 0
+        self.failed_ids: List[str] = []  # Not fetched yet; retried on the next run
+        self.complete = False
+
+    @classmethod
+    def load(cls, path: Path, account_id: str) -> "BackfillCheckpoint":
+        checkpoint = cls(path, account_id)
+        if path.exists():
+            with open(path, 'r') as f:
+                state = json.load(f)
+            for key in ('page_token', 'pages', 'stored', 'skipped', 'failed', 'failed_ids', 'complete'):
+                setattr(checkpoint, key, state.get(key, getattr(checkpoint, key)))
+        return checkpoint
+
+    @property
+    def handled(self) -> int:
+        return self.stored + self.skipped + self.failed
+
+    def save(self):
+        state = {key: getattr(self, key) for key in
+                 ('account_id', 'page_token', 'pages', 'stored', 'skipped', 'failed', 'failed_ids', 'complete')}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', dir=self.path.parent, prefix=self.path.name,
+                                         suffix='.tmp', delete=False) as f:
+            json.dump(state, f, indent=2)
+        os.replace(f.name, self.path)
+
+
+class Backfill:
+    """Runs the paged backfill pipeline for one mailbox."""
+
+    def __init__(self, account_id: str, checkpoint: BackfillCheckpoint, query: str = '',
+                 label_ids: Optional[List[str]] = None, page_size: int = BACKFILL_PAGE_SIZE,
+                 workers: int = BACKFILL_WORKERS, batch_size: Optional[int] = None):
+        account = MailboxIngestor().get_account(account_id)
+        if account is None:
+            raise ValueError(f"Unknown account '{account_id}'")
+        self.account_id = account.account_id
+        self.client_pool = account.client_pool
+        self.checkpoint = checkpoint
+        self.query = query
+        self.label_ids = label_ids
+        self.page_size = min(page_size, 500)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.storage = get_storage_manager()
+        self.classifier = EmailClassifier()
+        self.event_extractor = EventExtractor()
+        self.event_store = EventStore()
+        self.search_index = SearchIndex()
+        self.total: Optional[int] = None
+        self._started_at = time.time()
+        self._handled_at_start = checkpoint.handled
+
+    # --- Stages --- #
+    async def _list_pages(self, out: asyncio.Queue):
+        """Page through message IDs, dropping ones already in storage; earlier fetch failures go first."""
+        if self.checkpoint.failed_ids:
+            await out.put(await self._page(list(self.checkpoint.failed_ids), None, retry=True))
+        if self.checkpoint.complete:
+            await out.put(None)
+            return
+        page_token = self.checkpoint.page_token
+        while True:
+            message_ids, next_token = await self.client_pool.run(
+                list_message_ids_page, page_token, self.page_size, self.query, self.label_ids
+            )
+            await out.put(await self._page(message_ids, next_token))
+            if not next_token:
+                break
+            page_token = next_token
+        await out.put(None)
+
+    async def _page(self, message_ids: List[str], next_token: Optional[str], retry: bool = False) -> Dict:
+        existing = await asyncio.to_thread(self.storage.existing_ids, message_ids)
+        return {'ids': [message_id for message_id in message_ids if message_id not in existing],
+                'existing': existing, 'skipped': 0 if retry else len(existing),
+                'next_token': next_token, 'retry': retry}
+
+    async def _fetch(self, pages: asyncio.Queue, out: asyncio.Queue):
+        """Fetch full content for each page's messages on the account's client pool."""
+        while (page := await pages.get()) is not None:
+            fetched = await self.client_pool.fetch_full_emails(page['ids'], BACKFILL_FETCH_CONCURRENCY)
+            page['emails'] = [email for email in fetched.values() if email]
+            page['failed_ids'] = [message_id for message_id in page['ids'] if not fetched.get(message_id)]
+            if page['failed_ids']:
+                logger.warning(f"Could not fetch {len(page['failed_ids'])} messages: {', '.join(page['failed_ids'])}")
+            await out.put(page)
+        await out.put(None)
+
+    async def _summarize(self, pages: asyncio.Queue, out: asyncio.Queue, executor: ProcessPoolExecutor):
+        """Summarize each page in batches spread over the worker processes."""
+        loop = asyncio.get_running_loop()
+        while (page := await pages.get()) is not None:
+            items = [(email.get('subject', ''), email.get('sender', ''), email.get('snippet', ''),
+                      email.get('body', '')) for email in page['emails']]
+            share = max(1, -(-len(items) // self.workers))
+            slices = [items[start:start + share] for start in range(0, len(items), share)]
+            results = await asyncio.gather(*(
+                loop.run_in_executor(executor, summarize_emails, batch, True, self.batch_size)
+                for batch in slices
+            ))
+            page['summaries'] = [summary for batch in results for summary in batch]
+            await out.put(page)
+        await out.put(None)
+
+    async def _store(self, pages: asyncio.Queue):
+        """Classify, extract events, write each page in one bulk call and checkpoint."""
+        while (page := await pages.get()) is not None:
+            records = {}
+            for email in page['emails']:
+                email['account_id'] = self.account_id
+            # One call per page, so large pages can go through the batch model
+            enriched_emails = self.classifier.enrich_emails_with_classification(page['emails'])
+            for email, summary, enriched_email in zip(page['emails'], page['summaries'], enriched_emails):
+                events = events_to_dicts(self.event_extractor.extract_events(email))
+                records[email['id']] = build_summary_record(email['id'], email, summary, enriched_email, events)
+            if records and not await asyncio.to_thread(self.storage.store_summaries, records):
+                raise RuntimeError("Bulk storage write failed; stopping so the page is retried on resume")
+            self.event_store.index_records(records.values())
+            self.search_index.index_records(records.values())
+
+            # Stored (or meanwhile stored elsewhere) messages are no longer failures; new failures wait for a rerun
+            resolved = set(records) | set(page['existing'])
+            failed_ids = [message_id for message_id in self.checkpoint.failed_ids if message_id not in resolved]
+            failed_ids += [message_id for message_id in page['failed_ids'] if message_id not in failed_ids]
+            self.checkpoint.failed_ids = failed_ids
+            self.checkpoint.failed = len(failed_ids)
+            self.checkpoint.stored += len(records)
+            self.checkpoint.skipped += page['skipped']
+            if not page['retry']:
+                self.checkpoint.page_token = page['next_token']
+                self.checkpoint.pages += 1
+                self.checkpoint.complete = page['next_token'] is None
+            self.checkpoint.save()
+            self._report()
+
+    # --- Progress --- #
+    def _report(self):
+        checkpoint = self.checkpoint
+        elapsed = time.time() - self._started_at
+        rate = (checkpoint.handled - self._handled_at_start) / elapsed if elapsed > 0 else 0.0
+        line = (f"page {checkpoint.pages}: {checkpoint.stored} stored, {checkpoint.skipped} skipped, "
+                f"{checkpoint.failed} failed, {rate:.1f} msg/s")
+        if self.total:
+            remaining = max(0, self.total - checkpoint.handled)
+            eta = f"{remaining / rate / 60:.0f} min" if rate > 0 else "unknown"
+            line += f", {checkpoint.handled}/~{self.total} ({100 * checkpoint.handled / self.total:.1f}%), ETA {eta}"
+        logger.info(line)
+
+    async def run(self):
+        if self.checkpoint.complete and not self.checkpoint.failed_ids:
+            logger.info(f"Backfill for account '{self.account_id}' already complete; use --restart to run it again.")
+            return
+        profile = await self.client_pool.run(get_mailbox_profile)
+        # messagesTotal counts the whole mailbox, so it is an upper bound when a query or label is set
+        self.total = (profile or {}).get('messagesTotal')
+        logger.info(f"Backfilling account '{self.account_id}' (~{self.total} messages) "
+                    f"{'from page token ' + self.checkpoint.page_token if self.checkpoint.page_token else 'from the start'}")
+
+        listed, fetched, summarized = (asyncio.Queue(maxsize=BACKFILL_QUEUE_PAGES) for _ in range(3))
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=initialize_model) as executor:
+            stages = [
+                asyncio.create_task(self._list_pages(listed)),
+                asyncio.create_task(self._fetch(listed, fetched)),
+                asyncio.create_task(self._summarize(fetched, summarized, executor)),
+                asyncio.create_task(self._store(summarized)),
+            ]
+            try:
+                await asyncio.gather(*stages)
+            finally:
+                for stage in stages:
+                    stage.cancel()
+        logger.info(f"Backfill finished: {self.checkpoint.stored} stored, {self.checkpoint.skipped} skipped, "
+                    f"{self.checkpoint.failed} failed.")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Summarize an existing mailbox, resumably")
+    arg_parser.add_argument("--account", default=DEFAULT_ACCOUNT_ID, help="Account ID from GMAIL_ACCOUNTS_FILE")
+    arg_parser.add_argument("--query", default="", help="Gmail search query, e.g. 'after:2024/01/01'")
+    arg_parser.add_argument("--label", action="append", dest="labels", help="Restrict to a label (repeatable)")
+    arg_parser.add_argument("--page-size", type=int, default=BACKFILL_PAGE_SIZE)
+    arg_parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS, help="Summarizer processes")
+    arg_parser.add_argument("--batch-size", type=int, default=None, help="Emails per generate call")
+    arg_parser.add_argument("--state", default=None, help="Checkpoint file (default: ../backfill_<account>.json)")
+    arg_parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over")
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    state_path = Path(args.state or f"../backfill_{args.account}.json").resolve()
+    checkpoint = (BackfillCheckpoint(state_path, args.account) if args.restart
+                  else BackfillCheckpoint.load(state_path, args.account))
+    backfill = Backfill(args.account, checkpoint, query=args.query, label_ids=args.labels,
+                        page_size=args.page_size, workers=args.workers, batch_size=args.batch_size)
+    asyncio.run(backfill.run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Vectorized batch classification.
+
+A whole batch of emails is hashed into one sparse feature matrix (subject,
+sender and body tokens, body bigrams and digit shapes, via the hashing
+trick, so there is no vocabulary to keep) and every category is scored with a single
+sparse-dense matrix product against a small linear (softmax) model. The
+model is trained to reproduce the rule-based EmailClassifier, with labels
+bootstrapped from the rules themselves:
+
+    python batch_classifier.py train --limit 50000
+    python batch_classifier.py train --emails emails.jsonl
+
+EmailClassifier.classify_batch uses the model when BATCH_CLASSIFIER_MODEL
+exists, and falls back to the rules for emails the model is unsure about.
+"""
+
+import logging
+import os
+import re
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+# Trained model written by the trainer and loaded by EmailClassifier (relative to the backend directory)
+BATCH_CLASSIFIER_MODEL = os.getenv("BATCH_CLASSIFIER_MODEL", "../classifier_model.npz")
+# Hashed feature space size (a power of two)
+HASH_FEATURES = 2 ** int(os.getenv("HASH_FEATURES_BITS", "18"))
+# Body tokens hashed per email; the rules mostly fire near the top
+MAX_BODY_TOKENS = int(os.getenv("BATCH_CLASSIFIER_MAX_TOKENS", "400"))
+
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9'\-]*|[@:/]")
+_DIGIT = re.compile(r"\d")
+_DOMAIN = re.compile(r"@([a-z0-9.\-]+)")
+
+Label = Tuple[str, int]  # (category, importance)
+ModelInput = Tuple[str, str, str]  # (subject, body, sender)
+
+
+def model_input(email: Dict) -> ModelInput:
+    """The fields of an email the model reads, as classify_with_rules finds them."""
+    return (email.get("subject", ""), email.get("body") or email.get("snippet", ""),
+            email.get("from") or email.get("sender", ""))
+
+
+def email_features(subject: str, body: str, sender: str = "") -> List[str]:
+    """Feature strings for one email: subject and sender tokens, body tokens and bigrams, and digit shapes."""
+    features = [f"s:{token}" for token in _TOKEN.findall((subject or "").lower())]
+    sender = (sender or "").lower()
+    features.extend(f"f:{token}" for token in _TOKEN.findall(sender))
+    features.extend(f"f@{domain}" for domain in _DOMAIN.findall(sender))
+    tokens = _TOKEN.findall((body or "").lower())[:MAX_BODY_TOKENS]
+    features.extend(tokens)
+    features.extend(f"{first} {second}" for first, second in zip(tokens, tokens[1:]))
+    # Dates and times are recognised by shape ("00/00/0000", "0:00") rather than value
+    features.extend(f"#{_DIGIT.sub('0', token)}" for token in tokens if _DIGIT.search(token))
+    return features
+
+
+class HashingVectorizer:
+    """Signed feature hashing into a fixed-width CSR matrix with sublinear TF and L2-normalized rows."""
+
+    def __init__(self, n_features: int = HASH_FEATURES):
+        self.n_features = n_features
+        self._mask = n_features - 1
+        self._cache: Dict[str, Tuple[int, float]] = {}
+
+    def _hash(self, feature: str) -> Tuple[int, float]:
+        hashed = self._cache.get(feature)
+        if hashed is None:
+            # crc32 is stable across processes, unlike hash(); the top bit picks the sign
+            value = zlib.crc32(feature.encode("utf-8"))
+            hashed = (value & self._mask, -1.0 if value & 0x80000000 else 1.0)
+            if len(self._cache) > 500_000:
+                self._cache.clear()
+            self._cache[feature] = hashed
+        return hashed
+
+    def transform(self, emails: Sequence[ModelInput]) -> sparse.csr_matrix:
+        """One row per (subject, body, sender) triple."""
+        indptr = [0]
+        indices: List[int] = []
+        values: List[float] = []
+        for subject, body, sender in emails:
+            row: Dict[int, float] = {}
+            for feature in email_features(subject, body, sender):
+                index, sign = self._hash(feature)
+                row[index] = row.get(index, 0.0) + sign
+            indices.extend(row)
+            values.extend(row.values())
+            indptr.append(len(indices))
+        matrix = sparse.csr_matrix(
+            (np.asarray(values, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(emails), self.n_features),
+        )
+        matrix.data = np.sign(matrix.data) * np.log1p(np.abs(matrix.data))
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        return sparse.diags(1.0 / np.where(norms == 0, 1.0, norms)).astype(np.float32) @ matrix
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class BatchClassifier:
+    """Softmax regression over hashed features; labels are (category, importance) pairs."""
+
+    def __init__(self, labels: Sequence[Label], weights: np.ndarray, bias: np.ndarray,
+                 vectorizer: Optional[HashingVectorizer] = None):
+        self.labels = [tuple(label) for label in labels]
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+        self.vectorizer = vectorizer or HashingVectorizer(weights.shape[0])
+
+    def predict_proba(self, emails: Sequence[ModelInput]) -> np.ndarray:
+        """Label probabilities, one row per (subject, body, sender) triple."""
+        features = self.vectorizer.transform(emails)
+        return _softmax(np.asarray(features @ self.weights) + self.bias)
+
+    def predict(self, emails: Sequence[ModelInput]) -> Tuple[List[Label], np.ndarray]:
+        """Most likely label per email and its probability."""
+        if not emails:
+            return [], np.zeros(0, dtype=np.float32)
+        probabilities = self.predict_proba(emails)
+        best = probabilities.argmax(axis=1)
+        return [self.labels[index] for index in best], probabilities[np.arange(len(best)), best]
+
+    @classmethod
+    def train(cls, emails: Sequence[ModelInput], labels: Sequence[Label], max_iterations: int = 200,
+              l2: float = 1e-4, n_features: int = HASH_FEATURES) -> "BatchClassifier":
+        """Fit by minimizing L2-regularized cross-entropy with L-BFGS over the whole (sparse) training set."""
+        from scipy.optimize import minimize
+
+        vectorizer = HashingVectorizer(n_features)
+        features = vectorizer.transform(emails)
+        classes = sorted(set(labels))
+        class_index = {label: index for index, label in enumerate(classes)}
+        targets = np.zeros((len(labels), len(classes)), dtype=np.float64)
+        targets[np.arange(len(labels)), [class_index[label] for label in labels]] = 1.0
+        features_t = features.T.tocsr()
+        shape = (n_features, len(classes))
+
+        def loss_and_gradient(params: np.ndarray) -> Tuple[float, np.ndarray]:
+            weights = params[:-len(classes)].reshape(shape)
+            bias = params[-len(classes):]
+            probabilities = _softmax(np.asarray(features @ weights) + bias)
+            loss = -np.sum(targets * np.log(probabilities + 1e-12)) / len(labels) + 0.5 * l2 * np.sum(weights * weights)
+            error = (probabilities - targets) / len(labels)
+            gradient = np.concatenate([(np.asarray(features_t @ error) + l2 * weights).ravel(), error.sum(axis=0)])
+            return loss, gradient
+
+        initial = np.zeros(n_features * len(classes) + len(classes))
+        result = minimize(loss_and_gradient, initial, jac=True, method="L-BFGS-B",
+                          options={"maxiter": max_iterations})
+        logger.info(f"Batch classifier trained: loss {result.fun:.4f} after {result.nit} iterations")
+        return cls(classes, result.x[:-len(classes)].reshape(shape), result.x[-len(classes):], vectorizer)
+
+    def save(self, path: str = BATCH_CLASSIFIER_MODEL):
+        np.savez_compressed(_resolve(path), weights=self.weights, bias=self.bias,
+                            categories=np.array([label[0] for label in self.labels]),
+                            importances=np.array([label[1] for label in self.labels]))
+
+    @classmethod
+    def load(cls, path: str = BATCH_CLASSIFIER_MODEL) -> "BatchClassifier":
+        with np.load(_resolve(path)) as data:
+            labels = list(zip(data["categories"].tolist(), data["importances"].tolist()))
+            return cls(labels, data["weights"], data["bias"])
+
+
+def _resolve(path: str) -> str:
+    if os.path.isabs(path):
+        return path
+    return os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), path))
+
+
+def model_available(path: str = BATCH_CLASSIFIER_MODEL) -> bool:
+    return os.path.exists(_resolve(path))
+
+
+def bootstrap_labels(emails: Sequence[Dict]) -> List[Label]:
+    """Labels for training: what the rule-based classifier says about each email."""
+    from email_classifier import EmailClassifier
+
+    rules = EmailClassifier(profiles=None)
+    return [rules.classify_with_rules(email) for email in emails]
+
+
+def _training_emails(args) -> List[Dict]:
+    if args.emails:
+        import json
+        with open(args.emails) as f:
+            return [json.loads(line) for line in f if line.strip()][:args.limit]
+    from storage_manager import get_storage_manager
+    # Stored records keep the snippet, not the full body
+    return [{**record, "body": record.get("snippet", "")}
+            for record in get_storage_manager().get_recent_summaries(args.limit)]
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import time
+
+    arg_parser = argparse.ArgumentParser(description="Train the batch email classifier from the rule-based labels")
+    arg_parser.add_argument("command", choices=["train"])
+    arg_parser.add_argument("--emails", help="JSON lines file of emails (subject, from, body); default: stored summaries")
+    arg_parser.add_argument("--limit", type=int, default=100000, help="Training emails to use")
+    arg_parser.add_argument("--iterations", type=int, default=200, help="L-BFGS iterations")
+    arg_parser.add_argument("--holdout", type=float, default=0.2, help="Share of emails kept for evaluation")
+    arg_parser.add_argument("--out", default=BATCH_CLASSIFIER_MODEL)
+    args = arg_parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    emails = _training_emails(args)
+    random.Random(0).shuffle(emails)
+    labels = bootstrap_labels(emails)
+    split = int(len(emails) * (1 - args.holdout))
+    pairs = [model_input(email) for email in emails]
+    started = time.perf_counter()
+    model = BatchClassifier.train(pairs[:split], labels[:split], max_iterations=args.iterations)
+    print(f"Trained on {split} emails ({len(model.labels)} labels) in {time.perf_counter() - started:.1f} s")
+    if split < len(pairs):
+        predicted, _ = model.predict(pairs[split:])
+        agreement = np.mean([p == label for p, label in zip(predicted, labels[split:])])
+        print(f"Agreement with the rules on {len(pairs) - split} held-out emails: {agreement:.3f}")
+    model.save(args.out)
+    print(f"Saved model to {_resolve(args.out)}")
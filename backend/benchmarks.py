@@ -0,0 +1,293 @@
+"""
+Benchmarks for the Email Summarizer backend.
+
+Run from the backend directory, e.g.:
+    python benchmarks.py events --emails 20 --dates 200
+    python benchmarks.py backends --backends transformers,extractive --emails 8
+    python benchmarks.py search --records 200000
+    python benchmarks.py classifier --records 20000
+"""
+
+import argparse
+import random
+import statistics
+import time
+from typing import Callable, Dict, List
+
+# --- Synthetic Data --- #
+_DIGEST_LINES = [
+    "Team meeting on {date} at 10:30 am in the main conference room.",
+    "Reminder: the project deadline is {date}, please submit by end of day.",
+    "Webinar recording from {date} is now available to all attendees.",
+    "Invoice #{n} was issued on {date} and is payable within 30 days.",
+    "Your order #{n} shipped {date} and should arrive shortly.",
+    "Community update: nothing scheduled, just sharing a few links this week.",
+]
+
+def make_digest_email(num_dates: int, seed: int = 0) -> Dict:
+    """Build a long digest-style email that mentions num_dates dates."""
+    rng = random.Random(seed)
+    months = ["January", "February", "March", "April", "May", "June",
+              "July", "August", "September", "October", "November", "December"]
+    lines = []
+    for n in range(num_dates):
+        style = rng.randrange(3)
+        if style == 0:
+            date = f"{months[rng.randrange(12)]} {rng.randint(1, 28)}, 2025"
+        elif style == 1:
+            date = f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        else:
+            date = f"{rng.randint(1, 12)}/{rng.randint(1, 28)}/2025"
+        lines.append(rng.choice(_DIGEST_LINES).format(date=date, n=1000 + n))
+    return {
+        "id": f"digest-{num_dates}-{seed}",
+        "subject": "Weekly digest",
+        "from": "digest@example.com",
+        "snippet": lines[0] if lines else "",
+        "body": "\n".join(lines),
+    }
+
+# --- Helpers --- #
+def _time_calls(func: Callable[[], object], repeat: int) -> List[float]:
+    """Run func repeat times and return per-call wall times in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def _report(label: str, timings: List[float]):
+    print(f"{label:<40} median {statistics.median(timings):9.2f} ms   "
+          f"min {min(timings):9.2f} ms   max {max(timings):9.2f} ms")
+
+# --- Benchmarks --- #
+def bench_events(args):
+    """Event extraction over large synthetic digest emails."""
+    from event_extractor import EventExtractor
+
+    extractor = EventExtractor()
+    for num_dates in (args.dates // 4, args.dates // 2, args.dates):
+        emails = [make_digest_email(num_dates, seed) for seed in range(args.emails)]
+        event_counts = []
+
+        def run():
+            event_counts.clear()
+            for email in emails:
+                event_counts.append(len(extractor.extract_events(email)))
+
+        timings = _time_calls(run, args.repeat)
+        _report(f"extract_events x{args.emails} ({num_dates} dates)", timings)
+        print(f"    events per email: {statistics.mean(event_counts):.1f}")
+
+def _prompt_fields(email: Dict):
+    return (email["subject"], email["from"], email["snippet"], email["body"])
+
+def bench_tokenizer(args):
+    """Prompt tokenization: re-tokenizing every prompt vs the cached PromptEncoder."""
+    from transformers import PegasusTokenizer, PegasusTokenizerFast
+    from prompt_encoder import PromptEncoder
+    from summarizer import MAX_INPUT_TOKENS, PROMPT_PREFIX, build_prompt
+
+    emails = [_prompt_fields(make_digest_email(args.dates // 8, seed)) for seed in range(args.emails)]
+    prompts = [build_prompt(*email) for email in emails]
+    for name, tokenizer_class in (("slow", PegasusTokenizer), ("fast", PegasusTokenizerFast)):
+        try:
+            tokenizer = tokenizer_class.from_pretrained("google/pegasus-xsum")
+        except Exception as e:
+            print(f"{name} tokenizer unavailable: {e}")
+            continue
+
+        def per_prompt():
+            # Previous path: a length check, then again for generate
+            for prompt in prompts:
+                tokenizer(prompt)
+                tokenizer([prompt], truncation=True, max_length=MAX_INPUT_TOKENS)
+
+        warm_encoder = PromptEncoder(tokenizer, PROMPT_PREFIX)
+        warm_encoder.encode_many(emails)
+        _report(f"{name}: tokenize per prompt x{args.emails}", _time_calls(per_prompt, args.repeat))
+        _report(f"{name}: PromptEncoder cold batch x{args.emails}",
+                _time_calls(lambda: PromptEncoder(tokenizer, PROMPT_PREFIX).encode_many(emails), args.repeat))
+        _report(f"{name}: PromptEncoder cached x{args.emails}",
+                _time_calls(lambda: warm_encoder.encode_many(emails), args.repeat))
+
+def bench_summarize(args):
+    """End-to-end summarize_email, with the tokenizer's share of the latency."""
+    import summarizer
+
+    summarizer.initialize_model()
+    emails = [_prompt_fields(make_digest_email(args.dates // 8, seed)) for seed in range(args.emails)]
+    encoder = summarizer.prompt_encoder
+
+    def run():
+        # Start cold so every run pays for tokenizing new emails
+        encoder.clear()
+        for email in emails:
+            summarizer.summarize_email(*email)
+
+    encode_before = encoder.encode_seconds
+    timings = _time_calls(run, args.repeat)
+    tokenize_ms = (encoder.encode_seconds - encode_before) * 1000 / args.repeat
+    _report(f"summarize_email x{args.emails}", timings)
+    print(f"    prompt tokenization: {tokenize_ms:.2f} ms per run "
+          f"({100 * tokenize_ms / statistics.mean(timings):.2f}% of latency)")
+
+def _rss_mb() -> float:
+    """Current resident set size of this process in MB (Linux), else peak RSS."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _run_backend(name: str, emails: List, batch_size: int, repeat: int) -> Dict:
+    """Benchmark one backend; runs in a fresh process so memory figures are its own."""
+    import asyncio
+    from summarization_backends import get_backend
+
+    async def run():
+        backend = get_backend(name)
+        rss_before = _rss_mb()
+        load_start = time.perf_counter()
+        await backend.summarize_batch(emails[:1])  # Warm-up also loads the model
+        load_seconds = time.perf_counter() - load_start
+        batch_ms = []
+        for _ in range(repeat):
+            for start in range(0, len(emails), batch_size):
+                batch_start = time.perf_counter()
+                await backend.summarize_batch(emails[start:start + batch_size])
+                batch_ms.append((time.perf_counter() - batch_start) * 1000)
+        await backend.close()
+        rss_after = _rss_mb()
+        return {
+            "load_seconds": load_seconds,
+            "batch_ms": batch_ms,
+            "emails_per_second": len(emails) * repeat / (sum(batch_ms) / 1000),
+            "rss_mb": rss_after,
+            "rss_growth_mb": rss_after - rss_before,
+        }
+
+    return asyncio.run(run())
+
+def bench_backends(args):
+    """Compare summarization backends on the same corpus: latency, throughput and memory."""
+    import multiprocessing
+    from summarization_backends import BACKENDS
+
+    emails = [_prompt_fields(make_digest_email(args.dates // 8, seed)) for seed in range(args.emails)]
+    names = args.backends.split(",") if args.backends else sorted(BACKENDS)
+    context = multiprocessing.get_context("spawn")
+    for name in names:
+        with context.Pool(1) as pool:
+            try:
+                stats = pool.apply(_run_backend, (name, emails, args.batch_size, args.repeat))
+            except Exception as e:
+                print(f"{name:<14} unavailable: {e}")
+                continue
+        _report(f"{name}: batch of {args.batch_size}", stats["batch_ms"])
+        print(f"    {stats['emails_per_second']:.2f} emails/s, first call {stats['load_seconds']:.1f} s, "
+              f"RSS {stats['rss_mb']:.0f} MB (+{stats['rss_growth_mb']:.0f} MB for the backend)")
+
+def make_summary_record(n: int, rng: random.Random) -> Dict:
+    """Stored summary record shaped like build_summary_record output."""
+    words = " ".join(rng.choice(_DIGEST_LINES).format(date="March 3", n=n) for _ in range(3))
+    return {
+        "id": f"msg-{n}",
+        "subject": f"{rng.choice(['Invoice', 'Meeting', 'Order', 'Digest', 'Reminder'])} {n}",
+        "sender": f"user{rng.randrange(500)}@example.com",
+        "summary": words,
+        "category": "work",
+        "importance": rng.randint(1, 3),
+        "processed_at": "2025-03-01T10:00:00",
+        "events": [{"description": rng.choice(_DIGEST_LINES).format(date="March 3", n=n)}],
+    }
+
+def bench_search(args):
+    """Search index build time and query latency over a large synthetic mailbox."""
+    import tempfile
+    from search_index import SearchIndex
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = SearchIndex(f"{tmp}/search.sqlite3")
+        start = time.perf_counter()
+        for offset in range(0, args.records, 5000):
+            index.index_records(make_summary_record(n, rng) for n in range(offset, min(offset + 5000, args.records)))
+        index.optimize()
+        print(f"indexed {args.records} records in {time.perf_counter() - start:.1f} s")
+        for query in ("invoice", "meet", "deadline submit", "user42@example", "order 1234"):
+            pages = []
+            timings = _time_calls(lambda: pages.append(index.search(query, 20, 0)), args.repeat)
+            _report(f"search '{query}' ({pages[-1]['total']} ranked)", timings)
+        _report("search 'meeting' page 50", _time_calls(lambda: index.search("meeting", 20, 980), args.repeat))
+
+_CLASSIFIER_EMAILS = [
+    ("URGENT: action required on contract {n}", "Please review and sign the contract by tomorrow. This is critical.", "legal@acme-corp.com"),
+    ("Meeting invite: sprint planning {n}", "Join the Zoom meeting on Monday at 10:00 am to plan the next sprint.", "pm@acme-corp.com"),
+    ("Deadline for report {n}", "Reminder: the quarterly report is due by Friday. Please submit before the deadline.", "finance@acme-corp.com"),
+    ("You won a free prize {n}!!!", "Congratulations, claim your free gift card now. Limited time offer, act now.", "promo@deals.biz"),
+    ("Weekly newsletter #{n}", "Here are this week's top stories and a few links worth reading.", "news@letters.io"),
+    ("Lunch on Thursday? {n}", "Hey, are you around for lunch on Thursday? Let me know.", "friend{n}@gmail.com"),
+]
+
+def make_classifier_email(n: int, rng: random.Random) -> Dict:
+    """Synthetic email for the classifier benchmark, drawn from a mix of categories."""
+    subject, body, sender = rng.choice(_CLASSIFIER_EMAILS)
+    filler = " ".join(rng.choice(_DIGEST_LINES).format(date="March 3", n=n) for _ in range(rng.randint(0, 4)))
+    return {"id": f"msg-{n}", "subject": subject.format(n=n), "from": sender.format(n=n % 50),
+            "body": f"{body.format(n=n)} {filler}"}
+
+def bench_classifier(args):
+    """Rule cascade per email vs the vectorized batch model on the same mixed corpus."""
+    from batch_classifier import BatchClassifier, bootstrap_labels, model_input
+    from email_classifier import EmailClassifier
+
+    rng = random.Random(0)
+    train = [make_classifier_email(n, rng) for n in range(args.records)]
+    test = [make_classifier_email(n, rng) for n in range(args.records, 2 * args.records)]
+    start = time.perf_counter()
+    model = BatchClassifier.train([model_input(email) for email in train], bootstrap_labels(train))
+    print(f"trained on {len(train)} emails in {time.perf_counter() - start:.1f} s")
+
+    rules = EmailClassifier(profiles=None)
+    pairs = [model_input(email) for email in test]
+    _report(f"rules: {len(test)} emails", _time_calls(lambda: [rules.classify_with_rules(e) for e in test], args.repeat))
+    _report(f"batch model: {len(test)} emails", _time_calls(lambda: model.predict(pairs), args.repeat))
+    predicted, confidence = model.predict(pairs)
+    expected = bootstrap_labels(test)
+    agreement = sum(p == e for p, e in zip(predicted, expected)) / len(test)
+    print(f"agreement with the rules {agreement:.3f}, "
+          f"{sum(c >= 0.9 for c in confidence) / len(test):.1%} of predictions above 0.9 confidence")
+
+BENCHMARKS = {
+    "events": bench_events,
+    "tokenizer": bench_tokenizer,
+    "summarize": bench_summarize,
+    "backends": bench_backends,
+    "search": bench_search,
+    "classifier": bench_classifier,
+}
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Email Summarizer benchmarks")
+    arg_parser.add_argument("benchmark", choices=sorted(BENCHMARKS) + ["all"])
+    arg_parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case")
+    arg_parser.add_argument("--emails", type=int, default=10, help="Emails per run")
+    arg_parser.add_argument("--dates", type=int, default=200, help="Dates per digest email")
+    arg_parser.add_argument("--backends", default="", help="Comma-separated summarizer backends (default: all)")
+    arg_parser.add_argument("--batch-size", type=int, default=4, help="Emails per summarize_batch call")
+    arg_parser.add_argument("--records", type=int, default=200000, help="Stored summaries (search) or training emails (classifier)")
+    args = arg_parser.parse_args()
+
+    selected = BENCHMARKS if args.benchmark == "all" else {args.benchmark: BENCHMARKS[args.benchmark]}
+    for name, bench in selected.items():
+        print(f"=== {name} ===")
+        bench(args)
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,9 @@ import re
 from typing import Dict, List, Tuple, Optional
 from dateutil import parser as date_parser
 import datetime
+import os
+
+from sender_profiles import SenderProfiles
 
 # --- Constants --- #
 
@@ -17,6 +20,13 @@ CATEGORY_DEADLINE = "deadline"
 CATEGORY_REGULAR = "regular"
 CATEGORY_SPAM = "spam"
 
+# Reuse learned per-sender decisions for repetitive senders (see sender_profiles.py)
+SENDER_PROFILES = os.getenv("SENDER_PROFILES", "true").lower() == "true"
+# Batches at least this large use the trained batch model, if one exists (see batch_classifier.py)
+BATCH_CLASSIFIER_MIN_BATCH = int(os.getenv("BATCH_CLASSIFIER_MIN_BATCH", "32"))
+# Batch model predictions below this probability are re-checked with the rules
+BATCH_CLASSIFIER_MIN_CONFIDENCE = float(os.getenv("BATCH_CLASSIFIER_MIN_CONFIDENCE", "0.9"))
+
 # Keywords and Patterns for Classification
 IMPORTANT_KEYWORDS = [
     r'\b(urgent|important|action required|asap|critical)\b',
@@ -121,15 +131,105 @@ def detect_spam(subject: str, body: str, sender: str) -> bool:
 # --- Email Classifier Class --- #
 
 class EmailClassifier:
-    def classify_email(self, email_data: Dict) -> Tuple[str, int]:
+    def __init__(self, profiles: Optional[SenderProfiles] = None):
+        # None when SENDER_PROFILES is off: every email runs the full pattern stack
+        self.profiles = profiles if profiles is not None else (SenderProfiles() if SENDER_PROFILES else None)
+        self._batch_model = None
+        self._batch_model_checked = False
+        self.batch_stats = {"model": 0, "rules": 0, "cached": 0}
+
+    def classify_email(self, email_data: Dict, observe: bool = True) -> Tuple[str, int]:
         """
-        Classify an email into a category and importance level
+        Classify an email into a category and importance level, reusing the
+        sender's learned decision when its profile is trusted
+        
+        Args:
+            email_data: Email with subject, sender and body (or snippet)
+            observe: Record the outcome in the sender profiles; pass False for
+                provisional passes that will be classified again later
+        
+        Returns:
+            Tuple of (category, importance_level)
+        """
+        cached = self._cached(email_data, observe)
+        if cached is not None:
+            return cached
+        return self._classify_and_observe(email_data, observe)
+
+    def _cached(self, email_data: Dict, observe: bool) -> Optional[Tuple[str, int]]:
+        if self.profiles is None:
+            return None
+        sender = email_data.get("from") or email_data.get("sender", "")
+        # Provisional passes peek, so they neither count as lookups nor trigger verification
+        return self.profiles.lookup(sender) if observe else self.profiles.peek(sender)
+
+    def _classify_and_observe(self, email_data: Dict, observe: bool = True) -> Tuple[str, int]:
+        category, importance = self.classify_with_rules(email_data)
+        if observe:
+            self.observe(email_data, category, importance)
+        return category, importance
+
+    def observe(self, email_data: Dict, category: str, importance: int):
+        """Record a final classification of an email in its sender's profile."""
+        if self.profiles is not None:
+            self.profiles.observe(email_data.get("from") or email_data.get("sender", ""), category, importance)
+
+    @property
+    def batch_model(self):
+        """Trained batch model, loaded on first use; None if it was never trained."""
+        if not self._batch_model_checked:
+            self._batch_model_checked = True
+            from batch_classifier import BatchClassifier, model_available
+            if model_available():
+                self._batch_model = BatchClassifier.load()
+        return self._batch_model
+
+    def classify_batch(self, emails: List[Dict], observe: bool = True) -> List[Tuple[str, int]]:
+        """
+        Classify many emails at once: trusted sender profiles first, then the
+        batch model for large batches, then the rules for whatever is left
+        (observe works as in classify_email)
+        
+        Returns:
+            List of (category, importance_level), in input order
+        """
+        results: List[Optional[Tuple[str, int]]] = [None] * len(emails)
+        pending = []
+        for position, email in enumerate(emails):
+            cached = self._cached(email, observe)
+            if cached is not None:
+                results[position] = cached
+                self.batch_stats["cached"] += 1
+            else:
+                pending.append(position)
+
+        model = self.batch_model if len(pending) >= BATCH_CLASSIFIER_MIN_BATCH else None
+        if model is not None:
+            from batch_classifier import model_input
+            labels, confidences = model.predict([model_input(emails[position]) for position in pending])
+            unsure = []
+            for position, label, confidence in zip(pending, labels, confidences):
+                if confidence >= BATCH_CLASSIFIER_MIN_CONFIDENCE:
+                    results[position] = label
+                    self.batch_stats["model"] += 1
+                else:
+                    unsure.append(position)
+            pending = unsure
+
+        for position in pending:
+            results[position] = self._classify_and_observe(emails[position], observe)
+            self.batch_stats["rules"] += 1
+        return results
+
+    def classify_with_rules(self, email_data: Dict) -> Tuple[str, int]:
+        """
+        Classify an email by running the full pattern stack
         
         Returns:
             Tuple of (category, importance_level)
         """
         subject = email_data.get("subject", "")
-        sender = email_data.get("from", "")
+        sender = email_data.get("from") or email_data.get("sender", "")
         snippet = email_data.get("snippet", "")
         body = email_data.get("body", snippet)
         
@@ -178,8 +278,7 @@ class EmailClassifier:
             CATEGORY_SPAM: []
         }
         
-        for email in emails:
-            category, _ = self.classify_email(email)
+        for email, (category, _) in zip(emails, self.classify_batch(emails)):
             categorized[category].append(email)
         
         return categorized
@@ -197,18 +296,27 @@ class EmailClassifier:
             IMPORTANCE_LOW: []
         }
         
-        for email in emails:
-            _, importance = self.classify_email(email)
+        for email, (_, importance) in zip(emails, self.classify_batch(emails)):
             by_importance[importance].append(email)
         
         return by_importance
 
-    def enrich_email_with_classification(self, email: Dict) -> Dict:
+    def enrich_email_with_classification(self, email: Dict, observe: bool = True) -> Dict:
         """
         Add classification metadata to an email object
         """
-        category, importance = self.classify_email(email)
-        
+        return self._enrich(email, *self.classify_email(email, observe))
+
+    def enrich_emails_with_classification(self, emails: List[Dict], observe: bool = True) -> List[Dict]:
+        """
+        Add classification metadata to a batch of emails (see classify_batch)
+        """
+        return [
+            self._enrich(email, category, importance)
+            for email, (category, importance) in zip(emails, self.classify_batch(emails, observe))
+        ]
+
+    def _enrich(self, email: Dict, category: str, importance: int) -> Dict:
         # Create a copy to avoid modifying the original
         enriched = email.copy()
         
@@ -228,4 +336,4 @@ class EmailClassifier:
         else:
             enriched["icon"] = "📧"
         
-        return enriched
\ No newline at end of file
+        return enriched
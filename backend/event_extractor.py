@@ -1,5 +1,6 @@
 import re
 import datetime
+from bisect import bisect_left, bisect_right
 from typing import Dict, List, Optional, Tuple
 from dateutil import parser as date_parser
 
@@ -32,6 +33,9 @@ DATE_PATTERNS = [
 
 class Event:
     """Class to represent an extracted event from an email"""
+    # Slotted so that large batches of events don't each carry a __dict__
+    __slots__ = ("event_type", "description", "date_str", "email_id", "confidence", "_parsed_date")
+
     def __init__(self, event_type: str, description: str, date_str: Optional[str] = None, 
                  email_id: Optional[str] = None, confidence: float = 0.5):
         self.event_type = event_type  # meeting, deadline, or other
@@ -51,71 +55,156 @@ class Event:
     @property
     def date(self) -> Optional[datetime.datetime]:
         return self._parsed_date
+
+    def days_until_from(self, reference_date: datetime.date) -> Optional[int]:
+        """Days between the reference date and the event date (None if undated)"""
+        if not self._parsed_date:
+            return None
+        return (self._parsed_date.date() - reference_date).days
     
     @property
     def is_today(self) -> bool:
-        if not self._parsed_date:
-            return False
-        today = datetime.datetime.now().date()
-        return self._parsed_date.date() == today
+        return self.days_until == 0
     
     @property
     def is_tomorrow(self) -> bool:
-        if not self._parsed_date:
-            return False
-        tomorrow = (datetime.datetime.now() + datetime.timedelta(days=1)).date()
-        return self._parsed_date.date() == tomorrow
+        return self.days_until == 1
     
     @property
     def days_until(self) -> Optional[int]:
-        if not self._parsed_date:
-            return None
-        today = datetime.datetime.now().date()
-        delta = self._parsed_date.date() - today
-        return delta.days
+        return self.days_until_from(datetime.date.today())
     
-    def to_dict(self) -> Dict:
-        """Convert event to dictionary for serialization"""
+    def to_dict(self, reference_date: Optional[datetime.date] = None) -> Dict:
+        """Convert event to dictionary for serialization.
+
+        Relative fields (is_today, is_tomorrow, days_until) are computed once
+        against reference_date, which defaults to today.
+        """
+        if reference_date is None:
+            reference_date = datetime.date.today()
+        days_until = self.days_until_from(reference_date)
         return {
             "event_type": self.event_type,
             "description": self.description,
             "date_str": self.date_str,
             "email_id": self.email_id,
             "confidence": self.confidence,
-            "is_today": self.is_today,
-            "is_tomorrow": self.is_tomorrow,
-            "days_until": self.days_until,
+            "is_today": days_until == 0,
+            "is_tomorrow": days_until == 1,
+            "days_until": days_until,
             "formatted_date": self._parsed_date.strftime("%Y-%m-%d %H:%M") if self._parsed_date else None
         }
 
+def events_to_dicts(events: List[Event], reference_date: Optional[datetime.date] = None) -> List[Dict]:
+    """Serialize a list of events against a single reference date.
+
+    The clock is read at most once for the whole batch, so building responses
+    for thousands of events doesn't repeat datetime.now() per field.
+    """
+    if reference_date is None:
+        reference_date = datetime.date.today()
+    return [event.to_dict(reference_date) for event in events]
+
 # --- Helper Functions --- #
+def _context_bounds(text_length: int, match_start: int, match_end: int, window_size: int = 100) -> Tuple[int, int]:
+    """Offsets of the context window around a match"""
+    start = max(0, match_start - window_size // 2)
+    end = min(text_length, match_end + window_size // 2)
+    return start, end
+
 def extract_date_context(text: str, match_start: int, match_end: int, window_size: int = 100) -> str:
     """Extract context around a date mention"""
-    start = max(0, match_start - window_size // 2)
-    end = min(len(text), match_end + window_size // 2)
+    start, end = _context_bounds(len(text), match_start, match_end, window_size)
     return text[start:end]
 
-def find_dates_in_text(text: str) -> List[Tuple[str, str]]:
-    """Find dates in text and return (date_string, context) tuples"""
-    results = []
+def find_date_spans(text: str) -> List[Tuple[int, int, str]]:
+    """Find dates in text and return (start, end, date_string) tuples sorted by offset"""
+    spans = []
 
     for pattern in DATE_PATTERNS:
         # Use finditer to get match objects, allowing access to start/end and matched string
-        matches = re.finditer(pattern, text, re.IGNORECASE)
-        for match in matches:
+        for match in re.finditer(pattern, text, re.IGNORECASE):
             date_str = match.group(0) # Get the actual matched string
             # Basic validation using dateutil.parser
             try:
                 date_parser.parse(date_str, fuzzy=True)
-                context = extract_date_context(text, match.start(), match.end())
-                results.append((date_str, context))
+                spans.append((match.start(), match.end(), date_str))
             except (ValueError, TypeError):
                 pass # Ignore strings that don't parse as dates
 
-    return results
+    spans.sort()
+    return spans
+
+def find_dates_in_text(text: str) -> List[Tuple[str, str]]:
+    """Find dates in text and return (date_string, context) tuples"""
+    return [
+        (date_str, extract_date_context(text, start, end))
+        for start, end, date_str in find_date_spans(text)
+    ]
+
+class _SpanIndex:
+    """Static set of [start, end) spans answering "is this range inside any span?" in O(log n)"""
+
+    def __init__(self, spans: List[Tuple[int, int]]):
+        spans = sorted(spans)
+        self._starts = [start for start, _ in spans]
+        # _max_ends[i] is the furthest end among the first i + 1 spans
+        self._max_ends = []
+        furthest = -1
+        for _, end in spans:
+            furthest = max(furthest, end)
+            self._max_ends.append(furthest)
+
+    def covers(self, start: int, end: int) -> bool:
+        """True if [start, end) lies inside at least one indexed span"""
+        i = bisect_right(self._starts, start) - 1
+        return i >= 0 and end <= self._max_ends[i]
 
 # --- Event Extractor Class --- #
 class EventExtractor:
+    def _extract_keyword_events(self, text: str, patterns: List[str], event_type: str,
+                                dated_confidence: float, undated_confidence: float,
+                                date_spans: List[Tuple[int, int, str]], date_starts: List[int],
+                                email_id: Optional[str], processed_spans: set) -> List[Event]:
+        """Create events for keyword matches, attaching any dates inside the keyword's context"""
+        events = []
+        for pattern in patterns:
+            for match in re.finditer(pattern, text, re.IGNORECASE):
+                window_start, window_end = _context_bounds(len(text), match.start(), match.end())
+                span_key = (event_type, window_start, window_end)
+                if span_key in processed_spans:
+                    continue # Avoid processing the same context multiple times for this type
+                processed_spans.add(span_key)
+
+                context = text[window_start:window_end]
+                date_found_in_context = False
+                # Dates were found once over the whole text; pick the ones inside this window
+                i = bisect_left(date_starts, window_start)
+                while i < len(date_spans) and date_spans[i][0] < window_end:
+                    _, date_end, date_str = date_spans[i]
+                    i += 1
+                    if date_end > window_end:
+                        continue
+                    events.append(Event(
+                        event_type=event_type,
+                        description=context,
+                        date_str=date_str,
+                        email_id=email_id,
+                        confidence=dated_confidence
+                    ))
+                    date_found_in_context = True
+
+                # If no date was found *within the immediate context* of the keyword,
+                # still record the mention but with lower confidence/no date.
+                if not date_found_in_context:
+                    events.append(Event(
+                        event_type=event_type,
+                        description=context, # Use the keyword context
+                        email_id=email_id,
+                        confidence=undated_confidence
+                    ))
+        return events
+
     def extract_events(self, email_data: Dict) -> List[Event]:
         """Extract events from an email using defined patterns"""
         subject = email_data.get("subject", "")
@@ -126,120 +215,67 @@ class EventExtractor:
 
         # Combine subject and body for analysis
         text = f"{subject}\n{body}"
-        events = []
 
-        # Use a set to keep track of context strings already processed for a type
-        processed_contexts = set()
+        # Scan for dates once; keyword contexts and the generic pass share the result
+        date_spans = find_date_spans(text)
+        date_starts = [span[0] for span in date_spans]
 
-        # Extract meetings
-        for pattern in MEETING_PATTERNS:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
-                context = extract_date_context(text, match.start(), match.end())
-                context_key = ("meeting", context)
-                if context_key in processed_contexts:
-                    continue # Avoid processing the same context multiple times for meetings
+        # Keyword contexts are tracked by (type, start, end) offsets rather than strings
+        processed_spans = set()
 
-                date_found_in_context = False
-                date_matches = find_dates_in_text(context) # Search only within context
-                if date_matches:
-                    for date_str, _ in date_matches:
-                        events.append(Event(
-                            event_type="meeting",
-                            description=context,
-                            date_str=date_str,
-                            email_id=email_id,
-                            confidence=0.8
-                        ))
-                        date_found_in_context = True
-
-                # If no date was found *within the immediate context* of the keyword,
-                # still record the meeting mention but with lower confidence/no date.
-                if not date_found_in_context:
-                    events.append(Event(
-                        event_type="meeting",
-                        description=context, # Use the keyword context
-                        email_id=email_id,
-                        confidence=0.6
-                    ))
-                processed_contexts.add(context_key)
+        # Extract meetings
+        events = self._extract_keyword_events(
+            text, MEETING_PATTERNS, "meeting", 0.8, 0.6,
+            date_spans, date_starts, email_id, processed_spans
+        )
 
         # Extract deadlines
-        for pattern in DEADLINE_PATTERNS:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
-                context = extract_date_context(text, match.start(), match.end())
-                context_key = ("deadline", context)
-                if context_key in processed_contexts:
-                    continue
-
-                date_found_in_context = False
-                date_matches = find_dates_in_text(context) # Search only within context
-                if date_matches:
-                    for date_str, _ in date_matches:
-                        events.append(Event(
-                            event_type="deadline",
-                            description=context,
-                            date_str=date_str,
-                            email_id=email_id,
-                            confidence=0.9
-                        ))
-                        date_found_in_context = True
-
-                if not date_found_in_context:
-                     events.append(Event(
-                        event_type="deadline",
-                        description=context,
-                        email_id=email_id,
-                        confidence=0.7
-                    ))
-                processed_contexts.add(context_key)
+        events.extend(self._extract_keyword_events(
+            text, DEADLINE_PATTERNS, "deadline", 0.9, 0.7,
+            date_spans, date_starts, email_id, processed_spans
+        ))
 
         # Extract generic events/dates (only if not already captured as part of meeting/deadline context)
-        all_date_matches = find_dates_in_text(text) # Search the whole text
-        for date_str, context in all_date_matches:
-            # Check if this date string/context overlaps significantly with already found events
-            is_already_captured = False
-            for event in events:
-                # Simple check: is the date string within an existing event's description (context)?
-                if event.date_str and date_str in event.description:
-                    is_already_captured = True
-                    break
-                # More robust check needed? Compare start/end positions if available.
-
-            if not is_already_captured:
-                 # Avoid adding generic date if it was the trigger for a meeting/deadline
-                 if not any(ctx_key[1] == context for ctx_key in processed_contexts):
-                     events.append(Event(
-                         event_type="event", # Generic event type
-                         description=context, # Context around the date
-                         date_str=date_str,
-                         email_id=email_id,
-                         confidence=0.5
-                     ))
-                     # Add to processed contexts to avoid re-adding if found by another pattern?
-                     # processed_contexts.add(("event", context))
+        captured = _SpanIndex([(start, end) for _, start, end in processed_spans])
+        for start, end, date_str in date_spans:
+            if captured.covers(start, end):
+                continue
+            events.append(Event(
+                event_type="event", # Generic event type
+                description=extract_date_context(text, start, end), # Context around the date
+                date_str=date_str,
+                email_id=email_id,
+                confidence=0.5
+            ))
 
         return events
 
 # --- Event Filtering Functions --- #
-def get_upcoming_events(events: List[Event], days_ahead: int = 7) -> List[Event]:
+def get_upcoming_events(events: List[Event], days_ahead: int = 7,
+                        reference_date: Optional[datetime.date] = None) -> List[Event]:
     """Filter events to only those occurring within the specified days ahead"""
+    if reference_date is None:
+        reference_date = datetime.date.today()
+
+    # Compute each event's offset once and sort on it
     upcoming = []
-    
     for event in events:
-        if event.days_until is not None and 0 <= event.days_until <= days_ahead:
-            upcoming.append(event)
+        days_until = event.days_until_from(reference_date)
+        if days_until is not None and 0 <= days_until <= days_ahead:
+            upcoming.append((days_until, event))
     
-    # Sort by date
-    upcoming.sort(key=lambda e: e.days_until if e.days_until is not None else float('inf'))
+    upcoming.sort(key=lambda pair: pair[0])
     
-    return upcoming
+    return [event for _, event in upcoming]
 
-def get_todays_events(events: List[Event]) -> List[Event]:
+def get_todays_events(events: List[Event], reference_date: Optional[datetime.date] = None) -> List[Event]:
     """Get events occurring today"""
-    return [event for event in events if event.is_today]
+    if reference_date is None:
+        reference_date = datetime.date.today()
+    return [event for event in events if event.days_until_from(reference_date) == 0]
 
-def get_tomorrows_events(events: List[Event]) -> List[Event]:
+def get_tomorrows_events(events: List[Event], reference_date: Optional[datetime.date] = None) -> List[Event]:
     """Get events occurring tomorrow"""
-    return [event for event in events if event.is_tomorrow]
\ No newline at end of file
+    if reference_date is None:
+        reference_date = datetime.date.today()
+    return [event for event in events if event.days_until_from(reference_date) == 1]
@@ -0,0 +1,152 @@
+"""
+Events read model.
+
+Events extracted from each processed email are written to a SQLite table
+indexed by event date, so calendar views are answered with a range lookup
+instead of fetching emails from Gmail and re-running extraction. Rows are
+replaced per email, which keeps re-processing idempotent. A version stamp,
+bumped on every write, backs ETag/Last-Modified on the events endpoints.
+"""
+
+import datetime
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Relative paths are resolved against the backend directory
+EVENTS_DB_PATH = os.getenv("EVENTS_DB_PATH", "../events.sqlite3")
+# Window used when an events query gives no end date
+EVENTS_DEFAULT_DAYS_AHEAD = int(os.getenv("EVENTS_DEFAULT_DAYS_AHEAD", "7"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    email_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    event_type TEXT NOT NULL,
+    description TEXT NOT NULL,
+    date_str TEXT,
+    event_date TEXT,
+    formatted_date TEXT,
+    confidence REAL,
+    subject TEXT,
+    sender TEXT,
+    PRIMARY KEY (email_id, position)
+);
+CREATE INDEX IF NOT EXISTS events_by_date ON events (event_date);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL NOT NULL);
+"""
+
+_COLUMNS = ("email_id", "position", "event_type", "description", "date_str",
+            "event_date", "formatted_date", "confidence", "subject", "sender")
+
+
+class EventStore:
+    """SQLite-backed events table keyed by (email ID, position) and indexed by date."""
+
+    def __init__(self, path: str = EVENTS_DB_PATH):
+        db_path = Path(path)
+        if not db_path.is_absolute():
+            db_path = (Path(__file__).resolve().parent / db_path).resolve()
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def index_records(self, records: Iterable[Dict[str, Any]]):
+        """Replace the stored events of each processed email record with its 'events' list."""
+        rows = []
+        email_ids = []
+        for record in records:
+            email_id = record.get('id')
+            if not email_id:
+                continue
+            email_ids.append(email_id)
+            for position, event in enumerate(record.get('events') or []):
+                formatted_date = event.get('formatted_date')
+                rows.append((
+                    email_id, position, event.get('event_type', ''), event.get('description', ''),
+                    event.get('date_str'), formatted_date[:10] if formatted_date else None, formatted_date,
+                    event.get('confidence'), record.get('subject', ''), record.get('sender', ''),
+                ))
+        if not email_ids:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany("DELETE FROM events WHERE email_id = ?", [(email_id,) for email_id in email_ids])
+                self._conn.executemany(
+                    f"INSERT INTO events ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})", rows
+                )
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (time.time(),))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def version(self) -> Optional[float]:
+        """Epoch time of the last write, or None if nothing was indexed yet."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row[0] if row else None
+
+    def query_range(self, start: datetime.date, end: datetime.date,
+                    reference_date: Optional[datetime.date] = None) -> List[Dict[str, Any]]:
+        """Events dated within [start, end], ordered by date, with relative fields against reference_date."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM events WHERE event_date BETWEEN ? AND ? "
+                "ORDER BY formatted_date, email_id, position",
+                (start.isoformat(), end.isoformat()),
+            ).fetchall()
+        reference_date = reference_date or datetime.date.today()
+        return [self._to_dict(dict(zip(_COLUMNS, row)), reference_date) for row in rows]
+
+    def validators(self, start: datetime.date, end: datetime.date,
+                   reference_date: datetime.date) -> Tuple[Tuple, datetime.datetime]:
+        """ETag source and Last-Modified time for a range query.
+
+        Relative fields change at midnight, so the reference date is part of
+        the ETag and the start of the day counts as a modification.
+        """
+        version = self.version() or 0.0
+        day_start = datetime.datetime.combine(reference_date, datetime.time()).astimezone()
+        last_modified = max(datetime.datetime.fromtimestamp(version).astimezone(), day_start)
+        return (version, start.isoformat(), end.isoformat(), reference_date.isoformat()), last_modified
+
+    @staticmethod
+    def _to_dict(row: Dict[str, Any], reference_date: datetime.date) -> Dict[str, Any]:
+        days_until = (datetime.date.fromisoformat(row['event_date']) - reference_date).days
+        return {
+            "id": f"{row['email_id']}-{row['position']}",
+            "email_id": row['email_id'],
+            "event_type": row['event_type'],
+            "description": row['description'],
+            "date_str": row['date_str'],
+            "date": row['formatted_date'].replace(' ', 'T'),
+            "formatted_date": row['formatted_date'],
+            "confidence": row['confidence'],
+            "subject": row['subject'],
+            "sender": row['sender'],
+            "is_today": days_until == 0,
+            "is_tomorrow": days_until == 1,
+            "days_until": days_until,
+        }
+
+
+def parse_range(start: Optional[str], end: Optional[str], days_ahead: int = EVENTS_DEFAULT_DAYS_AHEAD,
+                today: Optional[datetime.date] = None) -> Tuple[datetime.date, datetime.date]:
+    """Resolve optional ISO start/end dates; start defaults to today, end to start + days_ahead."""
+    today = today or datetime.date.today()
+    start_date = datetime.date.fromisoformat(start) if start else today
+    end_date = datetime.date.fromisoformat(end) if end else start_date + datetime.timedelta(days=days_ahead)
+    if end_date < start_date:
+        raise ValueError("end date is before start date")
+    return start_date, end_date
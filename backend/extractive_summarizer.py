@@ -0,0 +1,96 @@
+"""
+Lightweight extractive summarizer.
+
+Used as a fallback when the Pegasus model is overloaded: sentences are scored
+with TextRank over TF-IDF cosine similarity (all in NumPy) and the top few are
+returned in their original order. Runs in milliseconds, needs no model, and
+the result is later replaced by an abstractive summary.
+"""
+
+import os
+import re
+from typing import List
+
+import numpy as np
+
+# Sentences returned in an extractive summary
+EXTRACTIVE_MAX_SENTENCES = int(os.getenv("EXTRACTIVE_MAX_SENTENCES", "3"))
+# Only the first sentences of long bodies are ranked (the similarity matrix is quadratic)
+EXTRACTIVE_MAX_CANDIDATES = int(os.getenv("EXTRACTIVE_MAX_CANDIDATES", "80"))
+EXTRACTIVE_MAX_CHARS = int(os.getenv("EXTRACTIVE_MAX_CHARS", "400"))
+
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+|\n{2,}|\n(?=[-*•])')
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9'\-]+")
+_STOPWORDS = frozenset("""
+a an and are as at be been but by can do for from has have hi hello i if in is it its me my
+of on or our please so that the their them there this to us was we were will with you your
+""".split())
+
+DAMPING = 0.85
+ITERATIONS = 30
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into trimmed sentences, dropping fragments too short to be useful."""
+    sentences = (sentence.strip(" \t\r\n-*•") for sentence in _SENTENCE_SPLIT.split(text or ''))
+    return [' '.join(sentence.split()) for sentence in sentences if len(sentence.split()) >= 3]
+
+
+def _tfidf_matrix(sentences: List[str]) -> np.ndarray:
+    """Row-normalized TF-IDF matrix, one row per sentence."""
+    vocabulary = {}
+    rows, cols = [], []
+    for row, sentence in enumerate(sentences):
+        for token in _TOKEN.findall(sentence.lower()):
+            if token not in _STOPWORDS:
+                rows.append(row)
+                cols.append(vocabulary.setdefault(token, len(vocabulary)))
+    counts = np.zeros((len(sentences), max(1, len(vocabulary))))
+    np.add.at(counts, (np.array(rows, dtype=int), np.array(cols, dtype=int)), 1.0)
+
+    document_frequency = np.count_nonzero(counts, axis=0)
+    idf = np.log((1 + len(sentences)) / (1 + document_frequency)) + 1.0
+    tfidf = counts * idf
+    norms = np.linalg.norm(tfidf, axis=1, keepdims=True)
+    return tfidf / np.where(norms == 0, 1.0, norms)
+
+
+def rank_sentences(sentences: List[str]) -> np.ndarray:
+    """TextRank scores for sentences (higher is more central)."""
+    count = len(sentences)
+    if count <= 1:
+        return np.ones(count)
+    vectors = _tfidf_matrix(sentences)
+    similarity = vectors @ vectors.T
+    np.fill_diagonal(similarity, 0.0)
+    out_weight = similarity.sum(axis=1, keepdims=True)
+    # Sentences sharing no terms with the rest spread their rank uniformly
+    transition = np.where(out_weight > 0, similarity / np.where(out_weight == 0, 1.0, out_weight), 1.0 / count)
+
+    scores = np.full(count, 1.0 / count)
+    for _ in range(ITERATIONS):
+        updated = (1 - DAMPING) / count + DAMPING * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < 1e-6:
+            scores = updated
+            break
+        scores = updated
+    return scores
+
+
+def summarize_extractive(subject: str, sender: str, snippet: str, body: str,
+                         max_sentences: int = EXTRACTIVE_MAX_SENTENCES) -> str:
+    """Pick the most central sentences of the email, in their original order."""
+    sentences = split_sentences(body)[:EXTRACTIVE_MAX_CANDIDATES]
+    if not sentences:
+        return (snippet or subject or '')[:EXTRACTIVE_MAX_CHARS]
+    if len(sentences) <= max_sentences:
+        chosen = sentences
+    else:
+        scores = rank_sentences(sentences)
+        # Stable sort keeps earlier sentences first among equal scores
+        top = np.sort(np.argsort(-scores, kind='stable')[:max_sentences])
+        chosen = [sentences[index] for index in top]
+    summary = ' '.join(chosen)
+    if len(summary) > EXTRACTIVE_MAX_CHARS:
+        summary = summary[:EXTRACTIVE_MAX_CHARS].rsplit(' ', 1)[0] + '...'
+    return summary
@@ -0,0 +1,129 @@
+"""
+Thread-safe pool of Gmail API clients.
+
+A googleapiclient service object rides on one httplib2 transport, which must
+not be used from two threads at once. GmailClientPool keeps a bounded set of
+service objects built from one shared set of credentials, each with its own
+keep-alive transport, and runs blocking Gmail calls on a matching thread pool
+so they can be awaited concurrently. Calls made through the pool are charged
+to the pool's quota bucket; pools built with for_token share their account's
+bucket from gmail_quota.bucket_for.
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import httplib2
+from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
+
+from auth import build_gmail_service
+from gmail_quota import QuotaTokenBucket, bucket_for, using_bucket
+from gmail_service import get_service_factory
+from gmail_utils import get_full_email_content
+
+logger = logging.getLogger(__name__)
+
+# Number of service objects (and worker threads) per pool
+GMAIL_POOL_SIZE = int(os.getenv("GMAIL_POOL_SIZE", "4"))
+# Default number of concurrent full-message gets in fetch_full_emails
+GMAIL_FETCH_CONCURRENCY = int(os.getenv("GMAIL_FETCH_CONCURRENCY", "4"))
+# Socket timeout for each pooled transport, in seconds
+GMAIL_HTTP_TIMEOUT = float(os.getenv("GMAIL_HTTP_TIMEOUT", "30"))
+
+
+class GmailClientPool:
+    """Bounded pool of Gmail service objects sharing one set of credentials."""
+
+    def __init__(self, credentials, size: int = GMAIL_POOL_SIZE,
+                 service_factory: Optional[Callable[[], object]] = None,
+                 quota_bucket: Optional[QuotaTokenBucket] = None):
+        self.credentials = credentials
+        self.size = size
+        self.quota_bucket = quota_bucket or QuotaTokenBucket()
+        self._service_factory = service_factory or self._build_service
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="gmail")
+
+    @classmethod
+    def for_token(cls, token_path=None, size: int = GMAIL_POOL_SIZE) -> "GmailClientPool":
+        """Create a pool for the account whose token is stored at token_path, on its shared credentials and quota bucket."""
+        return cls(get_service_factory(token_path).credentials, size=size, quota_bucket=bucket_for(token_path))
+
+    def _build_service(self):
+        # httplib2.Http keeps connections to the API host open between requests
+        http = AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=GMAIL_HTTP_TIMEOUT))
+        return build_gmail_service(self.credentials, http=http)
+
+    def _refresh_if_needed(self):
+        """Refresh the shared credentials once, under the lock, instead of racing in every thread."""
+        if self.credentials is None or self.credentials.valid:
+            return
+        with self._lock:
+            if not self.credentials.valid and self.credentials.refresh_token:
+                logger.info("Refreshing shared Gmail credentials for the client pool...")
+                self.credentials.refresh(Request())
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._service_factory()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        # Every client is checked out; wait for one to come back
+        return self._idle.get()
+
+    @contextmanager
+    def client(self):
+        """Check out a service object for exclusive use by the calling thread."""
+        self._refresh_if_needed()
+        service = self._acquire()
+        try:
+            yield service
+        finally:
+            self._idle.put(service)
+
+    def call(self, func: Callable, *args, **kwargs):
+        """Call func(*args, service=<pooled service>, **kwargs) in the calling thread."""
+        with self.client() as service, using_bucket(self.quota_bucket):
+            return func(*args, service=service, **kwargs)
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """Await func(*args, service=<pooled service>, **kwargs) on the pool's worker threads."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: self.call(func, *args, **kwargs))
+
+    async def fetch_full_emails(self, message_ids: List[str],
+                                concurrency: int = GMAIL_FETCH_CONCURRENCY) -> Dict[str, Optional[Dict]]:
+        """Fetch full content for many messages with at most `concurrency` gets in flight."""
+        limit = asyncio.Semaphore(max(1, concurrency))
+
+        async def fetch(message_id: str):
+            async with limit:
+                return message_id, await self.run(get_full_email_content, message_id)
+
+        return dict(await asyncio.gather(*(fetch(message_id) for message_id in message_ids)))
+
+    def close(self):
+        """Stop the worker threads; pooled services are dropped with the pool."""
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,182 @@
+"""
+Client-side quota management for Gmail API calls.
+
+Every Gmail request goes through execute_with_retry, which:
+- takes the method's quota cost from a token bucket before sending,
+- retries 429/5xx (and 403 rate-limit) responses with jittered exponential backoff,
+- adapts the bucket's refill rate (halving on throttling, creeping back up on success),
+- records calls, quota units, retries and failures per method.
+
+Gmail's quota is per user, so there is one bucket per mailbox (keyed by its
+token file) shared by every pool and service of that account. Retries sleep
+on the calling thread; async code must run Gmail calls on a client pool or
+with asyncio.to_thread.
+"""
+
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from googleapiclient.errors import HttpError
+
+from auth import resolve_token_path
+
+logger = logging.getLogger(__name__)
+
+# Gmail's per-user limit is 250 quota units per second; stay a little under it
+QUOTA_UNITS_PER_SECOND = float(os.getenv("GMAIL_QUOTA_UNITS_PER_SECOND", "200"))
+QUOTA_BURST_UNITS = float(os.getenv("GMAIL_QUOTA_BURST_UNITS", "250"))
+MAX_RETRIES = int(os.getenv("GMAIL_MAX_RETRIES", "5"))
+BACKOFF_BASE_SECONDS = float(os.getenv("GMAIL_BACKOFF_BASE_SECONDS", "0.5"))
+BACKOFF_MAX_SECONDS = float(os.getenv("GMAIL_BACKOFF_MAX_SECONDS", "32"))
+
+# Quota units charged per method (see the Gmail API usage limits)
+METHOD_COSTS = {
+    "messages.list": 5,
+    "messages.get.metadata": 5,
+    "messages.get.full": 5,
+    "history.list": 2,
+    "users.getProfile": 1,
+    "users.watch": 100,
+}
+DEFAULT_METHOD_COST = 5
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+
+class QuotaTokenBucket:
+    """Thread-safe token bucket whose refill rate adapts to throttling (AIMD)."""
+
+    def __init__(self, rate: float = QUOTA_UNITS_PER_SECOND, capacity: float = QUOTA_BURST_UNITS,
+                 min_rate: Optional[float] = None):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate if min_rate is not None else max(1.0, rate / 32)
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, cost: float):
+        """Block until `cost` units are available, then take them."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= cost:
+                    self._tokens -= cost
+                    return
+                wait = (cost - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self):
+        """Additive increase: recover 5% of the ceiling per successful call."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def on_throttle(self):
+        """Multiplicative decrease and drain, so concurrent callers back off together."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0.0
+            self._updated = time.monotonic()
+
+    def record(self, method: str, units: float = 0, retries: int = 0, failed: bool = False):
+        """Account one call (and its retries) against a method."""
+        with self._lock:
+            method_stats = self.stats.setdefault(
+                method, {"calls": 0, "units": 0, "retries": 0, "failures": 0}
+            )
+            method_stats["calls"] += 1
+            method_stats["units"] += units
+            method_stats["retries"] += retries
+            method_stats["failures"] += int(failed)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current rate and per-method cost accounting."""
+        with self._lock:
+            return {
+                "rate": round(self.rate, 2),
+                "max_rate": self.max_rate,
+                "methods": {method: dict(values) for method, values in self.stats.items()},
+            }
+
+
+_buckets: Dict[Any, QuotaTokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+def bucket_for(token_path=None) -> QuotaTokenBucket:
+    """The process-wide bucket for the mailbox whose token is at token_path (defaults to TOKEN_PATH)."""
+    path = resolve_token_path(token_path)
+    with _buckets_lock:
+        bucket = _buckets.get(path)
+        if bucket is None:
+            bucket = _buckets[path] = QuotaTokenBucket()
+    return bucket
+
+# Bucket used when no account-specific bucket is active: the default account's, shared with its pool
+default_bucket = bucket_for()
+_current_bucket: contextvars.ContextVar = contextvars.ContextVar("gmail_quota_bucket", default=None)
+
+@contextmanager
+def using_bucket(bucket: QuotaTokenBucket):
+    """Charge Gmail calls made in this context to `bucket` (one bucket per mailbox)."""
+    token = _current_bucket.set(bucket)
+    try:
+        yield bucket
+    finally:
+        _current_bucket.reset(token)
+
+def current_bucket() -> QuotaTokenBucket:
+    return _current_bucket.get() or default_bucket
+
+def _is_retryable(error: HttpError) -> bool:
+    status = error.resp.status
+    if status in RETRYABLE_STATUSES:
+        return True
+    if status == 403:
+        reasons = {detail.get("reason") for detail in (getattr(error, "error_details", None) or [])
+                   if isinstance(detail, dict)}
+        return bool(reasons & RATE_LIMIT_REASONS) or "rateLimitExceeded" in str(error)
+    return False
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given retry attempt (0-based)."""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+def execute_with_retry(request, method: str, bucket: Optional[QuotaTokenBucket] = None,
+                       max_retries: int = MAX_RETRIES):
+    """Execute a googleapiclient request under the quota bucket, retrying throttled responses."""
+    bucket = bucket or current_bucket()
+    cost = METHOD_COSTS.get(method, DEFAULT_METHOD_COST)
+    units = 0
+    attempt = 0
+    while True:
+        bucket.acquire(cost)
+        units += cost
+        try:
+            response = request.execute()
+        except HttpError as error:
+            if attempt >= max_retries or not _is_retryable(error):
+                bucket.record(method, units, attempt, failed=True)
+                raise
+            bucket.on_throttle()
+            delay = backoff_delay(attempt)
+            logger.warning(f"Gmail {method} returned {error.resp.status}; retry {attempt + 1}/{max_retries} in {delay:.2f}s")
+            time.sleep(delay)
+            attempt += 1
+            continue
+        bucket.on_success()
+        bucket.record(method, units, attempt)
+        return response
@@ -0,0 +1,147 @@
+"""
+Shared Gmail API service factory.
+
+Getting a Gmail service used to mean re-reading token.json, possibly
+refreshing it, and parsing the discovery document on every call. A
+GmailServiceFactory loads an account's credentials once and keeps them in
+memory. It builds services from the discovery document that auth parses
+once per process, and caches one service per thread, since each service
+rides on a single non-thread-safe httplib2 transport.
+refresh_credentials_periodically refreshes loaded credentials shortly before
+they expire, so requests do not pay for the refresh, and writes the new
+token back to its file.
+
+Factories are shared per token file through get_service_factory, so the
+legacy API, gmail_utils and the mailbox client pools all use one set of
+credentials per account.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from google.auth.transport.requests import Request
+
+from auth import build_gmail_service, get_credentials, resolve_token_path, save_credentials
+
+logger = logging.getLogger(__name__)
+
+# Credentials are refreshed once they are this close to expiring
+GMAIL_REFRESH_MARGIN_SECONDS = int(os.getenv("GMAIL_REFRESH_MARGIN_SECONDS", "600"))
+# How often the background refresher checks expiry times
+GMAIL_REFRESH_CHECK_SECONDS = int(os.getenv("GMAIL_REFRESH_CHECK_SECONDS", "60"))
+
+
+class GmailServiceFactory:
+    """In-memory credentials and per-thread Gmail services for one token file."""
+
+    def __init__(self, token_path=None):
+        self.token_path = resolve_token_path(token_path)
+        self._credentials = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.refreshes = 0
+        self.services_built = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._credentials is not None
+
+    @property
+    def credentials(self):
+        """The account's credentials, read from the token file on first use."""
+        if self._credentials is None:
+            with self._lock:
+                if self._credentials is None:
+                    self._credentials = get_credentials(self.token_path)
+        return self._credentials
+
+    def seconds_until_expiry(self) -> Optional[float]:
+        """Seconds until the access token expires; None if unknown or not loaded."""
+        expiry = self._credentials.expiry if self._credentials is not None else None
+        if expiry is None:
+            return None
+        # google-auth keeps expiry as a naive UTC datetime
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return (expiry.replace(tzinfo=None) - now).total_seconds()
+
+    def refresh_if_expiring(self, margin: float = GMAIL_REFRESH_MARGIN_SECONDS) -> bool:
+        """Refresh the credentials if they expire within margin seconds; returns whether they were refreshed."""
+        credentials = self.credentials
+        with self._lock:
+            remaining = self.seconds_until_expiry()
+            if credentials.valid and (remaining is None or remaining > margin):
+                return False
+            if not credentials.refresh_token:
+                logger.warning(f"Gmail credentials in {self.token_path} expire soon and cannot be refreshed.")
+                return False
+            credentials.refresh(Request())
+            self.refreshes += 1
+        logger.info(f"Refreshed Gmail credentials for {self.token_path.name}.")
+        save_credentials(credentials, self.token_path)
+        return True
+
+    def new_service(self, http=None):
+        """A new service on the shared credentials (or over a caller-owned transport)."""
+        service = build_gmail_service(self.credentials, http=http)
+        self.services_built += 1
+        return service
+
+    def service(self):
+        """The calling thread's service, built on its first use."""
+        service = getattr(self._local, "service", None)
+        if service is None:
+            service = self._local.service = self.new_service()
+        return service
+
+    def snapshot(self) -> Dict:
+        remaining = self.seconds_until_expiry()
+        return {
+            "token": self.token_path.name,
+            "loaded": self.loaded,
+            "expires_in_seconds": round(remaining) if remaining is not None else None,
+            "refreshes": self.refreshes,
+            "services_built": self.services_built,
+        }
+
+
+_factories: Dict[Path, GmailServiceFactory] = {}
+_factories_lock = threading.Lock()
+
+def get_service_factory(token_path=None) -> GmailServiceFactory:
+    """The process-wide factory for the token at token_path (defaults to TOKEN_PATH)."""
+    path = resolve_token_path(token_path)
+    with _factories_lock:
+        factory = _factories.get(path)
+        if factory is None:
+            factory = _factories[path] = GmailServiceFactory(path)
+    return factory
+
+def get_gmail_service(token_path=None):
+    """The calling thread's Gmail service for the token at token_path, reusing credentials and services."""
+    return get_service_factory(token_path).service()
+
+async def refresh_credentials_periodically(check_seconds: float = GMAIL_REFRESH_CHECK_SECONDS,
+                                           margin: float = GMAIL_REFRESH_MARGIN_SECONDS):
+    """Refresh loaded credentials ahead of expiry, forever."""
+    while True:
+        with _factories_lock:
+            factories = list(_factories.values())
+        # Unloaded factories are left alone: loading may need an interactive login
+        for factory in factories:
+            if not factory.loaded:
+                continue
+            try:
+                await asyncio.to_thread(factory.refresh_if_expiring, margin)
+            except Exception as e:
+                logger.error(f"Proactive refresh of {factory.token_path.name} failed: {e}")
+        await asyncio.sleep(check_seconds)
+
+def snapshot() -> List[Dict]:
+    """Credential state of every factory, for the metrics endpoints."""
+    with _factories_lock:
+        return [factory.snapshot() for factory in _factories.values()]
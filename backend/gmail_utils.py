@@ -2,28 +2,22 @@ import base64
 import email
 from email.header import decode_header
 import logging
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
 from googleapiclient.errors import HttpError
 from datetime import datetime
 import dateutil.parser as parser # For parsing date strings
 
-# Import the service getter from auth.py
-from auth import get_gmail_service
+# Shared per-thread services on in-memory credentials (see gmail_service.py)
+from gmail_service import get_gmail_service
+from mime_extractor import extract_body
+from gmail_quota import execute_with_retry
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Cache for the service to avoid re-authentication within the same run
-_gmail_service = None
-
 def _get_service():
-    """Gets the authenticated Gmail service, caching it locally."""
-    global _gmail_service
-    if _gmail_service is None:
-        logger.info("Initializing Gmail service...")
-        _gmail_service = get_gmail_service()
-        logger.info("Gmail service initialized.")
-    return _gmail_service
+    """Gets the authenticated Gmail service for the default account (cached per thread)."""
+    return get_gmail_service()
 
 def _decode_header_simple(header: Optional[str]) -> str:
     """Simplified header decoding."""
@@ -46,52 +40,96 @@ def _decode_header_simple(header: Optional[str]) -> str:
 
 
 def _parse_email_part(part: Dict[str, Any]) -> str:
-    """Recursively parses email parts to find plain text body."""
-    mimeType = part.get('mimeType', '')
-    body = part.get('body', {})
-    data = body.get('data')
-    text = ''
-
-    if 'text/plain' in mimeType and data:
-        # Decode base64url
-        text = base64.urlsafe_b64decode(data).decode('utf-8', errors='replace')
-    elif 'multipart/' in mimeType:
-        parts = part.get('parts', [])
-        for sub_part in parts:
-            text = _parse_email_part(sub_part)
-            # Return the first plain text part found
-            if text:
-                break
-    # Add handling for text/html if plain text is not found (optional)
-    # elif 'text/html' in mimeType and data:
-    #     html_content = base64.urlsafe_b64decode(data).decode('utf-8', errors='replace')
-    #     # Basic HTML stripping (consider using a library like beautifulsoup4 for robustness)
-    #     import re
-    #     text = re.sub('<[^<]+?>', '', html_content)
-
-    return text
-
-def fetch_recent_emails(max_results: int = 10, only_unread: bool = True) -> List[Dict]:
+    """Extracts the plain text body from an email payload (see mime_extractor.extract_body)."""
+    return extract_body(part)
+
+def _fetch_email_metadata(service, msg_id: str) -> Dict:
+    """Fetches headers and snippet for one message (raises HttpError on API failure)."""
+    # Fetch message metadata (headers, snippet)
+    # We fetch 'minimal' first, then potentially 'full' if needed later
+    # For summary, snippet might be enough often.
+    msg = execute_with_retry(service.users().messages().get(
+        userId='me',
+        id=msg_id,
+        format='metadata', # Fetch only headers and snippet initially
+        metadataHeaders=['Subject', 'From', 'Date']
+    ), 'messages.get.metadata')
+
+    payload = msg.get('payload', {})
+    headers = payload.get('headers', [])
+    snippet = msg.get('snippet', '')
+
+    email_info = {
+        'id': msg['id'],
+        'threadId': msg['threadId'],
+        'historyId': msg.get('historyId'),
+        'subject': '',
+        'sender': '',
+        'date': '',
+        'snippet': snippet,
+        'body': None, # Body fetched separately if needed
+        'is_full': False
+    }
+
+    # Extract headers
+    for header in headers:
+        name = header.get('name', '').lower()
+        value = header.get('value', '')
+        if name == 'subject':
+            email_info['subject'] = _decode_header_simple(value)
+        elif name == 'from':
+            email_info['sender'] = _decode_header_simple(value)
+        elif name == 'date':
+            # Parse date string into a standard format (ISO 8601)
+            try:
+                # Use dateutil.parser which handles various formats
+                dt_obj = parser.parse(value)
+                # Convert to timezone-aware ISO format string
+                email_info['date'] = dt_obj.isoformat()
+            except Exception as date_err:
+                logger.warning(f"Could not parse date header '{value}': {date_err}")
+                email_info['date'] = value # Fallback to original string
+
+    # Placeholder: Add body later if needed for summarization or full view
+    # For initial list, snippet is often sufficient
+    email_info['content'] = snippet # Use snippet as initial content
+
+    return email_info
+
+def fetch_emails_metadata(message_ids: List[str], service=None) -> List[Dict]:
+    """Fetches basic details (headers, snippet) for the given message IDs, skipping failures."""
+    service = service or _get_service()
+    emails_data = []
+    for msg_id in message_ids:
+        try:
+            emails_data.append(_fetch_email_metadata(service, msg_id))
+        except HttpError as error:
+            logger.error(f'An error occurred fetching message {msg_id}: {error}')
+        except Exception as e:
+             logger.error(f'An unexpected error occurred processing message {msg_id}: {e}')
+    return emails_data
+
+def fetch_recent_emails(max_results: int = 10, only_unread: bool = True, service=None) -> List[Dict]:
     """Fetches recent emails using the Gmail API.
 
     Args:
         max_results: Maximum number of emails to fetch.
         only_unread: If True, fetches only unread emails. Otherwise fetches recent emails.
+        service: Gmail service to use. Defaults to the cached service for the default account.
 
     Returns:
         A list of dictionaries, each containing basic email details.
     """
-    service = _get_service()
-    emails_data = []
+    service = service or _get_service()
     try:
         # List messages
         query = 'is:unread' if only_unread else ''
-        results = service.users().messages().list(
+        results = execute_with_retry(service.users().messages().list(
             userId='me',
             labelIds=['INBOX'],
             maxResults=max_results,
             q=query
-        ).execute()
+        ), 'messages.list')
 
         messages = results.get('messages', [])
         if not messages:
@@ -99,65 +137,7 @@ def fetch_recent_emails(max_results: int = 10, only_unread: bool = True) -> List
             return []
 
         logger.info(f"Found {len(messages)} messages, fetching details...")
-
-        for msg_ref in messages:
-            msg_id = msg_ref['id']
-            try:
-                # Fetch message metadata (headers, snippet)
-                # We fetch 'minimal' first, then potentially 'full' if needed later
-                # For summary, snippet might be enough often.
-                msg = service.users().messages().get(
-                    userId='me',
-                    id=msg_id,
-                    format='metadata', # Fetch only headers and snippet initially
-                    metadataHeaders=['Subject', 'From', 'Date']
-                ).execute()
-
-                payload = msg.get('payload', {})
-                headers = payload.get('headers', [])
-                snippet = msg.get('snippet', '')
-
-                email_info = {
-                    'id': msg['id'],
-                    'threadId': msg['threadId'],
-                    'subject': '',
-                    'sender': '',
-                    'date': '',
-                    'snippet': snippet,
-                    'body': None, # Body fetched separately if needed
-                    'is_full': False
-                }
-
-                # Extract headers
-                for header in headers:
-                    name = header.get('name', '').lower()
-                    value = header.get('value', '')
-                    if name == 'subject':
-                        email_info['subject'] = _decode_header_simple(value)
-                    elif name == 'from':
-                        email_info['sender'] = _decode_header_simple(value)
-                    elif name == 'date':
-                        # Parse date string into a standard format (ISO 8601)
-                        try:
-                            # Use dateutil.parser which handles various formats
-                            dt_obj = parser.parse(value)
-                            # Convert to timezone-aware ISO format string
-                            email_info['date'] = dt_obj.isoformat()
-                        except Exception as date_err:
-                            logger.warning(f"Could not parse date header '{value}': {date_err}")
-                            email_info['date'] = value # Fallback to original string
-
-                # Placeholder: Add body later if needed for summarization or full view
-                # For initial list, snippet is often sufficient
-                email_info['content'] = snippet # Use snippet as initial content
-
-                emails_data.append(email_info)
-
-            except HttpError as error:
-                logger.error(f'An error occurred fetching message {msg_id}: {error}')
-            except Exception as e:
-                 logger.error(f'An unexpected error occurred processing message {msg_id}: {e}')
-
+        emails_data = fetch_emails_metadata([msg_ref['id'] for msg_ref in messages], service)
 
         logger.info(f"Successfully fetched details for {len(emails_data)} emails.")
         return emails_data
@@ -173,16 +153,97 @@ def fetch_recent_emails(max_results: int = 10, only_unread: bool = True) -> List
         logger.error(f'An unexpected error occurred during email fetching: {e}')
         return []
 
+def list_message_ids_page(page_token: Optional[str] = None, page_size: int = 100, query: str = '',
+                          label_ids: Optional[List[str]] = None, service=None) -> Tuple[List[str], Optional[str]]:
+    """Lists one page of message IDs, newest first.
+
+    Returns:
+        (message IDs, nextPageToken); the token is None on the last page.
+    """
+    service = service or _get_service()
+    request_args = {'userId': 'me', 'maxResults': page_size, 'q': query}
+    if label_ids:
+        request_args['labelIds'] = label_ids
+    if page_token:
+        request_args['pageToken'] = page_token
+    results = execute_with_retry(service.users().messages().list(**request_args), 'messages.list')
+    return [msg_ref['id'] for msg_ref in results.get('messages', [])], results.get('nextPageToken')
+
+def get_mailbox_profile(service=None) -> Optional[Dict]:
+    """Gets the mailbox profile (emailAddress, historyId, message counts)."""
+    service = service or _get_service()
+    try:
+        return execute_with_retry(service.users().getProfile(userId='me'), 'users.getProfile')
+    except HttpError as error:
+        logger.error(f'An API error occurred fetching the mailbox profile: {error}')
+        return None
+
+def get_mailbox_history_id(service=None) -> Optional[str]:
+    """Gets the mailbox's current historyId, used as a sync cursor."""
+    profile = get_mailbox_profile(service)
+    return profile.get('historyId') if profile else None
+
+def start_watch(topic_name: str, service=None) -> Optional[Dict]:
+    """Asks Gmail to publish inbox changes to a Pub/Sub topic.
+
+    Returns the watch response ({'historyId', 'expiration'}) or None on failure.
+    Watches expire after about a week and must be renewed.
+    """
+    service = service or _get_service()
+    try:
+        return execute_with_retry(service.users().watch(
+            userId='me',
+            body={'topicName': topic_name, 'labelIds': ['INBOX'], 'labelFilterBehavior': 'include'}
+        ), 'users.watch')
+    except HttpError as error:
+        logger.error(f'An API error occurred starting a Gmail watch on {topic_name}: {error}')
+        return None
+
+def list_new_message_ids(start_history_id: str, service=None) -> Tuple[Optional[List[str]], Optional[str]]:
+    """Lists inbox messages added since start_history_id.
+
+    Returns:
+        (message_ids, latest_history_id). message_ids is None when the cursor is
+        too old or invalid, in which case the caller should fall back to a full list.
+    """
+    service = service or _get_service()
+    message_ids = []
+    latest_history_id = start_history_id
+    page_token = None
+    try:
+        while True:
+            response = execute_with_retry(service.users().history().list(
+                userId='me',
+                startHistoryId=start_history_id,
+                historyTypes=['messageAdded'],
+                labelId='INBOX',
+                pageToken=page_token
+            ), 'history.list')
+            for record in response.get('history', []):
+                for added in record.get('messagesAdded', []):
+                    msg_id = added.get('message', {}).get('id')
+                    if msg_id and msg_id not in message_ids:
+                        message_ids.append(msg_id)
+            latest_history_id = response.get('historyId', latest_history_id)
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return message_ids, latest_history_id
+    except HttpError as error:
+        if error.resp.status == 404:
+            logger.warning(f"History cursor {start_history_id} expired; a full resync is needed.")
+        else:
+            logger.error(f'An API error occurred listing history: {error}')
+        return None, None
 
-def get_full_email_content(message_id: str) -> Optional[Dict]:
+def get_full_email_content(message_id: str, service=None) -> Optional[Dict]:
     """Gets the full details (including body) of a specific email."""
-    service = _get_service()
+    service = service or _get_service()
     try:
-        msg = service.users().messages().get(
+        msg = execute_with_retry(service.users().messages().get(
             userId='me',
             id=message_id,
             format='full' # Request full payload
-        ).execute()
+        ), 'messages.get.full')
 
         payload = msg.get('payload', {})
         headers = payload.get('headers', [])
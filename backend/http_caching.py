@@ -0,0 +1,40 @@
+"""
+HTTP conditional GET helpers (ETag / Last-Modified) shared by the API apps.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(value: Any) -> str:
+    """Strong ETag from the repr of value (use a JSON string or a tuple of version fields)."""
+    return '"' + hashlib.sha1(str(value).encode('utf-8')).hexdigest() + '"'
+
+
+def not_modified(request: Request, response: Response, etag: str,
+                 last_modified: Optional[datetime] = None) -> Optional[Response]:
+    """Set validators on response; return a 304 response if the client's cached copy is current."""
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if last_modified:
+        last_modified = last_modified.astimezone(timezone.utc).replace(microsecond=0)
+        headers['Last-Modified'] = format_datetime(last_modified, usegmt=True)
+    response.headers.update(headers)
+
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        if if_none_match.strip() == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]:
+            return Response(status_code=304, headers=headers)
+        return None
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since and last_modified:
+        try:
+            if last_modified <= parsedate_to_datetime(if_modified_since):
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+    return None
@@ -0,0 +1,249 @@
+"""
+Multi-account mailbox ingestion for Email Summarizer.
+
+Each configured Gmail account gets its own Gmail client pool, sync cursor and
+poll rate limit. New mail from all accounts is interleaved round-robin and
+processed by one bounded worker pool, so many mailboxes share a single
+summarizer and storage layer without one process per inbox.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from auth import TOKEN_PATH
+from gmail_client_pool import GmailClientPool
+from gmail_utils import (
+    fetch_emails_metadata,
+    fetch_recent_emails,
+    get_mailbox_profile,
+    list_new_message_ids,
+    start_watch,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ACCOUNT_ID = "default"
+
+# JSON list of {"id": ..., "token_path": ..., "email": ..., "active": true}; relative paths are
+# resolved against the backend directory. Without it, the single TOKEN_PATH account is used.
+ACCOUNTS_FILE = os.getenv("GMAIL_ACCOUNTS_FILE", "")
+# Minimum seconds between two polls of the same mailbox
+ACCOUNT_MIN_POLL_SECONDS = float(os.getenv("ACCOUNT_MIN_POLL_SECONDS", "30"))
+# Upper bound on emails taken from one mailbox per cycle, so a busy inbox can't starve the others
+MAX_EMAILS_PER_ACCOUNT = int(os.getenv("MAX_EMAILS_PER_ACCOUNT", "20"))
+# Number of emails processed concurrently across all mailboxes
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "4"))
+
+
+class MailboxAccount:
+    """One Gmail mailbox: its client pool, sync cursor and poll rate limit."""
+
+    def __init__(self, account_id: str, token_path: Optional[str] = None, active: bool = True,
+                 min_poll_seconds: float = ACCOUNT_MIN_POLL_SECONDS, email_address: Optional[str] = None):
+        self.account_id = account_id
+        self.token_path = token_path
+        self.email_address = email_address  # Learned from the mailbox profile if not configured
+        self.watch_expiration: Optional[float] = None  # Epoch seconds when the Gmail watch lapses
+        self.active = active
+        self.min_poll_seconds = min_poll_seconds
+        self.history_id: Optional[str] = None  # Gmail sync cursor
+        self.pending_ids: List[str] = []  # Listed past the cursor but not fetched yet (over max_results)
+        self.last_polled_at = 0.0
+        self._client_pool: Optional[GmailClientPool] = None
+        self.sync_lock = asyncio.Lock()  # One sync at a time per mailbox, so the cursor isn't reused
+
+    @property
+    def client_pool(self) -> GmailClientPool:
+        """The account's pool of Gmail clients, built on first use."""
+        if self._client_pool is None:
+            logger.info(f"Initializing Gmail client pool for account '{self.account_id}'...")
+            self._client_pool = GmailClientPool.for_token(self.token_path)
+        return self._client_pool
+
+    def is_due(self, now: Optional[float] = None) -> bool:
+        """Whether the account may be polled again under its rate limit."""
+        now = time.monotonic() if now is None else now
+        return self.active and now - self.last_polled_at >= self.min_poll_seconds
+
+    def fetch_new_metadata(self, max_results: int = MAX_EMAILS_PER_ACCOUNT, service=None) -> List[Dict]:
+        """Fetch metadata for mail that arrived since the last cursor (blocking).
+
+        The first poll, or a poll with an expired cursor, lists recent unread mail instead.
+        IDs beyond max_results are kept in pending_ids and fetched first on the next
+        cycles, since the cursor has already moved past them.
+        """
+        if service is None:
+            return self.client_pool.call(self.fetch_new_metadata, max_results)
+
+        emails = None
+        if self.history_id:
+            message_ids, latest_history_id = list_new_message_ids(self.history_id, service)
+            if message_ids is not None:
+                self.pending_ids = list(dict.fromkeys(self.pending_ids + message_ids))
+                self.history_id = latest_history_id
+                batch, self.pending_ids = self.pending_ids[:max_results], self.pending_ids[max_results:]
+                emails = fetch_emails_metadata(batch, service)
+
+        if emails is None:
+            # Take the cursor before listing, so nothing arriving in between is missed
+            profile = get_mailbox_profile(service) or {}
+            self.email_address = self.email_address or profile.get('emailAddress')
+            emails = fetch_recent_emails(max_results=max_results, only_unread=True, service=service)
+            self.history_id = profile.get('historyId') or self.history_id
+
+        for email in emails:
+            email['account_id'] = self.account_id
+        return emails
+
+    def renew_watch(self, topic_name: str, service=None) -> bool:
+        """Start or renew the Gmail push watch for this mailbox (blocking)."""
+        if service is None:
+            return self.client_pool.call(self.renew_watch, topic_name)
+        response = start_watch(topic_name, service)
+        if not response:
+            return False
+        self.watch_expiration = int(response.get('expiration', 0)) / 1000 or None
+        if not self.history_id:
+            self.history_id = response.get('historyId')
+        if not self.email_address:
+            self.email_address = (get_mailbox_profile(service) or {}).get('emailAddress')
+        logger.info(f"Gmail watch active for account '{self.account_id}' until {self.watch_expiration}")
+        return True
+
+
+def load_accounts(accounts_file: str = ACCOUNTS_FILE) -> List[MailboxAccount]:
+    """Load configured accounts, falling back to the single default token."""
+    if accounts_file:
+        path = Path(accounts_file)
+        if not path.is_absolute():
+            path = (Path(__file__).resolve().parent / path).resolve()
+        try:
+            with open(path, 'r') as f:
+                entries = json.load(f)
+            accounts = [
+                MailboxAccount(
+                    account_id=str(entry["id"]),
+                    token_path=entry.get("token_path"),
+                    active=entry.get("active", True),
+                    email_address=entry.get("email"),
+                )
+                for entry in entries
+            ]
+            if accounts:
+                logger.info(f"Loaded {len(accounts)} mailbox accounts from {path}")
+                return accounts
+            logger.warning(f"No accounts listed in {path}; using the default account.")
+        except Exception as e:
+            logger.error(f"Error loading accounts from {path}: {e}. Using the default account.")
+
+    return [MailboxAccount(DEFAULT_ACCOUNT_ID, str(TOKEN_PATH))]
+
+
+def interleave_by_account(emails: List[Dict]) -> List[Dict]:
+    """Order emails round-robin across accounts so each mailbox gets a fair share of workers."""
+    queues: Dict[Any, List[Dict]] = {}
+    for email in emails:
+        queues.setdefault(email.get('account_id'), []).append(email)
+
+    ordered = []
+    position = 0
+    while len(ordered) < len(emails):
+        for queue in queues.values():
+            if position < len(queue):
+                ordered.append(queue[position])
+        position += 1
+    return ordered
+
+
+class MailboxIngestor:
+    """Polls all configured mailboxes and feeds their mail to one shared worker pool."""
+
+    def __init__(self, accounts: Optional[List[MailboxAccount]] = None, workers: int = INGESTION_WORKERS):
+        self.accounts: Dict[str, MailboxAccount] = {
+            account.account_id: account for account in (accounts or load_accounts())
+        }
+        self._workers = asyncio.Semaphore(workers)
+
+    def get_account(self, account_id: Optional[str]) -> Optional[MailboxAccount]:
+        """Look up an account, treating a missing ID as the default account."""
+        return self.accounts.get(account_id or DEFAULT_ACCOUNT_ID)
+
+    def pool_for(self, account_id: Optional[str]) -> Optional[GmailClientPool]:
+        """Gmail client pool for an account, or None if the account is unknown."""
+        account = self.get_account(account_id)
+        return account.client_pool if account else None
+
+    def find_account_by_email(self, email_address: str) -> Optional[MailboxAccount]:
+        """Find the account whose mailbox address matches (case-insensitive)."""
+        wanted = (email_address or '').lower()
+        for account in self.accounts.values():
+            if account.email_address and account.email_address.lower() == wanted:
+                return account
+        # A single-mailbox deployment owns every notification
+        if len(self.accounts) == 1:
+            return next(iter(self.accounts.values()))
+        return None
+
+    def quota_snapshot(self) -> Dict[str, Dict]:
+        """Gmail quota usage per account that has been connected so far."""
+        return {
+            account_id: account._client_pool.quota_bucket.snapshot()
+            for account_id, account in self.accounts.items()
+            if account._client_pool is not None
+        }
+
+    async def _poll_account(self, account: MailboxAccount, max_results: int) -> List[Dict]:
+        try:
+            # Polls run on the account's own client pool threads, so accounts poll in parallel
+            async with account.sync_lock:
+                return await account.client_pool.run(account.fetch_new_metadata, max_results)
+        except Exception as e:
+            logger.error(f"Error polling account '{account.account_id}': {e}")
+            return []
+
+    async def fetch_all(self, max_results: int = MAX_EMAILS_PER_ACCOUNT) -> List[Dict]:
+        """Poll every due account and return their new mail interleaved by account."""
+        now = time.monotonic()
+        due_accounts = [account for account in self.accounts.values() if account.is_due(now)]
+        if not due_accounts:
+            return []
+        for account in due_accounts:
+            # Claim the poll slot now so overlapping callers don't poll the same mailbox twice
+            account.last_polled_at = now
+
+        results = await asyncio.gather(*(self._poll_account(account, max_results) for account in due_accounts))
+        return interleave_by_account([email for emails in results for email in emails])
+
+    async def fetch_account(self, account_id: str, max_results: int = MAX_EMAILS_PER_ACCOUNT) -> List[Dict]:
+        """Sync one mailbox right away, ignoring its poll interval (used for push notifications)."""
+        account = self.accounts.get(account_id)
+        if not account or not account.active:
+            return []
+        account.last_polled_at = time.monotonic()
+        return await self._poll_account(account, max_results)
+
+    async def renew_watches(self, topic_name: str) -> int:
+        """Start or renew push watches on every active mailbox; returns how many succeeded."""
+        async def renew(account: MailboxAccount) -> bool:
+            try:
+                return await account.client_pool.run(account.renew_watch, topic_name)
+            except Exception as e:
+                logger.error(f"Error renewing Gmail watch for account '{account.account_id}': {e}")
+                return False
+
+        results = await asyncio.gather(*(renew(account) for account in self.accounts.values() if account.active))
+        return sum(results)
+
+    async def process_all(self, emails: List[Dict],
+                          handler: Callable[[Dict], Awaitable[Optional[Dict]]]) -> List[Optional[Dict]]:
+        """Run handler over emails with at most `workers` in flight, in fair account order."""
+        async def run(email: Dict) -> Optional[Dict]:
+            async with self._workers:
+                return await handler(email)
+
+        return await asyncio.gather(*(run(email) for email in interleave_by_account(emails)))
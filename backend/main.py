@@ -21,7 +21,7 @@ logger = logging.getLogger(__name__)
 
 # --- Storage Setup --- #
 # Import the storage manager factory
-from storage_manager import get_storage_manager
+from storage_manager import get_storage_manager, build_summary_record
 
 # Get the configured storage option
 STORAGE_OPTION = os.getenv("STORAGE_OPTION", "local").lower()
@@ -72,15 +72,29 @@ except Exception as e:
 
 # --- Application Imports --- #
 # Use functions directly from gmail_utils
-from gmail_utils import fetch_recent_emails, get_full_email_content
-from summarizer import summarize_email, format_summary, initialize_model # Keep summarizer
+from gmail_utils import get_full_email_content
+from summarizer import summarize_email_async, format_summary, initialize_model, should_shed, inference_load # Keep summarizer
+from extractive_summarizer import summarize_extractive
+from summarization_backends import SUMMARIZER_BACKEND
+from mailbox_ingestion import MailboxIngestor
+from gmail_quota import default_bucket
+from gmail_service import refresh_credentials_periodically, snapshot as gmail_credentials_snapshot
+from poll_scheduler import PollScheduler
+from push_notifications import PushNotificationHandler, GMAIL_PUSH_TOPIC, WATCH_RENEW_SECONDS
+from work_queue import WorkQueue, STATE_SUMMARIZING, drain
+from single_flight import SingleFlight
+from events_store import EventStore, parse_range, EVENTS_DEFAULT_DAYS_AHEAD
+from search_index import SearchIndex, SEARCH_MAX_PAGE_SIZE
+from thread_summaries import ThreadSummarizer
+from reminder_scheduler import Reminder, ReminderScheduler, REMINDER_LEAD_MINUTES
+from http_caching import make_etag, not_modified
 from email_classifier import EmailClassifier # Keep classifier
-from event_extractor import EventExtractor # Keep event extractor
+from event_extractor import EventExtractor, events_to_dicts # Keep event extractor
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 
 # --- FastAPI Setup --- #
 app = FastAPI()
@@ -94,9 +108,33 @@ app.add_middleware(
 
 # --- Initialize Components --- #
 # No need for GmailIMAP client anymore
-initialize_model()  # Initialize the Pegasus summarizer model
+if SUMMARIZER_BACKEND == "transformers":
+    initialize_model()  # Load the default summarizer model up front
 classifier = EmailClassifier()
 event_extractor = EventExtractor()
+ingestor = MailboxIngestor()  # One ingestor for all configured Gmail accounts
+poll_scheduler = PollScheduler()  # Shared adaptive poll interval
+work_queue = WorkQueue()  # Durable record of emails being processed, survives restarts
+email_flights = SingleFlight()  # One in-progress processing run per email ID
+event_store = EventStore()  # Events read model, indexed by date
+search_index = SearchIndex()  # Full-text index over stored summaries
+thread_summarizer = ThreadSummarizer()  # One incrementally updated summary per thread
+
+# User settings pushed from the Settings page
+app_settings = {
+    'checkFrequency': poll_scheduler.max_interval / 60, # minutes
+    'reminderTime': REMINDER_LEAD_MINUTES, # minutes before event
+}
+reminder_scheduler = ReminderScheduler(app_settings['reminderTime'])  # Upcoming event reminders, by fire time
+
+# --- Tiered Processing Settings --- #
+# With tiered processing, new emails are first classified from metadata + snippet
+# and broadcast as provisional results; the full body is fetched only when needed.
+TIERED_PROCESSING = os.getenv("TIERED_PROCESSING", "true").lower() == "true"
+# Gmail cuts snippets at roughly 200 characters, so a shorter snippet is the whole body
+SNIPPET_TRUNCATION_CHARS = int(os.getenv("SNIPPET_TRUNCATION_CHARS", "190"))
+# Emails at or above this importance always get a full-body summary
+FULL_FETCH_MIN_IMPORTANCE = int(os.getenv("FULL_FETCH_MIN_IMPORTANCE", "3"))
 
 # --- WebSocket Connection Manager --- #
 class ConnectionManager:
@@ -127,12 +165,151 @@ class ConnectionManager:
 manager = ConnectionManager()
 
 # --- Helper Functions --- #
-async def process_and_store_email(email_metadata: Dict) -> Optional[Dict]:
-    """Processes a single email: check storage, fetch full if needed, summarize, classify, store."""
+def _build_processed_data(email_id: str, email_data: Dict, summary: str,
+                          enriched_email: Dict, events_list: List) -> Dict:
+    """Shape processed email data for storage and API responses."""
+    return build_summary_record(email_id, email_data, summary, enriched_email, events_to_dicts(events_list))
+
+def build_provisional_result(email_metadata: Dict) -> Dict:
+    """Classify and extract events from metadata + snippet only (no Gmail fetch, no model run)."""
+    return build_provisional_results([email_metadata])[0]
+
+def build_provisional_results(email_metadata_list: List[Dict]) -> List[Dict]:
+    """build_provisional_result for many emails, classified in one batch."""
+    snippet_emails = [{**meta, 'body': meta.get('snippet', '')} for meta in email_metadata_list]
+    results = []
+    for meta, snippet_email, enriched_email in zip(
+        # Provisional only: the final classification is what the sender profiles learn from
+        email_metadata_list, snippet_emails, classifier.enrich_emails_with_classification(snippet_emails, observe=False)
+    ):
+        events_list = event_extractor.extract_events(snippet_email)
+        provisional_data = _build_processed_data(meta['id'], meta, snippet_email['body'], enriched_email, events_list)
+        provisional_data['provisional'] = True
+        results.append(provisional_data)
+    return results
+
+def needs_full_fetch(email_metadata: Dict, importance: int) -> bool:
+    """Whether an email needs its full body fetched and summarized."""
+    if not TIERED_PROCESSING:
+        return True
+    snippet = email_metadata.get('snippet', '')
+    return importance >= FULL_FETCH_MIN_IMPORTANCE or len(snippet) >= SNIPPET_TRUNCATION_CHARS
+
+# --- Load Shedding --- #
+# While the model is backed up, new emails get an extractive summary right away
+# and are queued here to be upgraded once the model is idle.
+SHED_UPGRADE_POLL_SECONDS = float(os.getenv("SHED_UPGRADE_POLL_SECONDS", "5"))
+upgrade_queue: "asyncio.Queue[Dict]" = asyncio.Queue()
+# Categories whose trusted senders (see sender_profiles.py) get an extractive summary instead of a model run
+SKIP_SUMMARY_CATEGORIES = set(filter(None, os.getenv("SKIP_SUMMARY_CATEGORIES", "spam").split(",")))
+
+async def summarize_or_shed(email_id: str, email_data: Dict) -> Tuple[str, str]:
+    """Summarize with the model, or extractively while it is overloaded or for profiled low-value senders; returns (summary, kind)."""
+    subject = email_data.get('subject', '')
+    sender = email_data.get('sender', '')
+    snippet = email_data.get('snippet', '')
+    body = email_data.get('body', '')
+    if classifier.profiles is not None and classifier.profiles.skip_summary(sender, SKIP_SUMMARY_CATEGORIES):
+        logger.info(f"Sender of email {email_id} is profiled as {SKIP_SUMMARY_CATEGORIES}; skipping the model.")
+        return summarize_extractive(subject, sender, snippet, body), 'sender-profile'
+    if should_shed():
+        logger.info(f"Summarizer overloaded; using an extractive summary for email {email_id}.")
+        upgrade_queue.put_nowait({'id': email_id, 'account_id': email_data.get('account_id'),
+                                  'subject': subject, 'sender': sender, 'snippet': snippet, 'body': body})
+        return summarize_extractive(subject, sender, snippet, body), 'extractive'
+    return await summarize_email_async(subject, sender, snippet, body), 'abstractive'
+
+async def upgrade_extractive_summaries():
+    """Replace extractive summaries with model summaries whenever the model is idle."""
+    while True:
+        item = await upgrade_queue.get()
+        while inference_load()['pending'] > 0:
+            await asyncio.sleep(SHED_UPGRADE_POLL_SECONDS)
+        email_id = item['id']
+        try:
+            if item.get('body') is None:
+                # Queued from storage after a restart; the body has to be fetched again
+                client_pool = ingestor.pool_for(item.get('account_id'))
+                full_email_data = await client_pool.run(get_full_email_content, email_id) if client_pool else None
+                if not full_email_data:
+                    continue
+                item.update(full_email_data)
+            summary = await summarize_email_async(item['subject'], item['sender'], item['snippet'], item['body'])
+            stored_data = storage_manager.get_summary(email_id)
+            if not stored_data or stored_data.get('summary_kind') != 'extractive':
+                continue
+            stored_data['summary'] = summary
+            stored_data['summary_kind'] = 'abstractive'
+            storage_manager.store_summary(email_id, stored_data)
+            search_index.index_records([stored_data])
+            logger.info(f"Upgraded email {email_id} to an abstractive summary.")
+            await broadcast_results([stored_data])
+        except Exception as e:
+            logger.error(f"Failed to upgrade summary for email {email_id}: {e}")
+
+# --- Thread Summaries --- #
+# Updating a thread summary is a second model pass per reply, so it happens off
+# the request path: one worker applies queued updates in arrival order, and only
+# while the model has no other work (the same rule as the upgrades above).
+thread_update_queue: "asyncio.Queue[Tuple[Dict, Optional[str]]]" = asyncio.Queue()
+
+async def update_thread_summaries():
+    """Fold stored messages into their thread summaries whenever the model is idle."""
+    while True:
+        record, body = await thread_update_queue.get()
+        while inference_load()['pending'] > 0:
+            await asyncio.sleep(SHED_UPGRADE_POLL_SECONDS)
+        try:
+            await thread_summarizer.update(record, body)
+        except Exception as e:
+            logger.error(f"Failed to update thread summary for email {record.get('id')}: {e}")
+
+# Stored summaries read on startup to seed the events read model, search index and reminders
+EVENTS_SEED_LIMIT = int(os.getenv("EVENTS_SEED_LIMIT", "1000"))
+
+@app.on_event("startup")
+async def load_stored_events():
+    """Index summaries stored before the read models existed and schedule their reminders."""
+    records = await asyncio.to_thread(storage_manager.get_recent_summaries, EVENTS_SEED_LIMIT)
+    if event_store.version() is None:
+        event_store.index_records(records)
+        logger.info(f"Seeded events read model from {len(records)} stored summaries")
+    if search_index.count() == 0:
+        # Larger mailboxes: python search_index.py --rebuild
+        await asyncio.to_thread(search_index.index_records, records)
+        logger.info(f"Seeded search index from {len(records)} stored summaries")
+    scheduled = reminder_scheduler.schedule_records(records)
+    logger.info(f"Scheduled {scheduled} event reminders from stored summaries")
+    asyncio.create_task(reminder_scheduler.run(send_reminders))
+
+@app.on_event("startup")
+async def start_summary_upgrades():
+    """Requeue extractive summaries left over from the last run, then keep upgrading."""
+    for stored_data in storage_manager.get_recent_summaries(limit=200):
+        if stored_data.get('summary_kind') == 'extractive':
+            upgrade_queue.put_nowait({'id': stored_data['id'], 'account_id': stored_data.get('account_id'), 'body': None})
+    asyncio.create_task(upgrade_extractive_summaries())
+    asyncio.create_task(update_thread_summaries())
+
+async def send_reminders(reminders: List[Reminder]):
+    """Send due event reminders to every connected client as one notification message."""
+    logger.info(f"Sending {len(reminders)} event reminders")
+    await manager.broadcast(json.dumps({
+        'type': 'notification',
+        'data': [reminder.to_dict() for reminder in reminders]
+    }))
+
+async def process_and_store_email(email_metadata: Dict, provisional: Optional[Dict] = None) -> Optional[Dict]:
+    """Processes a single email, sharing the work with any concurrent caller for the same ID."""
     email_id = email_metadata.get('id')
     if not email_id:
         logger.warning("Email metadata missing ID.")
         return None
+    return await email_flights.run(email_id, lambda: _process_and_store_email(email_metadata, provisional))
+
+async def _process_and_store_email(email_metadata: Dict, provisional: Optional[Dict] = None) -> Optional[Dict]:
+    """Processes a single email: check storage, fetch full if needed, summarize, classify, store."""
+    email_id = email_metadata['id']
 
     try:
         # 1. Check storage for existing summary
@@ -148,51 +325,63 @@ async def process_and_store_email(email_metadata: Dict) -> Optional[Dict]:
                 # Fall through to regenerate it
         
         logger.info(f"No summary for email {email_id} in storage. Processing...")
-        # 2. Fetch full email content (needed for robust summarization/classification)
-        full_email_data = get_full_email_content(email_id)
-        if not full_email_data:
-            logger.error(f"Failed to fetch full content for email {email_id}.")
-            return None # Skip this email if full content fails
-
-        # 3. Summarize
-        summary = summarize_email(
-            full_email_data.get('subject', ''),
-            full_email_data.get('sender', ''),
-            full_email_data.get('snippet', ''),
-            full_email_data.get('body', '')
-        )
-
-        # 4. Classify & Enrich
-        # Ensure classifier expects dict
-        enriched_email = classifier.enrich_email_with_classification(full_email_data)
-        category = enriched_email.get('category', 'Uncategorized')
-        importance = enriched_email.get('importance', 0)
-        icon = enriched_email.get('icon', '')
-
-        # 5. Extract Events
-        events_list = event_extractor.extract_events(full_email_data)
-        events_data = [event.to_dict() for event in events_list]
-
-        # 6. Prepare data for storage and API response
-        processed_data = {
-            'id': email_id,
-            'threadId': full_email_data.get('threadId'),
-            'subject': full_email_data.get('subject', ''),
-            'sender': full_email_data.get('sender', ''),
-            'date': full_email_data.get('date', datetime.now().isoformat()), # Use fetched date
-            'snippet': full_email_data.get('snippet', ''),
-            'summary': summary,
-            'category': category,
-            'importance': importance,
-            'icon': icon,
-            'events': events_data,
-            'original_link': f"https://mail.google.com/mail/u/0/#inbox/{email_id}",
-        }
+        # 2. Decide which tier this email needs: callers may already hold the full body
+        if email_metadata.get('is_full'):
+            full_email_data = email_metadata
+        else:
+            if provisional is None:
+                provisional = build_provisional_result(email_metadata)
+            if needs_full_fetch(email_metadata, provisional.get('importance', 0)):
+                account_id = email_metadata.get('account_id')
+                client_pool = ingestor.pool_for(account_id)
+                if client_pool:
+                    # Off the event loop, on a pooled client owned by this thread
+                    full_email_data = await client_pool.run(get_full_email_content, email_id)
+                else:
+                    # Throttled requests back off with blocking sleeps, so never run them on the event loop
+                    full_email_data = await asyncio.to_thread(get_full_email_content, email_id)
+                if not full_email_data:
+                    logger.error(f"Failed to fetch full content for email {email_id}.")
+                    return None # Skip this email if full content fails
+                full_email_data['account_id'] = account_id
+            else:
+                full_email_data = None
+
+        work_queue.set_state(email_id, STATE_SUMMARIZING)
+        if full_email_data:
+            # 3. Summarize
+            summary, summary_kind = await summarize_or_shed(email_id, full_email_data)
+
+            # 4. Classify & Enrich
+            # Ensure classifier expects dict
+            enriched_email = classifier.enrich_email_with_classification(full_email_data)
+
+            # 5. Extract Events
+            events_list = event_extractor.extract_events(full_email_data)
+
+            # 6. Prepare data for storage and API response
+            processed_data = _build_processed_data(email_id, full_email_data, summary, enriched_email, events_list)
+            processed_data['summary_kind'] = summary_kind
+        else:
+            # Snippet tier: the snippet is the whole body, so reuse the provisional
+            # classification and events and only summarize the snippet
+            logger.info(f"Email {email_id} is short and not important; summarizing snippet only.")
+            snippet = email_metadata.get('snippet', '')
+            processed_data = {key: value for key, value in provisional.items() if key != 'provisional'}
+            # The provisional classification is final here, so it is the one the sender profile learns
+            classifier.observe(email_metadata, processed_data['category'], processed_data['importance'])
+            processed_data['summary'], processed_data['summary_kind'] = await summarize_or_shed(
+                email_id, {**email_metadata, 'body': snippet}
+            )
 
         # 7. Store in the selected storage
         success = storage_manager.store_summary(email_id, processed_data)
         if success:
             logger.info(f"Stored summary for email {email_id} in {STORAGE_OPTION} storage.")
+            event_store.index_records([processed_data])
+            search_index.index_records([processed_data])
+            reminder_scheduler.schedule_records([processed_data])
+            thread_update_queue.put_nowait((processed_data, full_email_data.get('body') if full_email_data else None))
         else:
             logger.warning(f"Failed to store summary for email {email_id} in {STORAGE_OPTION} storage.")
 
@@ -200,12 +389,109 @@ async def process_and_store_email(email_metadata: Dict) -> Optional[Dict]:
         api_response_data = processed_data.copy()
         api_response_data['processed_at'] = datetime.now().isoformat() # Add timestamp
         api_response_data['source'] = 'new'  # Indicate newly processed
+        api_response_data['provisional'] = False
         return api_response_data
 
     except Exception as e:
         logger.error(f"Error processing email {email_id}: {e}")
         return None
 
+async def process_queued_email(email_metadata: Dict, provisional: Optional[Dict] = None) -> Optional[Dict]:
+    """Process an email through the work queue, so an interrupted run is resumed after a restart."""
+    email_id = email_metadata.get('id')
+    if not email_id:
+        return await process_and_store_email(email_metadata, provisional)
+    work_queue.enqueue(email_metadata)
+    if not work_queue.claim(email_id):
+        # Already finished (serve it from storage) or being processed by another worker
+        if storage_manager.summary_exists(email_id):
+            return await process_and_store_email(email_metadata, provisional)
+        return None
+    result = await process_and_store_email(email_metadata, provisional)
+    if result:
+        work_queue.complete(email_id)
+    else:
+        work_queue.fail(email_id, "processing failed")
+    return result
+
+async def ingest_emails(email_metadata_list: List[Dict]) -> List[Optional[Dict]]:
+    """Broadcast provisional results for unseen emails, then fully process them on the shared worker pool."""
+    provisional_results = {}
+    if TIERED_PROCESSING:
+        unseen = [meta for meta in email_metadata_list if meta.get('id') and not storage_manager.summary_exists(meta['id'])]
+        for provisional in build_provisional_results(unseen):
+            provisional_results[provisional['id']] = provisional
+    if provisional_results:
+        provisional_list = sorted(provisional_results.values(), key=lambda x: x.get('importance', 0), reverse=True)
+        logger.info(f"Broadcasting {len(provisional_list)} provisional summaries.")
+        await manager.broadcast(json.dumps({
+            'type': 'email_update',
+            'data': provisional_list
+        }))
+
+    # Emails from all mailboxes share one bounded worker pool, in round-robin order
+    return await ingestor.process_all(
+        email_metadata_list,
+        lambda meta: process_queued_email(meta, provisional_results.get(meta.get('id')))
+    )
+
+async def broadcast_results(results: List[Dict]):
+    """Send processed emails to every connected client, most important first."""
+    results = sorted(results, key=lambda x: x.get('importance', 0), reverse=True)
+    await manager.broadcast(json.dumps({
+        'type': 'email_update',
+        'data': results
+    }))
+
+@app.on_event("startup")
+async def resume_work_queue():
+    """Requeue jobs interrupted by the last shutdown and keep draining the queue (retries included)."""
+    work_queue.recover()
+    asyncio.create_task(drain(work_queue, process_and_store_email, broadcast_results))
+
+# --- Push Notifications --- #
+def _account_id_for_email(email_address: str) -> Optional[str]:
+    account = ingestor.find_account_by_email(email_address)
+    return account.account_id if account else None
+
+push_handler = PushNotificationHandler(_account_id_for_email)
+
+async def sync_account_from_push(account_id: str):
+    """Incremental sync of one mailbox after a push notification; broadcasts what it processed."""
+    email_metadata_list = await ingestor.fetch_account(account_id)
+    if not email_metadata_list:
+        return
+    logger.info(f"Push sync for account '{account_id}' found {len(email_metadata_list)} new emails.")
+    results = [result for result in await ingest_emails(email_metadata_list) if result]
+    if results:
+        await broadcast_results(results)
+
+async def renew_watches_periodically():
+    """Keep Gmail push watches alive; polling remains the fallback if they lapse."""
+    while True:
+        renewed = await ingestor.renew_watches(GMAIL_PUSH_TOPIC)
+        logger.info(f"Renewed Gmail watches on {renewed} mailbox(es).")
+        await asyncio.sleep(WATCH_RENEW_SECONDS)
+
+@app.on_event("startup")
+async def start_push_intake():
+    asyncio.create_task(push_handler.run_sync_worker(sync_account_from_push))
+    # Mailbox pools share gmail_service credentials; keep them fresh ahead of expiry
+    asyncio.create_task(refresh_credentials_periodically())
+    if GMAIL_PUSH_TOPIC:
+        asyncio.create_task(renew_watches_periodically())
+    else:
+        logger.info("GMAIL_PUSH_TOPIC not set; relying on polling only.")
+
+@app.post("/gmail/push")
+async def gmail_push(envelope: Dict):
+    """Receives Gmail push notifications delivered by a Pub/Sub push subscription."""
+    status = push_handler.handle(envelope)
+    if status in ('queued', 'duplicate'):
+        poll_scheduler.record_push()
+    # Always acknowledge with 2xx; Pub/Sub would otherwise redeliver malformed messages forever
+    return {'status': status}
+
 # --- WebSocket Endpoint --- #
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -214,23 +500,34 @@ async def websocket_endpoint(websocket: WebSocket):
     processed_ids_this_session = set() # Track IDs sent in this connection lifetime
 
     try:
+        # Mailboxes are polled incrementally, so start the client off with what is already stored
+        stored_emails = storage_manager.get_recent_summaries(20)
+        if stored_emails:
+            stored_emails.sort(key=lambda x: x.get('importance', 0), reverse=True)
+            await websocket.send_text(json.dumps({'type': 'email_update', 'data': stored_emails}))
+            processed_ids_this_session.update(email['id'] for email in stored_emails)
+
         while True:
-            # 1. Fetch recent email metadata (only IDs, basic headers, snippet)
+            # 1. Fetch new email metadata (only IDs, basic headers, snippet) from every due mailbox
             logger.info("Checking for new emails...")
             try:
-                # Fetch only unread emails
-                email_metadata_list = fetch_recent_emails(max_results=20, only_unread=True)
+                email_metadata_list = await ingestor.fetch_all(max_results=20)
             except Exception as fetch_err:
                  logger.error(f"Error fetching email list from Gmail API: {fetch_err}")
                  email_metadata_list = [] # Continue loop, maybe connection will recover
-                 await asyncio.sleep(15) # Shorter sleep on API error
+                 await asyncio.sleep(poll_scheduler.record_error()) # Shorter sleep on API error
                  continue
 
             processed_emails_for_broadcast = []
-            if email_metadata_list:
-                logger.info(f"Fetched {len(email_metadata_list)} email metadata items. Processing...")
-                tasks = [process_and_store_email(meta) for meta in email_metadata_list]
-                results = await asyncio.gather(*tasks)
+            # Skip emails already sent on this connection
+            new_metadata_list = [
+                meta for meta in email_metadata_list
+                if meta.get('id') not in processed_ids_this_session
+            ]
+            if new_metadata_list:
+                logger.info(f"Fetched {len(new_metadata_list)} new email metadata items. Processing...")
+                # 2. Provisional broadcast, then full processing
+                results = await ingest_emails(new_metadata_list)
 
                 for result in results:
                     if result and result.get('id') not in processed_ids_this_session:
@@ -250,8 +547,10 @@ async def websocket_endpoint(websocket: WebSocket):
             else:
                 logger.info("No new emails processed or all fetched emails were already sent.")
             
-            # 3. Wait before checking again
-            await asyncio.sleep(60) # Check every 60 seconds
+            # 3. Wait before checking again: shorter after new mail, backing off while idle
+            poll_scheduler.record_poll(len(new_metadata_list))
+            logger.info(f"Next mail check in {poll_scheduler.next_interval:.0f}s")
+            await poll_scheduler.wait()
             
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected: {websocket.client}")
@@ -281,6 +580,20 @@ async def get_emails(limit: int = 20):
         logger.error(f"Error fetching emails from storage: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve email summaries")
 
+async def _fetch_and_process_email(email_id: str) -> Optional[Dict]:
+    """Fetch an email that isn't in storage from Gmail and process it immediately."""
+    logger.info(f"Email {email_id} not found in storage. Attempting to fetch and process it.")
+    client_pool = ingestor.pool_for(None)
+    if client_pool:
+        full_email_data = await client_pool.run(get_full_email_content, email_id)
+    else:
+        full_email_data = await asyncio.to_thread(get_full_email_content, email_id)
+    
+    if not full_email_data:
+        raise HTTPException(status_code=404, detail="Email not found in Gmail.")
+    
+    return await _process_and_store_email(full_email_data)
+
 @app.get("/emails/{email_id}", response_model=Dict)
 async def get_email_details(email_id: str):
     """Gets the stored summary details for a specific email ID from storage."""
@@ -290,15 +603,8 @@ async def get_email_details(email_id: str):
         if data:
             return data
         else:
-            # If not in storage, try fetching from Gmail API and processing
-            logger.info(f"Email {email_id} not found in storage. Attempting to fetch and process it.")
-            full_email_data = get_full_email_content(email_id)
-            
-            if not full_email_data:
-                raise HTTPException(status_code=404, detail="Email not found in Gmail.")
-                
-            # Process it immediately
-            processed_data = await process_and_store_email(full_email_data)
+            # If not in storage, fetch and process it, or join the run already in progress for this ID
+            processed_data = await email_flights.run(email_id, lambda: _fetch_and_process_email(email_id))
             
             if processed_data:
                 return processed_data
@@ -312,6 +618,90 @@ async def get_email_details(email_id: str):
         logger.error(f"Error fetching email details for {email_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve email details")
 
+@app.get("/threads", response_model=List[Dict])
+async def get_threads(limit: int = 20):
+    """Gets the most recently active conversations, one summary per thread."""
+    try:
+        return await asyncio.to_thread(thread_summarizer.recent_threads, limit)
+    except Exception as e:
+        logger.error(f"Error fetching thread summaries from storage: {e}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve thread summaries")
+
+@app.get("/threads/{thread_id}", response_model=Dict)
+async def get_thread_details(thread_id: str):
+    """Gets the stored summary of one thread."""
+    data = await asyncio.to_thread(thread_summarizer.get_thread, thread_id)
+    if not data:
+        raise HTTPException(status_code=404, detail="Thread not found.")
+    return data
+
+@app.get("/events", response_model=List[Dict])
+async def get_events(request: Request, response: Response, start: Optional[str] = None,
+                     end: Optional[str] = None, days_ahead: int = EVENTS_DEFAULT_DAYS_AHEAD):
+    """Events from processed emails dated between start and end (ISO dates; default: the next days_ahead days)."""
+    today = datetime.now().date()
+    try:
+        start_date, end_date = parse_range(start, end, days_ahead, today)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    etag_source, last_modified = event_store.validators(start_date, end_date, today)
+    cached = not_modified(request, response, make_etag(etag_source), last_modified)
+    if cached:
+        return cached
+    return event_store.query_range(start_date, end_date, today)
+
+@app.get("/search", response_model=Dict)
+async def search_summaries(q: str, page: int = 1, page_size: int = 20):
+    """Ranked full-text search over subject, sender, summary and event descriptions (terms match as prefixes)."""
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="q must not be empty")
+    if page < 1 or not 1 <= page_size <= SEARCH_MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"page must be >= 1 and page_size between 1 and {SEARCH_MAX_PAGE_SIZE}")
+    results = await asyncio.to_thread(search_index.search, q, page_size, (page - 1) * page_size)
+    return {"query": q, "page": page, "page_size": page_size, **results}
+
+@app.get("/metrics", response_model=Dict)
+async def get_metrics():
+    """Operational metrics: Gmail quota usage and per-method cost accounting."""
+    return {
+        'gmail_quota': ingestor.quota_snapshot(),
+        'gmail_quota_default': default_bucket.snapshot(),
+        'poll': poll_scheduler.snapshot(),
+        'push': push_handler.snapshot(),
+        'work_queue': work_queue.counts(),
+        'summarizer': inference_load(),
+        'single_flight': email_flights.snapshot(),
+        'reminders': reminder_scheduler.snapshot(),
+        'threads': {**thread_summarizer.snapshot(), 'queued': thread_update_queue.qsize()},
+        'sender_profiles': classifier.profiles.snapshot() if classifier.profiles is not None else None,
+        'classifier': classifier.batch_stats,
+        'gmail_credentials': gmail_credentials_snapshot(),
+    }
+
+class SettingsUpdate(BaseModel):
+    checkFrequency: Optional[float] = None # minutes
+    reminderTime: Optional[int] = None # minutes before event
+
+@app.get("/settings", response_model=Dict)
+async def get_settings():
+    """Gets the backend-relevant user settings."""
+    return app_settings
+
+@app.put("/settings", response_model=Dict)
+async def update_settings(update: SettingsUpdate):
+    """Applies settings saved on the Settings page."""
+    if update.checkFrequency is not None:
+        if update.checkFrequency <= 0:
+            raise HTTPException(status_code=400, detail="checkFrequency must be positive")
+        poll_scheduler.set_check_frequency(update.checkFrequency)
+        app_settings['checkFrequency'] = update.checkFrequency
+    if update.reminderTime is not None:
+        if update.reminderTime < 0:
+            raise HTTPException(status_code=400, detail="reminderTime must not be negative")
+        reminder_scheduler.set_lead(update.reminderTime)
+        app_settings['reminderTime'] = update.reminderTime
+    return app_settings
+
 # --- Main Execution --- #
 if __name__ == "__main__":
     import uvicorn
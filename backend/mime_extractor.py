@@ -0,0 +1,159 @@
+"""
+MIME body extraction for Gmail message payloads.
+
+Finds the best text part of a message, decodes it incrementally up to a byte
+budget, converts HTML-only bodies to plain text, and strips quoted reply
+chains and signatures so that only the text the summarizer will see is kept.
+"""
+
+import base64
+import codecs
+import logging
+import os
+import re
+from html import unescape
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of decoded body bytes kept per message. The summarizer reads at
+# most a few thousand tokens, so anything past this is never looked at.
+MAX_BODY_BYTES = int(os.getenv("MAX_BODY_BYTES", "32768"))
+
+# Base64 characters decoded per step (must be a multiple of 4)
+_DECODE_STEP = 8192
+
+# Lines that start a quoted reply chain; everything from here on is dropped
+REPLY_HEADER_PATTERNS = [
+    re.compile(r'^On .{0,200}wrote:\s*$', re.IGNORECASE),
+    re.compile(r'^-{2,}\s*Original Message\s*-{2,}', re.IGNORECASE),
+    re.compile(r'^-{2,}\s*Forwarded message\s*-{2,}', re.IGNORECASE),
+    re.compile(r'^_{10,}\s*$'),  # Outlook separator line
+    re.compile(r'^From:\s.+\s(Sent|Date):\s', re.IGNORECASE),
+]
+
+# Lines that start a signature block
+SIGNATURE_PATTERNS = [
+    re.compile(r'^--\s?$'),
+    re.compile(r'^Sent from my \w+', re.IGNORECASE),
+    re.compile(r'^Get Outlook for \w+', re.IGNORECASE),
+]
+
+_BLOCK_TAGS = {'br', 'p', 'div', 'tr', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'table', 'blockquote'}
+_SKIP_TAGS = {'script', 'style', 'head', 'title'}
+
+# --- Decoding --- #
+def decode_base64url_capped(data: str, max_bytes: int = MAX_BODY_BYTES) -> str:
+    """Decode base64url data step by step, stopping once max_bytes have been produced."""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    pieces = []
+    produced = 0
+    truncated = False
+
+    for start in range(0, len(data), _DECODE_STEP):
+        chunk = data[start:start + _DECODE_STEP]
+        raw = base64.urlsafe_b64decode(chunk + '=' * (-len(chunk) % 4))
+        remaining = max_bytes - produced
+        if len(raw) > remaining:
+            pieces.append(decoder.decode(raw[:remaining]))
+            truncated = True
+            break
+        pieces.append(decoder.decode(raw))
+        produced += len(raw)
+
+    if not truncated:
+        # Flush only on a clean end; a cut multi-byte character is simply dropped
+        pieces.append(decoder.decode(b'', final=True))
+    return ''.join(pieces)
+
+# --- HTML Conversion --- #
+class _HTMLTextExtractor(HTMLParser):
+    """Collects visible text from HTML, turning block elements into line breaks."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in _BLOCK_TAGS:
+            self.parts.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in _BLOCK_TAGS:
+            self.parts.append('\n')
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+def html_to_text(html_content: str) -> str:
+    """Convert an HTML body to plain text."""
+    extractor = _HTMLTextExtractor()
+    try:
+        extractor.feed(html_content)
+        extractor.close()
+        text = ''.join(extractor.parts)
+    except Exception as e:
+        logger.warning(f"HTML parsing failed, falling back to tag stripping: {e}")
+        text = unescape(re.sub(r'<[^<]+?>', ' ', html_content))
+
+    # Collapse runs of spaces and blank lines left behind by markup
+    text = re.sub(r'[ \t\r\f\v]+', ' ', text)
+    text = re.sub(r' *\n[ \n]*', '\n', text)
+    return text.strip()
+
+# --- Quote / Signature Stripping --- #
+def strip_quoted_text(text: str) -> str:
+    """Remove quoted reply chains and trailing signatures from a plain-text body."""
+    kept = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if any(pattern.match(stripped) for pattern in REPLY_HEADER_PATTERNS):
+            break
+        if any(pattern.match(stripped) for pattern in SIGNATURE_PATTERNS):
+            break
+        if stripped.startswith('>'):
+            continue # Inline quoted line
+        kept.append(line)
+
+    result = '\n'.join(kept).strip()
+    # A message that is nothing but a forward/quote is better kept whole
+    return result or text.strip()
+
+# --- Payload Walking --- #
+def _find_text_parts(payload: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    """Return the base64 data of the first text/plain and text/html parts."""
+    found = {'text/plain': None, 'text/html': None}
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        mime_type = part.get('mimeType', '')
+        data = part.get('body', {}).get('data')
+        if data and mime_type in found and found[mime_type] is None:
+            found[mime_type] = data
+            if mime_type == 'text/plain':
+                break # Plain text wins, no need to look further
+        # Push children in reverse so parts are visited in document order
+        stack.extend(reversed(part.get('parts', [])))
+    return found
+
+def extract_body(payload: Dict[str, Any], max_bytes: int = MAX_BODY_BYTES, strip_quotes: bool = True) -> str:
+    """Extract a plain-text body from a Gmail message payload.
+
+    Prefers text/plain, falls back to converted text/html, and caps decoding at max_bytes.
+    """
+    parts = _find_text_parts(payload)
+    if parts['text/plain']:
+        text = decode_base64url_capped(parts['text/plain'], max_bytes)
+    elif parts['text/html']:
+        text = html_to_text(decode_base64url_capped(parts['text/html'], max_bytes))
+    else:
+        return ''
+
+    return strip_quoted_text(text) if strip_quotes else text
@@ -0,0 +1,214 @@
+"""
+Batched, coalescing push notification dispatch.
+
+Callers enqueue notifications per device and return immediately. The
+dispatcher holds each device's queue for a short coalescing window, folds
+several items of the same kind into one message ("5 new important emails"),
+and sends the resulting messages to a transport in bulk, with a cap on the
+number of batches in flight. A burst of mail therefore becomes one message
+per device and kind instead of one push per device per email.
+
+Transports register under a name and are picked with NOTIFICATION_TRANSPORT:
+
+    local     keeps sent messages in memory and logs them (default; for tests and development)
+    notifier  notifier.send_push_notification, called on worker threads
+"""
+
+import abc
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_TRANSPORT = os.getenv("NOTIFICATION_TRANSPORT", "local")
+# How long a device's first queued item waits for more to coalesce with
+NOTIFY_COALESCE_SECONDS = float(os.getenv("NOTIFY_COALESCE_SECONDS", "5"))
+# Messages handed to the transport per send_batch call
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "100"))
+# Batches (and, for per-message transports, sends) in flight at once
+NOTIFY_CONCURRENCY = int(os.getenv("NOTIFY_CONCURRENCY", "8"))
+# Queued items kept per device; the oldest are dropped beyond this
+NOTIFY_MAX_QUEUED_PER_DEVICE = int(os.getenv("NOTIFY_MAX_QUEUED_PER_DEVICE", "200"))
+
+KIND_EMAIL = "email"
+KIND_EVENT = "event"
+
+# Title of a coalesced message, by kind
+_COALESCED_TITLES = {
+    KIND_EMAIL: "{count} new important emails",
+    KIND_EVENT: "{count} upcoming events",
+}
+
+
+class PushTransport(abc.ABC):
+    """Delivers push messages ({"device_token", "title", "message", "data"} dicts)."""
+
+    name = "base"
+
+    @abc.abstractmethod
+    async def send_batch(self, messages: List[Dict[str, Any]]) -> List[bool]:
+        """Send messages; returns one success flag per message, in order."""
+        pass
+
+
+TRANSPORTS: Dict[str, Callable[[], PushTransport]] = {}
+
+def register_transport(name: str):
+    """Class decorator adding a transport to the registry under `name`."""
+    def decorator(transport_class):
+        transport_class.name = name
+        TRANSPORTS[name] = transport_class
+        return transport_class
+    return decorator
+
+
+@register_transport("local")
+class LocalTransport(PushTransport):
+    """Records messages instead of sending them."""
+
+    def __init__(self, max_kept: int = 1000):
+        self.sent: Deque[Dict[str, Any]] = deque(maxlen=max_kept)
+        self.batches = 0
+
+    async def send_batch(self, messages: List[Dict[str, Any]]) -> List[bool]:
+        self.batches += 1
+        for message in messages:
+            logger.info(f"[push:{message['device_token'][:8]}] {message['title']}: {message['message']}")
+            self.sent.append(message)
+        return [True] * len(messages)
+
+
+@register_transport("notifier")
+class NotifierTransport(PushTransport):
+    """notifier.send_push_notification, one blocking call per message on worker threads."""
+
+    def __init__(self, concurrency: int = NOTIFY_CONCURRENCY):
+        from notifier import send_push_notification
+        self._send = send_push_notification
+        self._slots = asyncio.Semaphore(concurrency)
+
+    async def _send_one(self, message: Dict[str, Any]) -> bool:
+        async with self._slots:
+            try:
+                result = await asyncio.to_thread(self._send, **message)
+            except Exception as e:
+                logger.warning(f"Push to {message['device_token'][:8]} failed: {e}")
+                return False
+        return not (isinstance(result, dict) and result.get("success") is False)
+
+    async def send_batch(self, messages: List[Dict[str, Any]]) -> List[bool]:
+        return list(await asyncio.gather(*(self._send_one(message) for message in messages)))
+
+
+def get_transport(name: Optional[str] = None) -> PushTransport:
+    """New transport instance by registry name (default: NOTIFICATION_TRANSPORT)."""
+    name = name or NOTIFICATION_TRANSPORT
+    if name not in TRANSPORTS:
+        raise ValueError(f"Unknown notification transport '{name}'; choose from {', '.join(sorted(TRANSPORTS))}")
+    return TRANSPORTS[name]()
+
+
+def coalesce(device_token: str, kind: str, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """One push message for a device's queued items of one kind."""
+    if len(items) == 1:
+        item = items[0]
+        return {"device_token": device_token, "title": item["title"], "message": item["message"],
+                "data": {"type": kind, **(item.get("data") or {})}}
+    return {
+        "device_token": device_token,
+        "title": _COALESCED_TITLES.get(kind, "{count} notifications").format(count=len(items)),
+        "message": "; ".join(item["title"] for item in items[:3]) + ("; ..." if len(items) > 3 else ""),
+        "data": {"type": kind, "count": len(items), "items": [item.get("data") or {} for item in items]},
+    }
+
+
+class NotificationDispatcher:
+    """Per-device queues flushed in coalesced bulk sends."""
+
+    def __init__(self, transport: PushTransport, coalesce_seconds: float = NOTIFY_COALESCE_SECONDS,
+                 batch_size: int = NOTIFY_BATCH_SIZE, concurrency: int = NOTIFY_CONCURRENCY,
+                 max_queued_per_device: int = NOTIFY_MAX_QUEUED_PER_DEVICE):
+        self.transport = transport
+        self.coalesce_seconds = coalesce_seconds
+        self.batch_size = batch_size
+        self.max_queued_per_device = max_queued_per_device
+        self._queues: Dict[str, Deque[Dict[str, Any]]] = defaultdict(
+            lambda: deque(maxlen=self.max_queued_per_device)
+        )
+        self._slots = asyncio.Semaphore(concurrency)
+        self._pending = asyncio.Event()
+        self.enqueued = 0
+        self.sent = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_flush_at = None
+
+    def enqueue(self, device_token: str, kind: str, title: str, message: str, data: Optional[Dict] = None):
+        """Queue a notification for a device; it is sent with the next flush."""
+        self._queues[device_token].append({"kind": kind, "title": title, "message": message, "data": data})
+        self.enqueued += 1
+        self._pending.set()
+
+    def enqueue_many(self, device_tokens, kind: str, title: str, message: str, data: Optional[Dict] = None):
+        """Queue the same notification for several devices."""
+        for device_token in device_tokens:
+            self.enqueue(device_token, kind, title, message, data)
+
+    def _drain_messages(self) -> List[Dict[str, Any]]:
+        """Empty every device queue into coalesced messages (one per device and kind)."""
+        queues, self._queues = self._queues, defaultdict(lambda: deque(maxlen=self.max_queued_per_device))
+        messages = []
+        for device_token, items in queues.items():
+            by_kind: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+            for item in items:
+                by_kind[item["kind"]].append(item)
+            messages.extend(coalesce(device_token, kind, kind_items) for kind, kind_items in by_kind.items())
+        return messages
+
+    async def _send(self, batch: List[Dict[str, Any]]):
+        async with self._slots:
+            try:
+                results = await self.transport.send_batch(batch)
+            except Exception as e:
+                logger.error(f"Notification batch of {len(batch)} failed: {e}")
+                results = [False] * len(batch)
+        self.batches += 1
+        self.sent += sum(1 for ok in results if ok)
+        self.failed += sum(1 for ok in results if not ok)
+
+    async def flush(self) -> int:
+        """Send everything queued now; returns the number of messages sent to the transport."""
+        self._pending.clear()
+        messages = self._drain_messages()
+        if messages:
+            await asyncio.gather(*(
+                self._send(messages[start:start + self.batch_size])
+                for start in range(0, len(messages), self.batch_size)
+            ))
+            self.last_flush_at = time.time()
+        return len(messages)
+
+    async def run(self):
+        """Flush forever: wait for the first queued item, let more coalesce, then send."""
+        while True:
+            await self._pending.wait()
+            await asyncio.sleep(self.coalesce_seconds)
+            count = await self.flush()
+            logger.info(f"Dispatched {count} coalesced notifications")
+
+    def snapshot(self) -> Dict:
+        """Queue depth and delivery counters for the metrics endpoint."""
+        return {
+            "transport": self.transport.name,
+            "queued": sum(len(items) for items in self._queues.values()),
+            "devices_queued": len(self._queues),
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_flush_at": self.last_flush_at,
+        }
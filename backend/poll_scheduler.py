@@ -0,0 +1,99 @@
+"""
+Adaptive poll interval for mailbox checks.
+
+The interval drops to the floor as soon as new mail arrives and backs off
+geometrically while the inbox stays idle, up to the user's checkFrequency
+setting. While push notifications keep arriving, polling relaxes to the
+ceiling and only serves as a fallback; pushed changes are synced by the push
+handler itself.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# Settings page default for checkFrequency, used as the idle ceiling
+CHECK_FREQUENCY_MINUTES = float(os.getenv("CHECK_FREQUENCY_MINUTES", "15"))
+# Shortest interval, used right after new mail arrives
+MIN_POLL_SECONDS = float(os.getenv("MIN_POLL_SECONDS", "30"))
+# Growth factor applied to the interval after each idle poll
+POLL_BACKOFF_FACTOR = float(os.getenv("POLL_BACKOFF_FACTOR", "1.5"))
+# Interval after a failed poll
+ERROR_POLL_SECONDS = float(os.getenv("ERROR_POLL_SECONDS", "15"))
+# Push is considered healthy for this long after the last notification
+PUSH_FRESH_SECONDS = float(os.getenv("PUSH_FRESH_SECONDS", "1800"))
+
+
+class PollScheduler:
+    """Tracks inbox activity and decides how long to wait before the next poll."""
+
+    def __init__(self, min_interval: float = MIN_POLL_SECONDS,
+                 check_frequency_minutes: float = CHECK_FREQUENCY_MINUTES,
+                 backoff_factor: float = POLL_BACKOFF_FACTOR):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, check_frequency_minutes * 60)
+        self.backoff_factor = backoff_factor
+        self.interval = min_interval
+        self.last_poll_at = None
+        self.last_new_mail_at = None
+        self.polls = 0
+        self.idle_polls = 0
+        self.last_push_at = None
+
+    def set_check_frequency(self, minutes: float):
+        """Apply the Settings checkFrequency (minutes) as the idle ceiling."""
+        self.max_interval = max(self.min_interval, minutes * 60)
+        self.interval = min(self.interval, self.max_interval)
+        logger.info(f"Poll ceiling set to {self.max_interval:.0f}s")
+
+    def record_poll(self, new_emails: int) -> float:
+        """Update the interval after a poll that found new_emails messages."""
+        now = time.time()
+        self.last_poll_at = now
+        self.polls += 1
+        if new_emails:
+            self.last_new_mail_at = now
+            self.interval = self.min_interval
+        else:
+            self.idle_polls += 1
+            self.interval = min(self.max_interval, self.interval * self.backoff_factor)
+        return self.interval
+
+    def record_error(self) -> float:
+        """Interval to use after a failed poll (the adaptive interval itself is kept)."""
+        return min(self.interval, ERROR_POLL_SECONDS)
+
+    def record_push(self):
+        """Note that a push notification arrived."""
+        self.last_push_at = time.time()
+
+    def push_active(self) -> bool:
+        """Whether push notifications have arrived recently enough to rely on them."""
+        return self.last_push_at is not None and time.time() - self.last_push_at < PUSH_FRESH_SECONDS
+
+    @property
+    def next_interval(self) -> float:
+        """Wait before the next poll: the ceiling while push is healthy, else the adaptive interval."""
+        return self.max_interval if self.push_active() else self.interval
+
+    async def wait(self, interval: float = None):
+        """Sleep until the next poll is due."""
+        await asyncio.sleep(self.next_interval if interval is None else interval)
+
+    def snapshot(self) -> Dict:
+        """Current interval and activity counters for the metrics endpoint."""
+        return {
+            "interval_seconds": round(self.interval, 1),
+            "next_interval_seconds": round(self.next_interval, 1),
+            "push_active": self.push_active(),
+            "min_interval_seconds": self.min_interval,
+            "max_interval_seconds": self.max_interval,
+            "polls": self.polls,
+            "idle_polls": self.idle_polls,
+            "last_poll_at": self.last_poll_at,
+            "last_new_mail_at": self.last_new_mail_at,
+        }
@@ -0,0 +1,104 @@
+"""
+Cached prompt tokenization for the summarizer.
+
+Every prompt starts with the same instruction and separator, so their token
+IDs are encoded once and reused. The rest of each prompt (headers and body) is encoded in
+batch calls to the fast tokenizer and cached by a hash of the email content,
+so an email that is summarized again (e.g. by /emails/{id}) is not
+re-tokenized. Encoded inputs are returned untruncated so callers can check
+their length before deciding whether to chunk.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Sequence, Tuple
+
+# Encoded prompts kept in the per-email cache
+PROMPT_CACHE_SIZE = int(os.getenv("PROMPT_CACHE_SIZE", "2048"))
+
+# Between the instruction prefix and the email in every prompt
+PREFIX_SEPARATOR = "\n"
+
+
+def content_key(subject: str, sender: str, snippet: str, body: str) -> str:
+    """Stable hash of the fields that make up a prompt."""
+    digest = hashlib.sha1()
+    for field in (subject, sender, snippet, body):
+        digest.update((field or '').encode('utf-8', 'surrogatepass'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def prompt_text(subject: str, sender: str, snippet: str, body: str) -> str:
+    """The part of a prompt after the instruction prefix."""
+    return f"Subject: {subject}\nFrom: {sender}\nSnippet: {snippet}\n\n{body}"
+
+
+class PromptEncoder:
+    """Encodes summarizer prompts as prefix tokens + cached per-email tokens + EOS."""
+
+    def __init__(self, tokenizer, prefix: str, max_entries: int = PROMPT_CACHE_SIZE):
+        self.tokenizer = tokenizer
+        # The separator goes with the prefix so the IDs match tokenizing the whole prompt
+        self.prefix_ids = tokenizer(prefix + PREFIX_SEPARATOR, add_special_tokens=False)["input_ids"]
+        self.eos_ids = [tokenizer.eos_token_id] if tokenizer.eos_token_id is not None else []
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, List[int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.encode_seconds = 0.0
+
+    def encode_many(self, emails: Sequence[Tuple[str, str, str, str]]) -> List[List[int]]:
+        """Token IDs for (subject, sender, snippet, body) prompts, tokenizing cache misses in one batch."""
+        keys = [content_key(*email) for email in emails]
+        encoded: Dict[str, List[int]] = {}
+        missing: Dict[str, str] = {}
+        with self._lock:
+            for key, email in zip(keys, emails):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    encoded[key] = self._cache[key]
+                    self.hits += 1
+                elif key not in missing:
+                    missing[key] = prompt_text(*email)
+                    self.misses += 1
+
+        if missing:
+            started = time.perf_counter()
+            batch_ids = self.tokenizer(list(missing.values()), add_special_tokens=False)["input_ids"]
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.encode_seconds += elapsed
+                for key, ids in zip(missing, batch_ids):
+                    encoded[key] = self.prefix_ids + ids + self.eos_ids
+                    self._cache[key] = encoded[key]
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return [encoded[key] for key in keys]
+
+    def encode(self, subject: str, sender: str, snippet: str, body: str) -> List[int]:
+        return self.encode_many([(subject, sender, snippet, body)])[0]
+
+    def truncate(self, ids: List[int], max_tokens: int) -> List[int]:
+        """Cut ids to max_tokens, keeping the trailing EOS like tokenizer truncation does."""
+        if len(ids) <= max_tokens:
+            return ids
+        return ids[:max_tokens - len(self.eos_ids)] + self.eos_ids
+
+    def clear(self):
+        """Drop every cached prompt (the prefix tokens are kept)."""
+        with self._lock:
+            self._cache.clear()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "cached_prompts": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "encode_seconds": round(self.encode_seconds, 3),
+            }
@@ -0,0 +1,166 @@
+"""
+Gmail push notification intake.
+
+Gmail publishes mailbox changes to a Cloud Pub/Sub topic; a push subscription
+delivers them as HTTP POSTs shaped like:
+
+    {"message": {"data": base64({"emailAddress": ..., "historyId": ...}),
+                 "messageId": "...", "publishTime": "..."},
+     "subscription": "projects/.../subscriptions/..."}
+
+PushNotificationHandler drops redeliveries and stale history IDs and queues at
+most one pending incremental sync per mailbox. LocalPushPublisher stands in for
+Pub/Sub in development and tests.
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import os
+import time
+import urllib.request
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Pub/Sub topic Gmail should publish to, e.g. projects/<project>/topics/<topic>; unset disables watches
+GMAIL_PUSH_TOPIC = os.getenv("GMAIL_PUSH_TOPIC", "")
+# Watches last about 7 days; renew well before that
+WATCH_RENEW_SECONDS = float(os.getenv("GMAIL_WATCH_RENEW_SECONDS", str(24 * 3600)))
+# Number of Pub/Sub message IDs remembered for redelivery de-duplication
+PUSH_DEDUPE_SIZE = int(os.getenv("PUSH_DEDUPE_SIZE", "10000"))
+
+
+def parse_push_envelope(envelope: Dict[str, Any]) -> Optional[Tuple[str, str, int]]:
+    """Extract (message_id, email_address, history_id) from a Pub/Sub push body, or None if malformed."""
+    message = envelope.get("message") or {}
+    try:
+        payload = json.loads(base64.b64decode(message.get("data", "")).decode("utf-8"))
+        return (
+            message.get("messageId") or message.get("message_id") or "",
+            payload["emailAddress"],
+            int(payload["historyId"]),
+        )
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Ignoring malformed push notification: {e}")
+        return None
+
+
+class PushNotificationHandler:
+    """De-duplicates Gmail push notifications and queues one incremental sync per mailbox."""
+
+    def __init__(self, resolve_account: Callable[[str], Optional[str]],
+                 dedupe_size: int = PUSH_DEDUPE_SIZE):
+        self._resolve_account = resolve_account  # email address -> account ID
+        self._seen_message_ids: "OrderedDict[str, None]" = OrderedDict()
+        self._dedupe_size = dedupe_size
+        self._latest_history_ids: Dict[str, int] = {}
+        self._pending = set()
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self.received = 0
+        self.duplicates = 0
+        self.last_received_at: Optional[float] = None
+
+    def _remember(self, message_id: str) -> bool:
+        """Record a Pub/Sub message ID; False if it was already seen."""
+        if not message_id:
+            return True
+        if message_id in self._seen_message_ids:
+            self._seen_message_ids.move_to_end(message_id)
+            return False
+        self._seen_message_ids[message_id] = None
+        if len(self._seen_message_ids) > self._dedupe_size:
+            self._seen_message_ids.popitem(last=False)
+        return True
+
+    def handle(self, envelope: Dict[str, Any]) -> str:
+        """Accept one push body; returns 'queued', 'duplicate', 'unknown_mailbox' or 'invalid'."""
+        parsed = parse_push_envelope(envelope)
+        if parsed is None:
+            return "invalid"
+        message_id, email_address, history_id = parsed
+        self.received += 1
+        self.last_received_at = time.time()
+
+        account_id = self._resolve_account(email_address)
+        if account_id is None:
+            logger.warning(f"Push notification for unknown mailbox {email_address}")
+            return "unknown_mailbox"
+
+        # Pub/Sub delivers at least once, and Gmail may notify for history we already asked about
+        if not self._remember(message_id) or history_id <= self._latest_history_ids.get(account_id, 0):
+            self.duplicates += 1
+            return "duplicate"
+        self._latest_history_ids[account_id] = history_id
+
+        # A sync reads everything since the account's cursor, so one pending sync covers any burst
+        if account_id not in self._pending:
+            self._pending.add(account_id)
+            self._queue.put_nowait(account_id)
+        return "queued"
+
+    async def run_sync_worker(self, sync_account: Callable[[str], Awaitable[Any]]):
+        """Drain queued mailboxes forever, running sync_account(account_id) for each."""
+        while True:
+            account_id = await self._queue.get()
+            # Clear first so notifications arriving mid-sync queue a follow-up sync
+            self._pending.discard(account_id)
+            try:
+                await sync_account(account_id)
+            except Exception as e:
+                logger.error(f"Push-triggered sync failed for account '{account_id}': {e}")
+            finally:
+                self._queue.task_done()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters for the metrics endpoint."""
+        return {
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "pending_syncs": len(self._pending),
+            "last_received_at": self.last_received_at,
+        }
+
+
+def make_push_envelope(email_address: str, history_id: int, message_id: Optional[str] = None,
+                       subscription: str = "projects/local/subscriptions/gmail-push") -> Dict[str, Any]:
+    """Build a Pub/Sub-style push body like the ones Gmail notifications arrive in."""
+    data = json.dumps({"emailAddress": email_address, "historyId": history_id}).encode("utf-8")
+    return {
+        "message": {
+            "data": base64.b64encode(data).decode("ascii"),
+            "messageId": message_id or uuid.uuid4().hex,
+            "publishTime": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "subscription": subscription,
+    }
+
+
+class LocalPushPublisher:
+    """Stand-in for Pub/Sub push delivery: POSTs Gmail-style notifications to an endpoint."""
+
+    def __init__(self, endpoint_url: str = "http://127.0.0.1:8000/gmail/push"):
+        self.endpoint_url = endpoint_url
+
+    def publish(self, email_address: str, history_id: int, message_id: Optional[str] = None) -> int:
+        """Deliver one notification and return the HTTP status code."""
+        body = json.dumps(make_push_envelope(email_address, history_id, message_id)).encode("utf-8")
+        request = urllib.request.Request(
+            self.endpoint_url, data=body, headers={"Content-Type": "application/json"}, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="Send a fake Gmail push notification")
+    arg_parser.add_argument("email", help="Mailbox address the notification is for")
+    arg_parser.add_argument("history_id", type=int, help="historyId to report")
+    arg_parser.add_argument("--url", default="http://127.0.0.1:8000/gmail/push")
+    args = arg_parser.parse_args()
+    print(LocalPushPublisher(args.url).publish(args.email, args.history_id))
@@ -0,0 +1,200 @@
+"""
+Event reminder scheduling.
+
+Upcoming events are kept in a min-heap ordered by reminder time (event time
+minus the Settings reminderTime lead), so the next due reminder is always at
+the top and the run loop sleeps exactly until it. Events are scheduled once
+per email when it is processed; fan-out to devices or websocket clients
+happens when a reminder fires, not when events are extracted. Re-scheduling
+an email replaces its pending reminders (superseded heap entries are skipped
+lazily when they surface) and never repeats a reminder that already fired.
+"""
+
+import asyncio
+import datetime
+import heapq
+import itertools
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Settings page default for reminderTime: minutes before an event to remind
+REMINDER_LEAD_MINUTES = int(os.getenv("REMINDER_LEAD_MINUTES", "30"))
+# Longest sleep between heap checks, so wall clock changes are picked up
+REMINDER_MAX_SLEEP_SECONDS = float(os.getenv("REMINDER_MAX_SLEEP_SECONDS", "60"))
+
+
+class Reminder:
+    """A pending reminder for one event of one email."""
+    __slots__ = ("email_id", "position", "event", "event_at", "subject", "sender", "cancelled")
+
+    def __init__(self, email_id: str, position: int, event: Dict[str, Any], event_at: datetime.datetime,
+                 subject: str = '', sender: str = ''):
+        self.email_id = email_id
+        self.position = position
+        self.event = event
+        self.event_at = event_at
+        self.subject = subject
+        self.sender = sender
+        self.cancelled = False
+
+    @property
+    def key(self) -> Tuple[int, datetime.datetime, Any]:
+        return (self.position, self.event_at, self.event.get('description'))
+
+    def to_dict(self, now: Optional[datetime.datetime] = None) -> Dict[str, Any]:
+        """Notification payload; minutes_until is computed at firing time."""
+        now = now or datetime.datetime.now()
+        return {
+            "id": f"{self.email_id}-{self.position}",
+            "type": "event",
+            "emailId": self.email_id,
+            "event_type": self.event.get('event_type'),
+            "description": self.event.get('description'),
+            "date_str": self.event.get('date_str'),
+            "date": self.event_at.isoformat(),
+            "subject": self.subject,
+            "sender": self.sender,
+            "minutes_until": max(0, int((self.event_at - now).total_seconds() // 60)),
+        }
+
+
+def _event_time(event: Dict[str, Any]) -> Optional[datetime.datetime]:
+    """Event start from a serialized event's formatted_date ("%Y-%m-%d %H:%M"), or None if undated."""
+    formatted_date = event.get('formatted_date')
+    if not formatted_date:
+        return None
+    try:
+        return datetime.datetime.strptime(formatted_date, "%Y-%m-%d %H:%M")
+    except ValueError:
+        return None
+
+
+class ReminderScheduler:
+    """Min-heap of reminders keyed by fire time, with per-email replacement."""
+
+    def __init__(self, lead_minutes: int = REMINDER_LEAD_MINUTES,
+                 clock: Callable[[], datetime.datetime] = datetime.datetime.now):
+        self.lead = datetime.timedelta(minutes=lead_minutes)
+        self.clock = clock
+        self._heap: List[Tuple[datetime.datetime, int, Reminder]] = []
+        self._by_email: Dict[str, List[Reminder]] = {}
+        self._sequence = itertools.count()
+        self._fired: Dict[Tuple[str, int], datetime.datetime] = {}  # Keeps re-scheduled emails from re-firing
+        self._wake_event = asyncio.Event()
+        self.scheduled = 0
+        self.fired = 0
+
+    def schedule(self, email_id: str, events: Iterable[Dict[str, Any]], subject: str = '', sender: str = '') -> int:
+        """Replace the pending reminders of an email with its serialized events; returns how many are pending.
+
+        Events that have already started are skipped; events starting within
+        the lead time are reminded on the next loop iteration.
+        """
+        now = self.clock()
+        reminders = []
+        for position, event in enumerate(events or []):
+            event_at = _event_time(event)
+            if event_at is None or event_at <= now or self._fired.get((email_id, position)) == event_at:
+                continue
+            reminders.append(Reminder(email_id, position, event, event_at, subject, sender))
+        pending = self._by_email.get(email_id, [])
+        if [reminder.key for reminder in reminders] == [reminder.key for reminder in pending]:
+            # Unchanged (e.g. the same email seen by another poll); keep the heap as is
+            return len(pending)
+        self.cancel(email_id)
+        if not reminders:
+            return 0
+        self._by_email[email_id] = reminders
+        earliest = self._heap[0][0] if self._heap else None
+        for reminder in reminders:
+            heapq.heappush(self._heap, (reminder.event_at - self.lead, next(self._sequence), reminder))
+        self.scheduled += len(reminders)
+        if earliest is None or self._heap[0][0] < earliest:
+            self.wake()
+        return len(reminders)
+
+    def schedule_records(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Schedule processed email records (as stored, with an 'events' list)."""
+        return sum(
+            self.schedule(record['id'], record.get('events'), record.get('subject', ''), record.get('sender', ''))
+            for record in records if record.get('id')
+        )
+
+    def cancel(self, email_id: str):
+        """Drop the pending reminders of an email."""
+        for reminder in self._by_email.pop(email_id, []):
+            reminder.cancelled = True
+
+    def set_lead(self, minutes: int):
+        """Apply a new Settings reminderTime to every pending reminder."""
+        self.lead = datetime.timedelta(minutes=minutes)
+        live = [reminder for reminders in self._by_email.values() for reminder in reminders]
+        self._heap = [(reminder.event_at - self.lead, next(self._sequence), reminder) for reminder in live]
+        heapq.heapify(self._heap)
+        logger.info(f"Reminder lead time set to {minutes} min ({len(live)} pending reminders)")
+        self.wake()
+
+    def pop_due(self) -> List[Reminder]:
+        """Remove and return every reminder whose fire time has passed."""
+        now = self.clock()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, reminder = heapq.heappop(self._heap)
+            if reminder.cancelled:
+                continue
+            pending = self._by_email.get(reminder.email_id, [])
+            if reminder in pending:
+                pending.remove(reminder)
+                if not pending:
+                    del self._by_email[reminder.email_id]
+            due.append(reminder)
+            self._fired[(reminder.email_id, reminder.position)] = reminder.event_at
+        self.fired += len(due)
+        if due:
+            # Fired keys only matter until their event starts
+            self._fired = {key: event_at for key, event_at in self._fired.items() if event_at > now}
+        return due
+
+    def seconds_until_next(self) -> Optional[float]:
+        """Seconds until the earliest pending reminder (skipping cancelled ones), or None if there is none."""
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        return max(0.0, (self._heap[0][0] - self.clock()).total_seconds())
+
+    def wake(self):
+        """Wake the run loop to recompute its sleep (e.g. an earlier reminder was added)."""
+        self._wake_event.set()
+        self._wake_event = asyncio.Event()
+
+    async def run(self, send: Callable[[List[Reminder]], Awaitable[Any]]):
+        """Fire due reminders through send() forever, sleeping until the next one is due."""
+        while True:
+            due = self.pop_due()
+            if due:
+                try:
+                    await send(due)
+                except Exception as e:
+                    logger.error(f"Failed to send {len(due)} reminders: {e}", exc_info=True)
+            wait = self.seconds_until_next()
+            event = self._wake_event
+            try:
+                await asyncio.wait_for(event.wait(), timeout=min(wait, REMINDER_MAX_SLEEP_SECONDS)
+                                       if wait is not None else REMINDER_MAX_SLEEP_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def snapshot(self) -> Dict:
+        """Pending and fired counts for the metrics endpoint."""
+        wait = self.seconds_until_next()
+        return {
+            "lead_minutes": int(self.lead.total_seconds() // 60),
+            "pending": sum(len(reminders) for reminders in self._by_email.values()),
+            "scheduled": self.scheduled,
+            "fired": self.fired,
+            "next_in_seconds": round(wait, 1) if wait is not None else None,
+        }
@@ -0,0 +1,202 @@
+"""
+Full-text search over stored summaries.
+
+Subject, sender, summary and event descriptions of every stored email are
+kept in a SQLite FTS5 inverted index, updated whenever a summary is stored,
+so searches are answered from the index instead of loading all summaries.
+Every query term is matched as a prefix ("meet" finds "meeting") and results
+are ranked with BM25, weighting subject matches above the other fields
+(very broad queries rank only their most recent matches). The fields shown
+in search results are stored alongside the index, so a result page needs no
+storage reads.
+
+Rebuild the index from storage with:
+    python search_index.py --rebuild
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable
+
+logger = logging.getLogger(__name__)
+
+# Relative paths are resolved against the backend directory
+SEARCH_DB_PATH = os.getenv("SEARCH_DB_PATH", "../search.sqlite3")
+# Largest page the search endpoints serve
+SEARCH_MAX_PAGE_SIZE = int(os.getenv("SEARCH_MAX_PAGE_SIZE", "100"))
+# Most recent matches ranked for one query; broader queries are cut to these
+SEARCH_RANK_CANDIDATES = int(os.getenv("SEARCH_RANK_CANDIDATES", "10000"))
+# Query terms beyond this are ignored
+SEARCH_MAX_TERMS = int(os.getenv("SEARCH_MAX_TERMS", "8"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    email_id TEXT NOT NULL UNIQUE,
+    category TEXT,
+    importance INTEGER,
+    processed_at TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+    subject, sender, summary, events,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+"""
+
+# BM25 column weights for subject, sender, summary, events
+_WEIGHTS = (4.0, 2.0, 1.0, 1.0)
+
+_TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def build_match_query(query: str) -> str:
+    """FTS5 MATCH expression requiring every term of query as a prefix; empty if it has no terms."""
+    terms = _TERM_PATTERN.findall(query.lower())[:SEARCH_MAX_TERMS]
+    # Quoting keeps FTS5 operators (AND, NEAR, column filters) in user input literal
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+class SearchIndex:
+    """SQLite FTS5 index over stored summary records, keyed by email ID."""
+
+    def __init__(self, path: str = SEARCH_DB_PATH):
+        db_path = Path(path)
+        if not db_path.is_absolute():
+            db_path = (Path(__file__).resolve().parent / db_path).resolve()
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def index_records(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Add or replace the index entries of processed email records; returns how many were indexed."""
+        rows = []
+        for record in records:
+            email_id = record.get('id')
+            if not email_id:
+                continue
+            events = " ".join(event.get('description', '') for event in record.get('events') or [])
+            rows.append((email_id, record.get('category'), record.get('importance'), str(record.get('processed_at', '')),
+                         record.get('subject', ''), record.get('sender', ''), record.get('summary', ''), events))
+        if not rows:
+            return 0
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for email_id, category, importance, processed_at, subject, sender, summary, events in rows:
+                    doc_id = self._conn.execute(
+                        "INSERT INTO docs (email_id, category, importance, processed_at) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT (email_id) DO UPDATE SET category = excluded.category, "
+                        "importance = excluded.importance, processed_at = excluded.processed_at RETURNING id",
+                        (email_id, category, importance, processed_at),
+                    ).fetchone()[0]
+                    self._conn.execute("DELETE FROM docs_fts WHERE rowid = ?", (doc_id,))
+                    self._conn.execute(
+                        "INSERT INTO docs_fts (rowid, subject, sender, summary, events) VALUES (?, ?, ?, ?, ?)",
+                        (doc_id, subject, sender, summary, events),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def remove(self, email_id: str):
+        """Drop an email from the index."""
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM docs WHERE email_id = ?", (email_id,)).fetchone()
+            if row:
+                self._conn.execute("DELETE FROM docs_fts WHERE rowid = ?", row)
+                self._conn.execute("DELETE FROM docs WHERE id = ?", row)
+
+    def count(self) -> int:
+        """Number of indexed emails."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+        """One page of ranked results for a free-text query, with the number of rankable matches.
+
+        Scoring is linear in the number of matches, so a very broad query
+        ranks only its SEARCH_RANK_CANDIDATES most recently indexed matches;
+        'truncated' says when that happened.
+        """
+        match = build_match_query(query)
+        if not match:
+            return {"total": 0, "truncated": False, "results": []}
+        with self._lock:
+            matches = self._conn.execute(
+                "SELECT COUNT(*) FROM docs_fts WHERE docs_fts MATCH ?", (match,)
+            ).fetchone()[0]
+            floor = 0
+            if matches > SEARCH_RANK_CANDIDATES:
+                # Rowids grow with indexing order; walking them newest-first is cheap, scoring is not
+                floor = self._conn.execute(
+                    "SELECT rowid FROM docs_fts WHERE docs_fts MATCH ? ORDER BY rowid DESC LIMIT 1 OFFSET ?",
+                    (match, SEARCH_RANK_CANDIDATES),
+                ).fetchone()[0]
+            rows = self._conn.execute(
+                "SELECT docs.email_id, docs_fts.subject, docs_fts.sender, docs_fts.summary, "
+                "docs.category, docs.importance, docs.processed_at, "
+                "snippet(docs_fts, -1, '[', ']', '...', 12), "
+                f"bm25(docs_fts, {', '.join(map(str, _WEIGHTS))}) AS score "
+                "FROM docs_fts JOIN docs ON docs.id = docs_fts.rowid "
+                "WHERE docs_fts MATCH ? AND docs_fts.rowid > ? ORDER BY score LIMIT ? OFFSET ?",
+                (match, floor, limit, offset),
+            ).fetchall()
+        results = [
+            {
+                "id": email_id,
+                "subject": subject,
+                "sender": sender,
+                "summary": summary,
+                "category": category,
+                "importance": importance,
+                "processed_at": processed_at,
+                "highlight": highlight,
+                # bm25() is lower-is-better; flip it so higher scores rank first
+                "score": round(-score, 4),
+            }
+            for email_id, subject, sender, summary, category, importance, processed_at, highlight, score in rows
+        ]
+        return {
+            "total": min(matches, SEARCH_RANK_CANDIDATES),
+            "truncated": matches > SEARCH_RANK_CANDIDATES,
+            "results": results,
+        }
+
+    def optimize(self):
+        """Merge the index's b-tree segments (worth running after a large rebuild)."""
+        with self._lock:
+            self._conn.execute("INSERT INTO docs_fts (docs_fts) VALUES ('optimize')")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from storage_manager import get_storage_manager
+
+    arg_parser = argparse.ArgumentParser(description="Maintain the summary search index")
+    arg_parser.add_argument("--rebuild", action="store_true", help="Index every stored summary")
+    arg_parser.add_argument("--limit", type=int, default=10**7, help="Most recent summaries to index")
+    arg_parser.add_argument("query", nargs="?", help="Run a search and print the first page")
+    args = arg_parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    index = SearchIndex()
+    if args.rebuild:
+        indexed = index.index_records(get_storage_manager().get_recent_summaries(args.limit))
+        index.optimize()
+        print(f"Indexed {indexed} summaries ({index.count()} in the index)")
+    if args.query:
+        page = index.search(args.query)
+        print(f"{page['total']} matches" + (" (truncated)" if page['truncated'] else ""))
+        for result in page['results']:
+            print(f"{result['score']:8.3f}  {result['id']}  {result['subject']}  {result['highlight']}")
@@ -0,0 +1,200 @@
+"""
+Sender profile cache for classification decisions.
+
+Newsletters and automated notifications from one sender are classified the
+same way almost every time, so running the full pattern stack on each of
+them is wasted work. A profile keeps exponentially decayed counts of the
+(category, importance) outcomes seen per sender address, and per domain for
+non-freemail domains (used only for addresses with no history yet, and only
+when the domain's outcome is low importance, like spam or bulk mail). Once
+one outcome is both frequent enough and dominant enough, it is returned
+without running the rules. A sample of cache hits is still classified in
+full, so a sender whose mail changes loses its cached decision instead of
+keeping it forever.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Decayed observations a profile needs before it is trusted
+SENDER_PROFILE_MIN_WEIGHT = float(os.getenv("SENDER_PROFILE_MIN_WEIGHT", "8"))
+# Share of a profile's weight the top outcome needs to be used
+SENDER_PROFILE_CONFIDENCE = float(os.getenv("SENDER_PROFILE_CONFIDENCE", "0.95"))
+# Observations lose half their weight after this many days
+SENDER_PROFILE_HALF_LIFE_DAYS = float(os.getenv("SENDER_PROFILE_HALF_LIFE_DAYS", "30"))
+# Every Nth cache hit is classified in full to keep the profile honest (0 disables)
+SENDER_PROFILE_VERIFY_EVERY = int(os.getenv("SENDER_PROFILE_VERIFY_EVERY", "10"))
+# Profiles kept in memory (least recently seen are evicted)
+SENDER_PROFILE_MAX = int(os.getenv("SENDER_PROFILE_MAX", "10000"))
+# Highest importance a domain profile may decide for an address with no history of its own
+SENDER_PROFILE_DOMAIN_MAX_IMPORTANCE = int(os.getenv("SENDER_PROFILE_DOMAIN_MAX_IMPORTANCE", "1"))
+
+# Domains shared by unrelated people; only individual addresses are profiled there
+FREEMAIL_DOMAINS = {
+    "gmail.com", "googlemail.com", "outlook.com", "hotmail.com", "live.com", "msn.com",
+    "yahoo.com", "icloud.com", "me.com", "aol.com", "proton.me", "protonmail.com", "gmx.com",
+}
+
+_ADDRESS_PATTERN = re.compile(r"[\w.+'-]+@([\w-]+\.)+[\w-]+")
+
+Outcome = Tuple[str, int]  # (category, importance)
+
+
+def sender_keys(sender: str) -> Tuple[Optional[str], Optional[str]]:
+    """(address key, domain key) for a From header; the domain key is None for freemail domains."""
+    match = _ADDRESS_PATTERN.search(sender or "")
+    if not match:
+        return None, None
+    address = match.group(0).lower()
+    domain = address.rsplit("@", 1)[1]
+    return address, (None if domain in FREEMAIL_DOMAINS else f"@{domain}")
+
+
+class _Profile:
+    __slots__ = ("weights", "updated_at")
+
+    def __init__(self, now: float):
+        self.weights: Dict[Outcome, float] = {}
+        self.updated_at = now
+
+    def decay(self, now: float, half_life_seconds: float):
+        factor = 0.5 ** ((now - self.updated_at) / half_life_seconds)
+        if factor < 1.0:
+            for outcome in self.weights:
+                self.weights[outcome] *= factor
+        self.updated_at = now
+
+    def decision(self, min_weight: float, confidence: float) -> Optional[Outcome]:
+        total = sum(self.weights.values())
+        if total < min_weight:
+            return None
+        outcome, weight = max(self.weights.items(), key=lambda item: item[1])
+        return outcome if weight / total >= confidence else None
+
+
+class SenderProfiles:
+    """Decayed per-sender and per-domain outcome counts with a confidence-gated lookup."""
+
+    def __init__(self, min_weight: float = SENDER_PROFILE_MIN_WEIGHT,
+                 confidence: float = SENDER_PROFILE_CONFIDENCE,
+                 half_life_days: float = SENDER_PROFILE_HALF_LIFE_DAYS,
+                 verify_every: int = SENDER_PROFILE_VERIFY_EVERY,
+                 max_profiles: int = SENDER_PROFILE_MAX,
+                 domain_max_importance: int = SENDER_PROFILE_DOMAIN_MAX_IMPORTANCE,
+                 clock=time.time):
+        self.min_weight = min_weight
+        self.confidence = confidence
+        self.half_life_seconds = half_life_days * 86400
+        self.verify_every = verify_every
+        self.max_profiles = max_profiles
+        self.domain_max_importance = domain_max_importance
+        self.clock = clock
+        self._profiles: "OrderedDict[str, _Profile]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._trusted_lookups = 0
+        self.hits = 0
+        self.misses = 0
+        self.verifications = 0
+        self.disagreements = 0
+        self.summaries_skipped = 0
+
+    def _decision(self, key: Optional[str], now: float) -> Optional[Outcome]:
+        profile = self._profiles.get(key) if key else None
+        if profile is None:
+            return None
+        profile.decay(now, self.half_life_seconds)
+        return profile.decision(self.min_weight, self.confidence)
+
+    def _trusted(self, address: Optional[str], domain: Optional[str], now: float) -> Optional[Outcome]:
+        # The domain only speaks for addresses with no history of their own
+        if address in self._profiles:
+            return self._decision(address, now)
+        # ...and only for unimportant mail: a new colleague at a domain that mostly
+        # sends notifications still has their first email classified in full
+        decision = self._decision(domain, now)
+        if decision is not None and decision[1] <= self.domain_max_importance:
+            return decision
+        return None
+
+    def peek(self, sender: str) -> Optional[Outcome]:
+        """The trusted outcome for a sender, without counting a lookup."""
+        address, domain = sender_keys(sender)
+        now = self.clock()
+        with self._lock:
+            return self._trusted(address, domain, now)
+
+    def lookup(self, sender: str) -> Optional[Outcome]:
+        """Cached outcome to use instead of running the rules, or None to classify in full."""
+        decision = self.peek(sender)
+        with self._lock:
+            if decision is None:
+                self.misses += 1
+                return None
+            self._trusted_lookups += 1
+            if self.verify_every and self._trusted_lookups % self.verify_every == 0:
+                # Fall through to the rules; observe() will compare against this decision
+                self.verifications += 1
+                return None
+            self.hits += 1
+        return decision
+
+    def observe(self, sender: str, category: str, importance: int):
+        """Record the outcome of a full classification for the sender and its domain."""
+        address, domain = sender_keys(sender)
+        if address is None:
+            return
+        now = self.clock()
+        outcome = (category, importance)
+        with self._lock:
+            trusted = self._trusted(address, domain, now)
+            if trusted is not None and trusted != outcome:
+                self.disagreements += 1
+            for key in (address, domain):
+                if key is None:
+                    continue
+                profile = self._profiles.get(key)
+                if profile is None:
+                    profile = self._profiles[key] = _Profile(now)
+                else:
+                    profile.decay(now, self.half_life_seconds)
+                    self._profiles.move_to_end(key)
+                profile.weights[outcome] = profile.weights.get(outcome, 0.0) + 1.0
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+
+    def skip_summary(self, sender: str, categories) -> bool:
+        """Whether the sender is trusted to produce only mail in categories (e.g. spam) not worth a model run."""
+        decision = self.peek(sender)
+        if decision is not None and decision[0] in categories:
+            with self._lock:
+                self.summaries_skipped += 1
+            return True
+        return False
+
+    def snapshot(self) -> Dict:
+        """Hit rates and profile counts for the metrics endpoint."""
+        with self._lock:
+            lookups = self.hits + self.misses + self.verifications
+            now = self.clock()
+            trusted = 0
+            for profile in self._profiles.values():
+                profile.decay(now, self.half_life_seconds)
+                if profile.decision(self.min_weight, self.confidence) is not None:
+                    trusted += 1
+            return {
+                "profiles": len(self._profiles),
+                "trusted_profiles": trusted,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "verifications": self.verifications,
+                "disagreements": self.disagreements,
+                "summaries_skipped": self.summaries_skipped,
+            }
@@ -0,0 +1,44 @@
+"""
+Single-flight de-duplication for async work.
+
+Concurrent callers asking for the same key share one in-progress task instead
+of each starting their own, e.g. several clients opening the same unprocessed
+email while the poll loop is already summarizing it. The task is shielded, so
+a caller that disconnects does not cancel the work for the others.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Registry of in-progress tasks keyed by e.g. email ID."""
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.started = 0
+        self.joined = 0
+
+    async def run(self, key: Hashable, work: Callable[[], Awaitable[Any]]) -> Any:
+        """Await work() for key, or join the call already running for it."""
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(work())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+            self.started += 1
+        else:
+            logger.info(f"Joining in-flight work for {key}")
+            self.joined += 1
+        return await asyncio.shield(task)
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._in_flight
+
+    def snapshot(self) -> Dict[str, int]:
+        """Counters for the metrics endpoint."""
+        return {"in_flight": len(self._in_flight), "started": self.started, "joined": self.joined}
+
@@ -7,6 +7,8 @@ with implementations for both local JSON storage and Firebase Firestore.
 import os
 import json
 import logging
+import tempfile
+import threading
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 from pathlib import Path
@@ -36,6 +38,24 @@ class StorageManager(abc.ABC):
     def summary_exists(self, email_id: str) -> bool:
         """Check if a summary exists for the given email ID."""
         pass
+    
+    def store_summaries(self, summaries: Dict[str, Dict[str, Any]]) -> bool:
+        """Store many summaries at once, keyed by email ID."""
+        results = [self.store_summary(email_id, summary_data) for email_id, summary_data in summaries.items()]
+        return all(results)
+    
+    def existing_ids(self, email_ids: List[str]) -> set:
+        """Return the subset of email_ids that already have a stored summary."""
+        return {email_id for email_id in email_ids if self.summary_exists(email_id)}
+    
+    def get_summaries(self, email_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get the stored summaries for many email IDs; missing ones are left out."""
+        summaries = {}
+        for email_id in email_ids:
+            summary = self.get_summary(email_id)
+            if summary:
+                summaries[email_id] = summary
+        return summaries
 
 
 class JSONStorageManager(StorageManager):
@@ -44,6 +64,7 @@ class JSONStorageManager(StorageManager):
     def __init__(self, file_path: str):
         """Initialize with the path to the JSON storage file."""
         self.file_path = Path(file_path).resolve()
+        self._lock = threading.Lock()
         self._ensure_file_exists()
     
     def _ensure_file_exists(self):
@@ -69,27 +90,35 @@ class JSONStorageManager(StorageManager):
             return {}
     
     def _write_data(self, data: Dict[str, Any]) -> bool:
-        """Write all data to the JSON file."""
+        """Write all data to the JSON file atomically (temp file + rename), so a crash never leaves it half-written."""
+        tmp_path = None
         try:
-            with open(self.file_path, 'w') as f:
+            with tempfile.NamedTemporaryFile('w', dir=self.file_path.parent, prefix=self.file_path.name,
+                                             suffix='.tmp', delete=False) as f:
+                tmp_path = f.name
                 json.dump(data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.file_path)
             return True
         except Exception as e:
             logger.error(f"Error writing to {self.file_path}: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
             return False
     
     def store_summary(self, email_id: str, summary_data: Dict[str, Any]) -> bool:
         """Store a summary for an email ID in the JSON file."""
-        data = self._read_data()
-        
         # Add processing timestamp if not present
         if 'processed_at' not in summary_data:
             summary_data['processed_at'] = datetime.now().isoformat()
         
-        # Store the summary with the email ID as the key
-        data[email_id] = summary_data
-        
-        return self._write_data(data)
+        # Read-modify-write under the lock so concurrent writers don't drop each other's entries
+        with self._lock:
+            data = self._read_data()
+            # Store the summary with the email ID as the key
+            data[email_id] = summary_data
+            return self._write_data(data)
     
     def get_summary(self, email_id: str) -> Optional[Dict[str, Any]]:
         """Get a summary for a specific email ID from the JSON file."""
@@ -126,6 +155,26 @@ class JSONStorageManager(StorageManager):
         """Check if a summary exists for the given email ID in the JSON file."""
         data = self._read_data()
         return email_id in data
+    
+    def store_summaries(self, summaries: Dict[str, Dict[str, Any]]) -> bool:
+        """Store many summaries with a single read and write of the JSON file."""
+        processed_at = datetime.now().isoformat()
+        for summary_data in summaries.values():
+            summary_data.setdefault('processed_at', processed_at)
+        with self._lock:
+            data = self._read_data()
+            data.update(summaries)
+            return self._write_data(data)
+    
+    def existing_ids(self, email_ids: List[str]) -> set:
+        """Return the subset of email_ids already stored, reading the file once."""
+        data = self._read_data()
+        return {email_id for email_id in email_ids if email_id in data}
+    
+    def get_summaries(self, email_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get the stored summaries for many email IDs, reading the file once."""
+        data = self._read_data()
+        return {email_id: data[email_id] for email_id in email_ids if email_id in data}
 
 
 class FirestoreStorageManager(StorageManager):
@@ -157,6 +206,50 @@ class FirestoreStorageManager(StorageManager):
             logger.error(f"Error storing summary in Firestore: {e}")
             return False
     
+    def store_summaries(self, summaries: Dict[str, Dict[str, Any]]) -> bool:
+        """Store many summaries using Firestore batched writes."""
+        try:
+            from firebase_admin import firestore
+            
+            items = list(summaries.items())
+            # Firestore allows at most 500 writes per batch
+            for start in range(0, len(items), 500):
+                batch = self.db.batch()
+                for email_id, summary_data in items[start:start + 500]:
+                    summary_data.setdefault('processed_at', firestore.SERVER_TIMESTAMP)
+                    batch.set(self.collection.document(email_id), summary_data)
+                batch.commit()
+            logger.info(f"Stored {len(items)} summaries in Firestore")
+            return True
+        except Exception as e:
+            logger.error(f"Error storing summaries in Firestore: {e}")
+            return False
+    
+    def existing_ids(self, email_ids: List[str]) -> set:
+        """Return the subset of email_ids already stored, using one batched read."""
+        try:
+            refs = [self.collection.document(email_id) for email_id in email_ids]
+            return {doc.id for doc in self.db.get_all(refs) if doc.exists}
+        except Exception as e:
+            logger.error(f"Error checking existing summaries in Firestore: {e}")
+            return set()
+    
+    def get_summaries(self, email_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get the stored summaries for many email IDs using one batched read."""
+        try:
+            refs = [self.collection.document(email_id) for email_id in email_ids]
+            summaries = {}
+            for doc in self.db.get_all(refs):
+                if doc.exists:
+                    data = doc.to_dict()
+                    data['id'] = doc.id
+                    self._convert_timestamps(data)
+                    summaries[doc.id] = data
+            return summaries
+        except Exception as e:
+            logger.error(f"Error retrieving summaries from Firestore: {e}")
+            return {}
+    
     def get_summary(self, email_id: str) -> Optional[Dict[str, Any]]:
         """Get a summary for a specific email ID from Firestore."""
         try:
@@ -223,13 +316,37 @@ class FirestoreStorageManager(StorageManager):
             return False
 
 
-def get_storage_manager() -> StorageManager:
-    """Factory function to create the appropriate storage manager based on configuration."""
+def build_summary_record(email_id: str, email_data: Dict[str, Any], summary: str,
+                         enriched_email: Dict[str, Any], events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Shape a processed email (summary, classification, event dicts) into the stored record."""
+    return {
+        'id': email_id,
+        'threadId': email_data.get('threadId'),
+        'account_id': email_data.get('account_id'),
+        'subject': email_data.get('subject', ''),
+        'sender': email_data.get('sender', ''),
+        'date': email_data.get('date', datetime.now().isoformat()), # Use fetched date
+        'snippet': email_data.get('snippet', ''),
+        'summary': summary,
+        'category': enriched_email.get('category', 'Uncategorized'),
+        'importance': enriched_email.get('importance', 0),
+        'icon': enriched_email.get('icon', ''),
+        'events': events,
+        'original_link': f"https://mail.google.com/mail/u/0/#inbox/{email_id}",
+    }
+
+
+def get_storage_manager(local_path: Optional[str] = None, collection_name: Optional[str] = None) -> StorageManager:
+    """Factory function to create the appropriate storage manager based on configuration.
+
+    local_path and collection_name override LOCAL_STORAGE_PATH / FIRESTORE_COLLECTION,
+    e.g. to keep thread summaries next to the per-message ones.
+    """
     storage_option = os.getenv("STORAGE_OPTION", "local").lower()
+    storage_path = local_path or os.getenv("LOCAL_STORAGE_PATH", "../email_summaries.json")
     
     if storage_option == "local":
         # Use local JSON storage
-        storage_path = os.getenv("LOCAL_STORAGE_PATH", "../email_summaries.json")
         logger.info(f"Using local JSON storage at: {storage_path}")
         return JSONStorageManager(storage_path)
     
@@ -248,7 +365,7 @@ def get_storage_manager() -> StorageManager:
                 raise
             
             db = firestore.client()
-            collection_name = os.getenv("FIRESTORE_COLLECTION", "email_summaries")
+            collection_name = collection_name or os.getenv("FIRESTORE_COLLECTION", "email_summaries")
             logger.info(f"Using Firestore storage with collection: {collection_name}")
             
             return FirestoreStorageManager(db, collection_name)
@@ -257,11 +374,9 @@ def get_storage_manager() -> StorageManager:
             logger.warning("⚠️ Falling back to local JSON storage due to Firestore initialization error.")
             
             # Fallback to JSON storage
-            storage_path = os.getenv("LOCAL_STORAGE_PATH", "../email_summaries.json")
             return JSONStorageManager(storage_path)
     
     else:
         # Invalid option, use local as default
         logger.warning(f"Unknown storage option '{storage_option}'. Using local JSON storage as fallback.")
-        storage_path = os.getenv("LOCAL_STORAGE_PATH", "../email_summaries.json")
-        return JSONStorageManager(storage_path) 
\ No newline at end of file
+        return JSONStorageManager(storage_path)
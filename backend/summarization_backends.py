@@ -0,0 +1,186 @@
+"""
+Pluggable summarization backends.
+
+Every backend implements `async summarize_batch(emails, chunked=True)`, taking
+(subject, sender, snippet, body) tuples and returning one summary per email.
+Backends register under a name and the one used by the app is picked with
+SUMMARIZER_BACKEND:
+
+    transformers  in-process seq2seq model (SUMMARIZER_MODEL, Pegasus by default)
+    onnx          ONNX export of a seq2seq model run with ONNX Runtime on CPU (needs optimum[onnxruntime])
+    http          local inference server reached over HTTP (SUMMARIZER_HTTP_URL)
+    extractive    TextRank sentence extraction, no model
+"""
+
+import abc
+import asyncio
+import logging
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import aiohttp
+
+from extractive_summarizer import summarize_extractive
+from summarizer import (
+    SUMMARIZER_MODEL,
+    Seq2SeqSummarizer,
+    build_prompt,
+    get_summarizer_executor,
+    initialize_model,
+    load_tokenizer,
+)
+
+logger = logging.getLogger(__name__)
+
+SUMMARIZER_BACKEND = os.getenv("SUMMARIZER_BACKEND", "transformers")
+# Model directory or hub ID for the onnx backend; exported on first load unless already ONNX
+SUMMARIZER_ONNX_MODEL = os.getenv("SUMMARIZER_ONNX_MODEL", SUMMARIZER_MODEL)
+SUMMARIZER_ONNX_EXPORT = os.getenv("SUMMARIZER_ONNX_EXPORT", "true").lower() == "true"
+# Endpoint for the http backend; it receives {"inputs": [prompt, ...], "parameters": {...}}
+SUMMARIZER_HTTP_URL = os.getenv("SUMMARIZER_HTTP_URL", "http://127.0.0.1:8080/summarize")
+SUMMARIZER_HTTP_TIMEOUT = float(os.getenv("SUMMARIZER_HTTP_TIMEOUT", "60"))
+
+EmailFields = Tuple[str, str, str, str]  # (subject, sender, snippet, body)
+
+
+class SummarizationBackend(abc.ABC):
+    """Common interface for everything that turns emails into summaries."""
+
+    name = "base"
+
+    @abc.abstractmethod
+    async def summarize_batch(self, emails: Sequence[EmailFields], chunked: bool = True) -> List[str]:
+        """Summarize a batch of (subject, sender, snippet, body) tuples, in order."""
+        pass
+
+    async def close(self):
+        """Release connections or models held by the backend."""
+        pass
+
+
+BACKENDS: Dict[str, Callable[[], SummarizationBackend]] = {}
+
+def register_backend(name: str):
+    """Class decorator adding a backend to the registry under `name`."""
+    def decorator(backend_class):
+        backend_class.name = name
+        BACKENDS[name] = backend_class
+        return backend_class
+    return decorator
+
+
+class _ModelBackend(SummarizationBackend, abc.ABC):
+    """Runs a Seq2SeqSummarizer on the shared summarizer thread pool, loading it on first use."""
+
+    _summarizer: Optional[Seq2SeqSummarizer] = None
+    _load_lock = threading.Lock()
+
+    @abc.abstractmethod
+    def _load(self) -> Seq2SeqSummarizer:
+        """Build the backend's summarizer; called once, under the load lock."""
+        pass
+
+    @property
+    def summarizer(self) -> Seq2SeqSummarizer:
+        # Loaded on a worker thread; the lock keeps concurrent first calls from loading twice
+        with self._load_lock:
+            if self._summarizer is None:
+                self._summarizer = self._load()
+        return self._summarizer
+
+    async def summarize_batch(self, emails: Sequence[EmailFields], chunked: bool = True) -> List[str]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            get_summarizer_executor(),
+            lambda: self.summarizer.summarize_many(list(emails), chunked)
+        )
+
+
+@register_backend("transformers")
+class TransformersBackend(_ModelBackend):
+    """In-process transformers model; the default model is shared with summarizer.py."""
+
+    def __init__(self, model_name: str = SUMMARIZER_MODEL):
+        self.model_name = model_name
+
+    def _load(self) -> Seq2SeqSummarizer:
+        if self.model_name == SUMMARIZER_MODEL:
+            return initialize_model()
+        from transformers import AutoModelForSeq2SeqLM
+        return Seq2SeqSummarizer(load_tokenizer(self.model_name),
+                                 AutoModelForSeq2SeqLM.from_pretrained(self.model_name))
+
+
+@register_backend("onnx")
+class OnnxBackend(_ModelBackend):
+    """Seq2seq model exported to ONNX and run by ONNX Runtime's CPU provider."""
+
+    def __init__(self, model_path: str = SUMMARIZER_ONNX_MODEL, export: bool = SUMMARIZER_ONNX_EXPORT):
+        self.model_path = model_path
+        self.export = export
+
+    def _load(self) -> Seq2SeqSummarizer:
+        try:
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        except ImportError as e:
+            raise RuntimeError("The onnx summarizer backend needs `pip install optimum[onnxruntime]`") from e
+        logger.info(f"Loading ONNX summarizer from {self.model_path} (export={self.export})")
+        model = ORTModelForSeq2SeqLM.from_pretrained(self.model_path, export=self.export, provider="CPUExecutionProvider")
+        return Seq2SeqSummarizer(load_tokenizer(self.model_path), model)
+
+
+@register_backend("http")
+class HTTPBackend(SummarizationBackend):
+    """Local inference server; one POST per batch.
+
+    Accepts responses shaped as a list of strings, or of objects with
+    "summary_text" or "generated_text" (the Hugging Face conventions).
+    """
+
+    def __init__(self, url: str = SUMMARIZER_HTTP_URL, timeout: float = SUMMARIZER_HTTP_TIMEOUT):
+        self.url = url
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def summarize_batch(self, emails: Sequence[EmailFields], chunked: bool = True) -> List[str]:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=self.timeout)
+        payload = {
+            "inputs": [build_prompt(*email) for email in emails],
+            "parameters": {"truncation": True},
+        }
+        async with self._session.post(self.url, json=payload) as response:
+            response.raise_for_status()
+            results = await response.json()
+        if len(results) != len(emails):
+            raise ValueError(f"Inference server returned {len(results)} summaries for {len(emails)} emails")
+        return [
+            result if isinstance(result, str) else result.get("summary_text") or result.get("generated_text", "")
+            for result in results
+        ]
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+@register_backend("extractive")
+class ExtractiveBackend(SummarizationBackend):
+    """TextRank sentence extraction; fast, no model, useful as a baseline."""
+
+    async def summarize_batch(self, emails: Sequence[EmailFields], chunked: bool = True) -> List[str]:
+        return [summarize_extractive(*email) for email in emails]
+
+
+_backends: Dict[str, SummarizationBackend] = {}
+
+def get_backend(name: Optional[str] = None) -> SummarizationBackend:
+    """Shared backend instance by registry name (default: SUMMARIZER_BACKEND)."""
+    name = name or SUMMARIZER_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown summarizer backend '{name}'; choose from {', '.join(sorted(BACKENDS))}")
+    if name not in _backends:
+        logger.info(f"Using '{name}' summarization backend")
+        _backends[name] = BACKENDS[name]()
+    return _backends[name]
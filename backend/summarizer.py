@@ -7,8 +7,14 @@ parent_dir = os.path.dirname(current_dir)
 libs_path = os.path.join(parent_dir, "libs")
 sys.path.insert(0, libs_path)
 
-from transformers import PegasusForConditionalGeneration, PegasusTokenizer
-import os
+from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from prompt_encoder import PREFIX_SEPARATOR, PromptEncoder, prompt_text
+
+logger = logging.getLogger(__name__)
 
 # Suppress TensorFlow warnings
 os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
@@ -17,34 +23,205 @@ os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
 tokenizer = None
 model = None
 
+# Long-email settings. Bodies that fit in MAX_INPUT_TOKENS are summarized in one
+# pass; longer ones are split into pieces of at most CHUNK_TOKENS that fit in a
+# prompt, summarized in batched generate calls of up to MAX_CHUNKS, and the chunk
+# summaries are then joined into groups that fit in a prompt and summarized
+# again, until one pass can summarize what is left.
+MAX_INPUT_TOKENS = int(os.getenv("SUMMARY_MAX_INPUT_TOKENS", "512"))
+CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "384"))
+MAX_CHUNKS = max(1, int(os.getenv("SUMMARY_MAX_CHUNKS", "6")))
+CHUNK_SUMMARY_MAX_LENGTH = int(os.getenv("SUMMARY_CHUNK_MAX_LENGTH", "96"))
+
+# Shared worker pool for model inference. Every mailbox and request path submits
+# here, so the number of concurrent generate calls stays bounded.
+SUMMARIZER_WORKERS = int(os.getenv("SUMMARIZER_WORKERS", "1"))
+_executor = None
+# Emails per generate call when summarizing in bulk
+SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", "8"))
+
+# Load shedding: callers fall back to an extractive summary while this many
+# requests are waiting on the model, or while work is pending and recent
+# requests took longer than SHED_LATENCY_SECONDS end to end.
+SHED_BACKLOG = int(os.getenv("SUMMARY_SHED_BACKLOG", "4"))
+SHED_LATENCY_SECONDS = float(os.getenv("SUMMARY_SHED_LATENCY_SECONDS", "20"))
+_LATENCY_SMOOTHING = 0.3
+_load = {'pending': 0, 'completed': 0, 'latency_ewma': 0.0}
+
+PROMPT_PREFIX = "Please summarize this email in a casual, friendly way:"
+# Any seq2seq checkpoint works, e.g. a distilled one such as sshleifer/distill-pegasus-xsum-16-4
+SUMMARIZER_MODEL = os.getenv("SUMMARIZER_MODEL", "google/pegasus-xsum")
+prompt_encoder = None
+_default_summarizer = None
+
+def build_prompt(subject, sender, snippet, body):
+    return f"{PROMPT_PREFIX}{PREFIX_SEPARATOR}{prompt_text(subject, sender, snippet, body)}"
+
+def load_tokenizer(model_name):
+    # The Rust-backed tokenizer is much faster, especially on batches; falls back to the slow one
+    return AutoTokenizer.from_pretrained(model_name, use_fast=True)
+
+class Seq2SeqSummarizer:
+    """Prompting, chunking and batched generation around one tokenizer/model pair"""
+
+    def __init__(self, tokenizer, model):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.prompt_encoder = PromptEncoder(tokenizer, PROMPT_PREFIX)
+
+    def generate(self, encoded, max_length=250, min_length=60):
+        """Run one batched beam search over encoded prompts and return the decoded summaries"""
+        tokens = self.tokenizer.pad(
+            {"input_ids": [self.prompt_encoder.truncate(ids, MAX_INPUT_TOKENS) for ids in encoded]},
+            padding="longest", return_tensors="pt"
+        )
+        summary_ids = self.model.generate(
+            tokens["input_ids"],
+            attention_mask=tokens["attention_mask"],
+            max_length=max_length,
+            min_length=min_length,
+            length_penalty=1.5,
+            num_beams=4,
+            repetition_penalty=1.2,
+            temperature=0.7,
+            early_stopping=True
+        )
+        return self.tokenizer.batch_decode(summary_ids, skip_special_tokens=True)
+
+    def chunk_body(self, body, chunk_tokens=CHUNK_TOKENS):
+        """Split body into decoded text chunks of at most chunk_tokens tokens"""
+        body_ids = self.tokenizer(body, add_special_tokens=False)["input_ids"]
+        return [self.tokenizer.decode(body_ids[start:start + chunk_tokens], skip_special_tokens=True)
+                for start in range(0, len(body_ids), chunk_tokens)]
+
+    def summarize_chunks(self, subject, sender, snippet, texts, max_chunks=None):
+        """Summarize each text with the email's prompt, at most max_chunks per generate call"""
+        max_chunks = max_chunks or MAX_CHUNKS
+        summaries = []
+        for start in range(0, len(texts), max_chunks):
+            prompts = self.prompt_encoder.encode_many(
+                [(subject, sender, snippet, text) for text in texts[start:start + max_chunks]]
+            )
+            summaries += self.generate(prompts, max_length=CHUNK_SUMMARY_MAX_LENGTH, min_length=10)
+        return summaries
+
+    def body_budget(self, subject, sender, snippet):
+        """Body tokens that fit in one prompt next to the instruction and this email's headers"""
+        overhead = len(self.prompt_encoder.encode(subject, sender, snippet, ""))
+        return max(CHUNK_SUMMARY_MAX_LENGTH, MAX_INPUT_TOKENS - overhead)
+
+    def group_by_tokens(self, texts, budget):
+        """Join consecutive texts with newlines into groups of at most budget tokens (a text alone may exceed it)"""
+        lengths = [len(ids) for ids in self.tokenizer(texts, add_special_tokens=False)["input_ids"]]
+        groups, current, used = [], [], 0
+        for text, length in zip(texts, lengths):
+            # One token is set aside for each newline between texts
+            if current and used + 1 + length > budget:
+                groups.append("\n".join(current))
+                current, used = [], 0
+            used += length + (1 if current else 0)
+            current.append(text)
+        groups.append("\n".join(current))
+        return groups
+
+    def summarize(self, subject, sender, snippet, body, chunked=True):
+        # Add a prompt to encourage more conversational tone (prefix tokens and this email's tokens are cached)
+        encoded = self.prompt_encoder.encode(subject, sender, snippet, body)
+
+        # Early stop: if the whole prompt fits, the first chunk covers the email
+        if not chunked or not body or len(encoded) <= MAX_INPUT_TOKENS:
+            return self.generate([encoded])[0]
+
+        budget = self.body_budget(subject, sender, snippet)
+        chunks = self.chunk_body(body, min(CHUNK_TOKENS, budget))
+        if len(chunks) == 1:
+            return self.generate(self.prompt_encoder.encode_many([(subject, sender, snippet, chunks[0])]))[0]
+
+        # Map: summarize every chunk of the body in batched calls
+        summaries = self.summarize_chunks(subject, sender, snippet, chunks)
+
+        # Reduce: summarize groups of summaries that fit in a prompt until one group is left
+        groups = self.group_by_tokens(summaries, budget)
+        while len(groups) > 1:
+            if len(groups) == len(summaries):
+                # Every summary fills a prompt on its own; pair them up so the reduction still ends
+                groups = ["\n".join(summaries[start:start + 2]) for start in range(0, len(summaries), 2)]
+            logger.info(f"Reducing {len(summaries)} chunk summaries in {len(groups)} groups")
+            summaries = self.summarize_chunks(subject, sender, snippet, groups)
+            groups = self.group_by_tokens(summaries, budget)
+        return self.generate([self.prompt_encoder.encode(subject, sender, snippet, groups[0])])[0]
+
+    def summarize_many(self, emails, chunked=True, batch_size=None):
+        """Summarize many (subject, sender, snippet, body) tuples, batching the ones that fit in one pass"""
+        batch_size = batch_size or SUMMARY_BATCH_SIZE
+        summaries = [None] * len(emails)
+        short = []
+        # One batched tokenizer call for every prompt
+        for index, (email, encoded) in enumerate(zip(emails, self.prompt_encoder.encode_many(emails))):
+            if not chunked or not email[3] or len(encoded) <= MAX_INPUT_TOKENS:
+                short.append((index, encoded))
+            else:
+                summaries[index] = self.summarize(*email, chunked)
+        for start in range(0, len(short), batch_size):
+            batch = short[start:start + batch_size]
+            for (index, _), summary in zip(batch, self.generate([encoded for _, encoded in batch])):
+                summaries[index] = summary
+        return summaries
+
 def initialize_model():
-    global tokenizer, model
-    if tokenizer is None or model is None:
-        model_name = "google/pegasus-xsum"
-        tokenizer = PegasusTokenizer.from_pretrained(model_name)
-        model = PegasusForConditionalGeneration.from_pretrained(model_name)
-
-def summarize_email(subject, sender, snippet, body):
-    initialize_model()  # Ensure model is initialized
-    
-    # Add a prompt to encourage more conversational tone
-    full_text = f"Please summarize this email in a casual, friendly way:\nSubject: {subject}\nFrom: {sender}\nSnippet: {snippet}\n\n{body}"
-    
-    # Tokenize and generate summary
-    tokens = tokenizer(full_text, truncation=True, padding="longest", return_tensors="pt", max_length=512)
-    summary_ids = model.generate(
-        tokens["input_ids"],
-        max_length=250,
-        min_length=60,
-        length_penalty=1.5,
-        num_beams=4,
-        repetition_penalty=1.2,
-        temperature=0.7,
-        early_stopping=True
-    )
-    
-    summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
-    return summary
+    global tokenizer, model, prompt_encoder, _default_summarizer
+    if _default_summarizer is None:
+        tokenizer = load_tokenizer(SUMMARIZER_MODEL)
+        model = AutoModelForSeq2SeqLM.from_pretrained(SUMMARIZER_MODEL)
+        _default_summarizer = Seq2SeqSummarizer(tokenizer, model)
+        prompt_encoder = _default_summarizer.prompt_encoder
+    return _default_summarizer
+
+def summarize_email(subject, sender, snippet, body, chunked=True):
+    return initialize_model().summarize(subject, sender, snippet, body, chunked)
+
+def summarize_emails(emails, chunked=True, batch_size=None):
+    """Summarize many (subject, sender, snippet, body) tuples with the default model"""
+    return initialize_model().summarize_many(emails, chunked, batch_size)
+
+def get_summarizer_executor():
+    """Get the shared summarizer thread pool, creating it on first use."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=SUMMARIZER_WORKERS, thread_name_prefix="summarizer")
+    return _executor
+
+async def summarize_email_async(subject, sender, snippet, body, chunked=True):
+    """Summarize with the configured backend (SUMMARIZER_BACKEND) without blocking the event loop."""
+    # Import needed here to avoid circular import
+    from summarization_backends import get_backend
+
+    started = time.monotonic()
+    _load['pending'] += 1
+    try:
+        return (await get_backend().summarize_batch([(subject, sender, snippet, body)], chunked))[0]
+    finally:
+        _load['pending'] -= 1
+        _load['completed'] += 1
+        latency = time.monotonic() - started
+        _load['latency_ewma'] += _LATENCY_SMOOTHING * (latency - _load['latency_ewma'])
+
+def inference_load():
+    """Requests waiting on the model and the smoothed end-to-end latency (seconds)"""
+    return {
+        'pending': _load['pending'],
+        'completed': _load['completed'],
+        'latency_ewma': round(_load['latency_ewma'], 2),
+        'shedding': should_shed(),
+        'tokenizer': prompt_encoder.snapshot() if prompt_encoder else None,
+    }
+
+def should_shed():
+    """Whether new requests should get an extractive summary instead of waiting for the model"""
+    if _load['pending'] >= SHED_BACKLOG:
+        return True
+    # Latency only counts while work is queued, so an idle model always recovers
+    return _load['pending'] > 0 and _load['latency_ewma'] > SHED_LATENCY_SECONDS
 
 def format_summary(summary, sender=None, subject=None):
     if sender and subject:
@@ -0,0 +1,25 @@
+"""
+Shared test setup: backend modules are imported top-level, as the apps do,
+and every store they open at import time lives in a throwaway directory.
+"""
+
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+_data_dir = tempfile.mkdtemp(prefix="email-summarizer-tests-")
+for name, filename in {
+    "LOCAL_STORAGE_PATH": "email_summaries.json",
+    "THREAD_STORAGE_PATH": "thread_summaries.json",
+    "EVENTS_DB_PATH": "events.sqlite3",
+    "SEARCH_DB_PATH": "search.sqlite3",
+    "WORK_QUEUE_PATH": "work_queue.sqlite3",
+    "BATCH_CLASSIFIER_MODEL": "classifier_model.npz",
+    "GOOGLE_TOKEN_PATH": "token.json",
+}.items():
+    os.environ.setdefault(name, os.path.join(_data_dir, filename))
+# Apps must not download a model on import; tests stub summarization where they need it
+os.environ.setdefault("SUMMARIZER_BACKEND", "extractive")
@@ -0,0 +1,59 @@
+"""In-memory stand-ins for the Gmail API used by the tests."""
+
+import threading
+from typing import Callable, Dict, List, Optional
+
+
+class FakeRequest:
+    """A googleapiclient request whose execute() returns (or raises) from a callable."""
+
+    def __init__(self, respond: Callable[[], Dict]):
+        self._respond = respond
+
+    def execute(self, *args, **kwargs):
+        return self._respond()
+
+
+class FakeGmailService:
+    """Enough of users().messages() for the metadata fetch paths."""
+
+    def __init__(self, messages: List[Dict]):
+        self.by_id = {message["id"]: message for message in messages}
+        self.calls: List[str] = []
+        self._lock = threading.Lock()
+
+    def users(self):
+        return self
+
+    def _record(self, call: str):
+        with self._lock:
+            self.calls.append(call)
+
+    def list(self, userId: str = "me", labelIds: Optional[List[str]] = None, maxResults: int = 100, q: str = "",
+             pageToken: Optional[str] = None):
+        self._record("messages.list")
+        ids = list(self.by_id)[:maxResults]
+        return FakeRequest(lambda: {"messages": [{"id": message_id} for message_id in ids]})
+
+    def get(self, userId: str = "me", id: str = "", **kwargs):
+        self._record("messages.get")
+        return FakeRequest(lambda: self.by_id[id])
+
+    def messages(self):
+        # users().messages() and messages().list()/get() resolve to this object
+        return self
+
+
+def gmail_message(message_id: str, subject: str, sender: str, snippet: str,
+                  date: str = "Mon, 3 Mar 2025 10:00:00 +0000") -> Dict:
+    """A messages.get response in 'metadata' format."""
+    return {
+        "id": message_id,
+        "threadId": f"thread-{message_id}",
+        "snippet": snippet,
+        "payload": {"headers": [
+            {"name": "Subject", "value": subject},
+            {"name": "From", "value": sender},
+            {"name": "Date", "value": date},
+        ]},
+    }
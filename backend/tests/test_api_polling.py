@@ -0,0 +1,148 @@
+import asyncio
+import threading
+from datetime import date, timedelta
+
+import pytest
+
+from fakes import FakeGmailService, gmail_message
+
+
+class FakeBackend:
+    """Summarization backend that records the subjects of every batch."""
+
+    def __init__(self):
+        self.batches = []
+
+    async def summarize_batch(self, emails, chunked=True):
+        self.batches.append([subject for subject, *_ in emails])
+        return [f"Summary of {subject}" for subject, *_ in emails]
+
+
+@pytest.fixture
+def gmail_service():
+    next_week = (date.today() + timedelta(days=7)).strftime("%B %d, %Y")
+    return FakeGmailService([
+        gmail_message("m1", "URGENT: contract review", "Legal <legal@acme-corp.com>",
+                      f"Team meeting on {next_week} at 10:30 am to sign the contract."),
+        gmail_message("m2", "Weekly newsletter", "News <news@letters.io>", "A few links worth reading."),
+    ])
+
+
+@pytest.fixture
+def backend():
+    return FakeBackend()
+
+
+@pytest.fixture
+def api_app(monkeypatch, tmp_path, gmail_service, backend):
+    import api
+    import gmail_utils
+    from events_store import EventStore
+    from notification_dispatcher import LocalTransport, NotificationDispatcher
+    from poll_scheduler import PollScheduler
+    from reminder_scheduler import ReminderScheduler
+    from search_index import SearchIndex
+    from storage_manager import JSONStorageManager
+
+    # Gmail calls run on worker threads, which get their service through gmail_utils
+    monkeypatch.setattr(gmail_utils, "get_gmail_service", lambda: gmail_service)
+    monkeypatch.setattr(api, "get_backend", lambda: backend)
+    monkeypatch.setattr(api, "storage_manager", JSONStorageManager(str(tmp_path / "email_summaries.json")))
+    monkeypatch.setattr(api, "event_store", EventStore(str(tmp_path / "events.sqlite3")))
+    monkeypatch.setattr(api, "search_index", SearchIndex(str(tmp_path / "search.sqlite3")))
+    monkeypatch.setattr(api, "device_tokens", {"device-1", "device-2"})
+    monkeypatch.setattr(api, "reminder_scheduler", ReminderScheduler())
+    monkeypatch.setattr(api, "notification_dispatcher", NotificationDispatcher(LocalTransport(), coalesce_seconds=0))
+    monkeypatch.setattr(api, "poll_scheduler", PollScheduler(min_interval=30, check_frequency_minutes=15))
+    monkeypatch.setattr(api, "last_polled_ids", set())
+    monkeypatch.setattr(api, "notified_ids", set())
+    return api
+
+
+def test_poll_cycle_processes_emails_and_schedules_reminders(api_app):
+    assert asyncio.run(api_app.process_and_broadcast_email()) == 2
+    asyncio.run(api_app.process_and_notify())
+
+    reminders = api_app.reminder_scheduler.snapshot()
+    assert reminders["pending"] >= 1
+    # Only the urgent email is important enough to notify about, once per device
+    assert api_app.notification_dispatcher.snapshot()["queued"] == 2
+
+
+def test_poll_notifications_go_out_through_the_local_transport(api_app):
+    asyncio.run(api_app.process_and_notify())
+    assert asyncio.run(api_app.notification_dispatcher.flush()) == 2
+
+    transport = api_app.notification_dispatcher.transport
+    assert transport.batches == 1
+    assert {message["device_token"] for message in transport.sent} == {"device-1", "device-2"}
+    assert all(message["data"]["emailId"] == "m1" for message in transport.sent)
+
+
+def test_poll_interval_backs_off_while_idle_and_resets_on_new_mail(api_app, gmail_service):
+    scheduler = api_app.poll_scheduler
+    assert asyncio.run(api_app.poll_cycle()) == scheduler.min_interval
+
+    # The same unread emails again are not new mail
+    idle_interval = asyncio.run(api_app.poll_cycle())
+    assert idle_interval > scheduler.min_interval
+    assert asyncio.run(api_app.poll_cycle()) > idle_interval
+
+    message = gmail_message("m3", "Lunch?", "Friend <friend@gmail.com>", "Are you around on Thursday?")
+    gmail_service.by_id = {"m3": message, **gmail_service.by_id}
+    assert asyncio.run(api_app.poll_cycle()) == scheduler.min_interval
+
+
+def test_read_through_summarizes_only_emails_missing_from_storage(api_app, backend):
+    first = asyncio.run(api_app.get_recent_summaries_read_through(10))
+    second = asyncio.run(api_app.get_recent_summaries_read_through(10))
+
+    assert backend.batches == [["URGENT: contract review", "Weekly newsletter"]]
+    assert [record["id"] for record in second] == [record["id"] for record in first] == ["m1", "m2"]
+    assert second[0]["summary"] == "Summary of URGENT: contract review"
+
+
+def test_polls_reuse_stored_summaries(api_app, backend):
+    asyncio.run(api_app.process_and_broadcast_email())
+    asyncio.run(api_app.process_and_broadcast_email())
+    assert len(backend.batches) == 1
+
+
+def test_email_list_answers_304_when_the_client_copy_is_current(api_app):
+    from fastapi.testclient import TestClient
+
+    client = TestClient(api_app.app)
+    response = client.get("/emails")
+    assert response.status_code == 200
+    assert [email["id"] for email in response.json()] == ["m1", "m2"]
+
+    cached = client.get("/emails", headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+    assert client.get("/emails", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_gmail_calls_run_off_the_event_loop_thread(api_app, gmail_service, monkeypatch):
+    import gmail_utils
+
+    threads = []
+
+    def get_gmail_service():
+        threads.append(threading.current_thread())
+        return gmail_service
+
+    monkeypatch.setattr(gmail_utils, "get_gmail_service", get_gmail_service)
+    asyncio.run(api_app.process_and_broadcast_email())
+    asyncio.run(api_app.process_and_notify())
+    assert threads and threading.main_thread() not in threads
+
+
+def test_repeated_checks_notify_only_about_unseen_emails(api_app, gmail_service):
+    asyncio.run(api_app.process_and_notify())
+    asyncio.run(api_app.process_and_notify())
+    assert api_app.notification_dispatcher.snapshot()["queued"] == 2
+
+    message = gmail_message("m3", "URGENT: server down", "Ops <ops@acme-corp.com>", "Production is down, please respond.")
+    gmail_service.by_id = {"m3": message, **gmail_service.by_id}
+    asyncio.run(api_app.process_and_notify())
+    assert api_app.notification_dispatcher.snapshot()["queued"] == 4
+    assert api_app.notified_ids == {"m1", "m2", "m3"}
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+import backfill
+from backfill import Backfill, BackfillCheckpoint
+from gmail_utils import list_message_ids_page
+
+PAGES = {None: (["bf-a", "bf-b"], "page-2"), "page-2": (["bf-c"], None)}
+
+
+class FakeClientPool:
+    def __init__(self, unavailable=()):
+        self.unavailable = set(unavailable)
+        self.fetched = []
+
+    async def run(self, func, *args):
+        assert func is list_message_ids_page
+        return PAGES[args[0]]
+
+    async def fetch_full_emails(self, message_ids, concurrency):
+        self.fetched.extend(message_ids)
+        return {
+            message_id: None if message_id in self.unavailable else {
+                "id": message_id, "threadId": message_id, "subject": f"Subject {message_id}",
+                "sender": "someone@example.com", "snippet": "Hello", "body": "Hello there", "date": "",
+            }
+            for message_id in message_ids
+        }
+
+
+@pytest.fixture
+def make_backfill(monkeypatch, tmp_path):
+    class FakeAccount:
+        account_id = "default"
+        client_pool = None
+
+    class FakeIngestor:
+        def get_account(self, account_id):
+            return FakeAccount()
+
+    monkeypatch.setattr(backfill, "MailboxIngestor", FakeIngestor)
+
+    def make(pool):
+        FakeAccount.client_pool = pool
+        checkpoint = BackfillCheckpoint.load(tmp_path / "backfill_default.json", "default")
+        return Backfill("default", checkpoint)
+    return make
+
+
+async def run_pipeline(job: Backfill):
+    """The backfill stages, with summarization replaced by a stub (no model processes)."""
+    listed, fetched, summarized = asyncio.Queue(), asyncio.Queue(), asyncio.Queue()
+
+    async def summarize():
+        while (page := await fetched.get()) is not None:
+            page['summaries'] = [f"Summary of {email['id']}" for email in page['emails']]
+            await summarized.put(page)
+        await summarized.put(None)
+
+    await asyncio.gather(job._list_pages(listed), job._fetch(listed, fetched), summarize(), job._store(summarized))
+
+
+def test_failed_fetches_are_retried_on_resume(make_backfill):
+    first = make_backfill(FakeClientPool(unavailable={"bf-b"}))
+    asyncio.run(run_pipeline(first))
+    assert first.checkpoint.complete
+    assert first.checkpoint.failed_ids == ["bf-b"]
+    assert (first.checkpoint.stored, first.checkpoint.failed) == (2, 1)
+
+    pool = FakeClientPool()
+    resumed = make_backfill(pool)
+    assert resumed.checkpoint.failed_ids == ["bf-b"]
+    asyncio.run(run_pipeline(resumed))
+    # Only the failed message is fetched again; the finished listing is not repeated
+    assert pool.fetched == ["bf-b"]
+    assert resumed.checkpoint.failed_ids == []
+    assert (resumed.checkpoint.stored, resumed.checkpoint.failed) == (3, 0)
+    assert resumed.storage.existing_ids(["bf-a", "bf-b", "bf-c"]) == {"bf-a", "bf-b", "bf-c"}
@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+import batch_classifier
+import email_classifier
+from batch_classifier import BatchClassifier, bootstrap_labels, email_features, model_input
+from email_classifier import EmailClassifier
+
+EMAILS = [
+    {"subject": "Win prize now", "body": "Click here to claim your free gift", "from": "promo@deals.example.com"},
+    {"subject": "Limited time offer", "body": "Buy now, loan approved", "from": "offers@deals.example.com"},
+    {"subject": "Team meeting", "body": "Let's have a meeting tomorrow at 10:30 am in room 4",
+     "from": "alice@work.example.com"},
+    {"subject": "Standup call", "body": "Zoom meeting on Monday at 9:00 am", "from": "bob@work.example.com"},
+    {"subject": "Report deadline", "body": "The report is due by Friday, deadline is firm",
+     "from": "carol@work.example.com"},
+    {"subject": "Urgent: invoice", "body": "Payment due, action required asap", "from": "billing@vendor.example.com"},
+    {"subject": "Lunch", "body": "Sandwiches in the kitchen", "from": "dave@work.example.com"},
+    {"subject": "Photos", "body": "Pictures from the weekend", "from": "erin@home.example.com"},
+]
+
+
+@pytest.fixture
+def trained():
+    """A small model trained on the rule labels and saved where EmailClassifier looks for it."""
+    labels = bootstrap_labels(EMAILS)
+    BatchClassifier.train([model_input(email) for email in EMAILS], labels, n_features=2 ** 10).save()
+    yield labels
+    os.remove(batch_classifier.BATCH_CLASSIFIER_MODEL)
+
+
+@pytest.fixture
+def classifier(trained, monkeypatch):
+    monkeypatch.setattr(email_classifier, "BATCH_CLASSIFIER_MIN_BATCH", 1)
+    return EmailClassifier(profiles=None)
+
+
+def test_sender_tokens_are_features():
+    features = email_features("Hello", "Body", "Deals <Promo@Deals.example.com>")
+    assert "f:promo" in features and "f@deals.example.com" in features
+    assert not any(feature.startswith("f") for feature in email_features("Hello", "Body"))
+
+
+def test_a_saved_model_loads_and_reproduces_the_rule_labels(trained):
+    assert batch_classifier.model_available()
+    model = BatchClassifier.load()
+    assert model.weights.shape[0] == 2 ** 10
+
+    labels, _ = model.predict([model_input(email) for email in EMAILS])
+    assert labels == trained
+    assert len({label[0] for label in trained}) == 5
+
+
+def test_confident_predictions_come_from_the_model(classifier, trained):
+    assert classifier.classify_batch(EMAILS) == trained
+    assert classifier.batch_stats["model"] == len(EMAILS)
+    assert classifier.batch_stats["rules"] == 0
+
+
+def test_unsure_predictions_fall_back_to_the_rules(classifier, trained, monkeypatch):
+    monkeypatch.setattr(email_classifier, "BATCH_CLASSIFIER_MIN_CONFIDENCE", 1.01)
+    assert classifier.classify_batch(EMAILS) == trained
+    assert classifier.batch_stats["model"] == 0
+    assert classifier.batch_stats["rules"] == len(EMAILS)
@@ -0,0 +1,35 @@
+from email_classifier import EmailClassifier
+from sender_profiles import SenderProfiles
+
+NEWSLETTER = {"subject": "Weekly newsletter", "sender": "News <news@letters.io>",
+              "body": "Here are this week's top stories and a few links worth reading."}
+
+
+def test_provisional_passes_are_not_recorded_in_sender_profiles():
+    profiles = SenderProfiles(min_weight=3, verify_every=0)
+    classifier = EmailClassifier(profiles=profiles)
+
+    for _ in range(5):
+        classifier.enrich_emails_with_classification([NEWSLETTER], observe=False)
+    assert profiles.peek(NEWSLETTER["sender"]) is None
+    assert profiles.snapshot()["profiles"] == 0
+
+    for _ in range(4):
+        classifier.classify_email(NEWSLETTER)
+    assert profiles.peek(NEWSLETTER["sender"]) == classifier.classify_with_rules(NEWSLETTER)
+    # Once trusted, provisional passes read the profile without counting as lookups
+    hits = profiles.hits
+    classifier.classify_batch([NEWSLETTER], observe=False)
+    assert profiles.hits == hits
+
+
+def test_domain_profiles_only_decide_low_importance_mail_for_new_addresses():
+    profiles = SenderProfiles(min_weight=3, verify_every=0, clock=lambda: 0.0)
+    for _ in range(3):
+        profiles.observe("news@bulk.example.com", "regular", 1)
+        profiles.observe("alice@corp.example.com", "meeting", 3)
+
+    assert profiles.peek("digest@bulk.example.com") == ("regular", 1)
+    # A first email from someone else at the domain still goes through the rules
+    assert profiles.peek("bob@corp.example.com") is None
+    assert profiles.peek("alice@corp.example.com") == ("meeting", 3)
@@ -0,0 +1,79 @@
+import datetime
+
+import pytest
+from fastapi import Request, Response
+
+from events_store import EventStore, parse_range
+from http_caching import make_etag, not_modified
+
+TODAY = datetime.date(2025, 3, 3)
+
+
+def record(email_id, *formatted_dates, subject="Plans"):
+    return {"id": email_id, "subject": subject, "sender": "a@example.com", "events": [
+        {"event_type": "meeting", "description": f"Event {n}", "date_str": formatted_date,
+         "formatted_date": formatted_date, "confidence": 0.9}
+        for n, formatted_date in enumerate(formatted_dates)
+    ]}
+
+
+def request_with(**headers) -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/events",
+                    "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]})
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EventStore(str(tmp_path / "events.sqlite3"))
+
+
+def test_indexing_an_email_again_replaces_its_events(store):
+    store.index_records([record("e1", "2025-03-03 10:00", "2025-03-04 09:00"), record("e2", "2025-03-05 12:00")])
+    store.index_records([record("e1", "2025-03-06 15:00", subject="Moved")])
+
+    events = store.query_range(TODAY, TODAY + datetime.timedelta(days=7), TODAY)
+    assert [(event["email_id"], event["formatted_date"]) for event in events] == [
+        ("e2", "2025-03-05 12:00"), ("e1", "2025-03-06 15:00"),
+    ]
+    assert events[1]["subject"] == "Moved"
+
+
+def test_range_bounds_are_inclusive_whole_days(store):
+    store.index_records([record("e1", "2025-03-02 23:59", "2025-03-03 00:00", "2025-03-04 23:59", "2025-03-05 00:00")])
+
+    events = store.query_range(TODAY, datetime.date(2025, 3, 4), TODAY)
+    assert [event["formatted_date"] for event in events] == ["2025-03-03 00:00", "2025-03-04 23:59"]
+    assert [(event["is_today"], event["is_tomorrow"], event["days_until"]) for event in events] == [
+        (True, False, 0), (False, True, 1),
+    ]
+    assert events[0]["date"] == "2025-03-03T00:00"
+
+
+def test_unchanged_events_answer_304_until_midnight(store):
+    store.index_records([record("e1", "2025-03-03 10:00")])
+    etag_source, last_modified = store.validators(TODAY, TODAY, TODAY)
+    etag = make_etag(etag_source)
+
+    assert not_modified(request_with(if_none_match=etag), Response(), etag, last_modified).status_code == 304
+    assert not_modified(request_with(if_none_match='"other"'), Response(), etag, last_modified) is None
+
+    # Relative fields (is_today, days_until) change at midnight, and so do the validators
+    tomorrow = TODAY + datetime.timedelta(days=1)
+    next_source, next_modified = store.validators(TODAY, TODAY, tomorrow)
+    assert make_etag(next_source) != etag
+    assert next_modified >= datetime.datetime.combine(tomorrow, datetime.time()).astimezone()
+
+
+def test_writes_change_the_etag(store):
+    store.index_records([record("e1", "2025-03-03 10:00")])
+    before, _ = store.validators(TODAY, TODAY, TODAY)
+    store.index_records([record("e1", "2025-03-03 11:00")])
+    after, _ = store.validators(TODAY, TODAY, TODAY)
+    assert make_etag(after) != make_etag(before)
+
+
+def test_parse_range():
+    assert parse_range(None, None, 7, TODAY) == (TODAY, datetime.date(2025, 3, 10))
+    assert parse_range("2025-03-05", None, 0, TODAY) == (datetime.date(2025, 3, 5), datetime.date(2025, 3, 5))
+    with pytest.raises(ValueError):
+        parse_range("2025-03-05", "2025-03-04", 7, TODAY)
@@ -0,0 +1,79 @@
+import asyncio
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from google.oauth2.credentials import Credentials
+
+import auth
+import gmail_client_pool
+from gmail_client_pool import GmailClientPool
+
+
+class FakeGmailHandler(BaseHTTPRequestHandler):
+    """messages.get in 'full' format for any ID, slow enough for fetches to overlap."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        message_id = self.path.split("?")[0].rstrip("/").rsplit("/", 1)[-1]
+        time.sleep(0.05)
+        body = base64.urlsafe_b64encode(f"Body of {message_id}".encode()).decode()
+        payload = json.dumps({
+            "id": message_id, "threadId": f"thread-{message_id}", "snippet": "Body",
+            "payload": {"mimeType": "text/plain", "headers": [{"name": "Subject", "value": f"Subject {message_id}"}],
+                        "body": {"data": body}},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def gmail_server(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGmailHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    document = auth.discovery_document()
+    root_url = f"http://127.0.0.1:{server.server_address[1]}/"
+    # Pooled services are built through auth as usual, just pointed at the fake server
+    monkeypatch.setattr(auth, "discovery_document", lambda: {**document, "rootUrl": root_url})
+    yield server
+    server.shutdown()
+
+
+def test_concurrent_fetches_never_share_a_service(gmail_server, monkeypatch):
+    in_use, used, lock = set(), set(), threading.Lock()
+    fetch = gmail_client_pool.get_full_email_content
+
+    def tracked_fetch(message_id, service=None):
+        with lock:
+            assert id(service) not in in_use, "a service was used by two threads at once"
+            in_use.add(id(service))
+            used.add(id(service))
+        try:
+            return fetch(message_id, service=service)
+        finally:
+            with lock:
+                in_use.discard(id(service))
+
+    monkeypatch.setattr(gmail_client_pool, "get_full_email_content", tracked_fetch)
+    pool = GmailClientPool(Credentials(token="test-token"), size=4)
+    try:
+        message_ids = [f"msg-{n}" for n in range(16)]
+        results = asyncio.run(pool.fetch_full_emails(message_ids, concurrency=8))
+    finally:
+        pool.close()
+
+    assert {message_id: email["body"] for message_id, email in results.items()} == {
+        message_id: f"Body of {message_id}" for message_id in message_ids
+    }
+    # Every worker thread got its own service, and no more were built than the pool allows
+    assert len(used) == 4
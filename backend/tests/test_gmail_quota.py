@@ -0,0 +1,143 @@
+import json
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+import gmail_quota
+from gmail_quota import METHOD_COSTS, QuotaTokenBucket, execute_with_retry
+
+
+def http_error(status: int, reason: str = "") -> HttpError:
+    content = {"error": {"code": status, "message": reason or "error",
+                         "errors": [{"reason": reason, "message": reason}] if reason else []}}
+    return HttpError(httplib2.Response({"status": status}), json.dumps(content).encode("utf-8"))
+
+
+class ThrottlingRequest:
+    """Raises the queued errors one execute() at a time, then succeeds."""
+
+    def __init__(self, *errors: HttpError):
+        self.errors = list(errors)
+        self.executions = 0
+
+    def execute(self):
+        self.executions += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return {"ok": True}
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Records sleeps; they advance a fake clock, so refills never depend on real timing."""
+    clock = [0.0]
+    delays = []
+
+    def sleep(seconds):
+        delays.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr(gmail_quota.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(gmail_quota.time, "sleep", sleep)
+    return delays
+
+
+@pytest.fixture
+def bucket(sleeps):
+    # Fast enough that acquire() never has to wait on the refill
+    return QuotaTokenBucket(rate=1_000_000, capacity=1_000_000)
+
+
+def test_throttled_requests_are_retried_with_growing_backoff(bucket, sleeps, monkeypatch):
+    monkeypatch.setattr(gmail_quota.random, "uniform", lambda low, high: high)
+    request = ThrottlingRequest(http_error(429), http_error(403, "rateLimitExceeded"), http_error(503))
+
+    assert execute_with_retry(request, "messages.list", bucket) == {"ok": True}
+    assert request.executions == 4
+    base = gmail_quota.BACKOFF_BASE_SECONDS
+    assert sleeps == [base, base * 2, base * 4]
+
+
+def test_non_rate_limit_errors_are_not_retried(bucket, sleeps):
+    request = ThrottlingRequest(http_error(403, "insufficientPermissions"))
+    with pytest.raises(HttpError):
+        execute_with_retry(request, "messages.get.full", bucket)
+    assert request.executions == 1
+    assert sleeps == []
+    assert bucket.stats["messages.get.full"]["failures"] == 1
+
+
+def test_retries_give_up_after_max_retries(bucket, sleeps):
+    request = ThrottlingRequest(*(http_error(429) for _ in range(5)))
+    with pytest.raises(HttpError):
+        execute_with_retry(request, "history.list", bucket, max_retries=2)
+    assert request.executions == 3
+    assert bucket.stats["history.list"] == {
+        "calls": 1, "units": 3 * METHOD_COSTS["history.list"], "retries": 2, "failures": 1,
+    }
+
+
+def test_throttling_halves_the_rate_and_successes_recover_it(sleeps):
+    bucket = QuotaTokenBucket(rate=1000, capacity=1_000_000, min_rate=100)
+    bucket.on_throttle()
+    bucket.on_throttle()
+    assert bucket.rate == 250
+    for _ in range(4):
+        bucket.on_throttle()
+    assert bucket.rate == 100  # Never below the floor
+
+    for _ in range(10):
+        bucket.on_success()
+    assert bucket.rate == pytest.approx(600)  # +5% of the ceiling per success
+    for _ in range(20):
+        bucket.on_success()
+    assert bucket.rate == 1000  # Never above the ceiling
+
+
+def test_rate_decreases_while_throttled_and_recovers_after(bucket, sleeps):
+    request = ThrottlingRequest(http_error(429), http_error(429))
+    execute_with_retry(request, "messages.list", bucket)
+    # Two halvings, then one additive step back up on the final success
+    assert bucket.rate == pytest.approx(bucket.max_rate / 4 + bucket.max_rate * 0.05)
+
+
+def test_quota_units_are_charged_per_method(bucket, sleeps):
+    execute_with_retry(ThrottlingRequest(), "users.watch", bucket)
+    execute_with_retry(ThrottlingRequest(http_error(429)), "messages.get.metadata", bucket)
+    execute_with_retry(ThrottlingRequest(), "messages.get.metadata", bucket)
+    execute_with_retry(ThrottlingRequest(), "not.a.known.method", bucket)
+
+    methods = bucket.snapshot()["methods"]
+    assert methods["users.watch"] == {"calls": 1, "units": METHOD_COSTS["users.watch"], "retries": 0, "failures": 0}
+    # The throttled attempt is charged too: 3 sends of 5 units over 2 calls
+    assert methods["messages.get.metadata"] == {
+        "calls": 2, "units": 3 * METHOD_COSTS["messages.get.metadata"], "retries": 1, "failures": 0,
+    }
+    assert methods["not.a.known.method"]["units"] == gmail_quota.DEFAULT_METHOD_COST
+
+
+def test_acquire_waits_for_the_refill(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(gmail_quota.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(gmail_quota.time, "sleep", lambda seconds: clock.__setitem__(0, clock[0] + seconds))
+    bucket = QuotaTokenBucket(rate=10, capacity=10)
+    bucket.acquire(10)
+    bucket.acquire(5)
+    assert clock[0] == pytest.approx(0.5)
+
+
+def test_pools_share_their_account_bucket(tmp_path, monkeypatch):
+    import gmail_client_pool
+    from gmail_client_pool import GmailClientPool
+    from gmail_quota import bucket_for, default_bucket
+
+    class Factory:
+        credentials = None
+
+    monkeypatch.setattr(gmail_client_pool, "get_service_factory", lambda token_path=None: Factory())
+    token_path = str(tmp_path / "other_token.json")
+
+    assert GmailClientPool.for_token(None).quota_bucket is default_bucket
+    assert GmailClientPool.for_token(token_path).quota_bucket is bucket_for(token_path)
+    assert bucket_for(token_path) is not default_bucket
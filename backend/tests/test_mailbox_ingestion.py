@@ -0,0 +1,18 @@
+import mailbox_ingestion
+from mailbox_ingestion import MailboxAccount
+
+
+def test_ids_over_max_results_are_fetched_on_later_cycles(monkeypatch):
+    listings = [([f"m{n}" for n in range(5)], "h2"), (["m5"], "h3"), ([], "h3")]
+    monkeypatch.setattr(mailbox_ingestion, "list_new_message_ids", lambda history_id, service: listings.pop(0))
+    monkeypatch.setattr(mailbox_ingestion, "fetch_emails_metadata",
+                        lambda message_ids, service: [{"id": message_id} for message_id in message_ids])
+
+    account = MailboxAccount("work")
+    account.history_id = "h1"
+    fetched = [[email["id"] for email in account.fetch_new_metadata(max_results=2, service=object())]
+               for _ in range(3)]
+
+    assert fetched == [["m0", "m1"], ["m2", "m3"], ["m4", "m5"]]
+    assert account.history_id == "h3"
+    assert account.pending_ids == []
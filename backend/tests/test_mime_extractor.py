@@ -0,0 +1,78 @@
+import base64
+
+from mime_extractor import decode_base64url_capped, extract_body, html_to_text, strip_quoted_text
+
+
+def b64url(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def part(mime_type: str, text: str = None, parts=None):
+    return {"mimeType": mime_type, "body": {"data": b64url(text)} if text is not None else {}, "parts": parts or []}
+
+
+def test_decoding_stops_at_the_byte_cap():
+    text = "abcdefgh" * 5000  # 40000 bytes, spread over several decode steps
+    assert decode_base64url_capped(b64url(text), max_bytes=10_000) == text[:10_000]
+    assert decode_base64url_capped(b64url(text), max_bytes=100_000) == text
+
+
+def test_a_multibyte_character_cut_by_the_cap_is_dropped():
+    assert decode_base64url_capped(b64url("abé"), max_bytes=3) == "ab"
+    assert decode_base64url_capped(b64url("abé"), max_bytes=4) == "abé"
+
+
+def test_html_only_bodies_are_converted_to_text():
+    html = ("<html><head><title>Ignored</title><style>p {color: red}</style></head>"
+            "<body><p>Hello &amp; welcome</p><div>Second   line</div><script>alert(1)</script></body></html>")
+    payload = part("multipart/mixed", parts=[part("text/html", html)])
+    assert extract_body(payload) == "Hello & welcome\nSecond line"
+    assert html_to_text("<p>a</p><br><p>b</p>") == "a\nb"
+
+
+def test_plain_text_is_preferred_in_multipart_alternative():
+    payload = part("multipart/alternative", parts=[
+        part("text/html", "<p>HTML version</p>"),
+        part("text/plain", "Plain version"),
+    ])
+    assert extract_body(payload) == "Plain version"
+
+
+def test_nested_multiparts_are_walked_in_document_order():
+    payload = part("multipart/mixed", parts=[
+        part("multipart/related", parts=[
+            part("multipart/alternative", parts=[
+                part("text/html", "<p>Nested HTML</p>"),
+                part("text/plain", "Nested plain"),
+            ]),
+        ]),
+        part("application/pdf"),
+        part("text/plain", "Attached notes"),
+    ])
+    assert extract_body(payload) == "Nested plain"
+
+
+def test_quoted_replies_and_signatures_are_stripped():
+    text = "\n".join([
+        "Sounds good, see you then.",
+        "> inline quote",
+        "Thanks!",
+        "",
+        "On Mon, Mar 3, 2025 at 10:00 AM Alice <alice@example.com> wrote:",
+        "> Can we meet on Thursday?",
+    ])
+    assert strip_quoted_text(text) == "Sounds good, see you then.\nThanks!"
+    assert strip_quoted_text("Done.\n-- \nBob\nAcme Corp") == "Done."
+    assert strip_quoted_text("Done.\n\nSent from my iPhone") == "Done."
+    assert strip_quoted_text("Hi\n-----Original Message-----\nFrom: x") == "Hi"
+
+
+def test_a_message_that_is_only_a_quote_is_kept_whole():
+    text = "---------- Forwarded message ---------\nFrom: Alice\nSubject: Plans"
+    assert strip_quoted_text(text) == text
+
+
+def test_extract_body_can_keep_quotes():
+    payload = part("text/plain", "Reply\n> quoted")
+    assert extract_body(payload) == "Reply"
+    assert extract_body(payload, strip_quotes=False) == "Reply\n> quoted"
@@ -0,0 +1,36 @@
+import asyncio
+
+from notification_dispatcher import KIND_EMAIL, KIND_EVENT, LocalTransport, NotificationDispatcher
+
+
+def test_burst_is_sent_as_one_coalesced_batch():
+    async def scenario():
+        transport = LocalTransport()
+        dispatcher = NotificationDispatcher(transport, coalesce_seconds=0.05)
+        runner = asyncio.create_task(dispatcher.run())
+        for n in range(5):
+            dispatcher.enqueue_many(["device-1", "device-2"], KIND_EMAIL, f"Email {n}", "From someone",
+                                    {"emailId": f"m{n}"})
+        dispatcher.enqueue("device-1", KIND_EVENT, "Standup", "Meeting at 10:00")
+        await asyncio.sleep(0.2)
+        runner.cancel()
+        return transport, dispatcher
+
+    transport, dispatcher = asyncio.run(scenario())
+    assert transport.batches == 1
+    messages = {(message["device_token"], message["data"]["type"]): message for message in transport.sent}
+    assert len(messages) == 3
+    assert messages[("device-1", KIND_EMAIL)]["title"] == "5 new important emails"
+    assert messages[("device-1", KIND_EMAIL)]["data"]["count"] == 5
+    assert messages[("device-1", KIND_EVENT)]["title"] == "Standup"
+    assert dispatcher.snapshot()["queued"] == 0
+    assert dispatcher.sent == 3
+
+
+def test_flush_splits_into_transport_batches():
+    transport = LocalTransport()
+    dispatcher = NotificationDispatcher(transport, batch_size=2)
+    for device in range(5):
+        dispatcher.enqueue(f"device-{device}", KIND_EMAIL, "Email", "From someone")
+    assert asyncio.run(dispatcher.flush()) == 5
+    assert transport.batches == 3
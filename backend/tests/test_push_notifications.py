@@ -0,0 +1,91 @@
+import asyncio
+import base64
+import json
+
+import pytest
+
+from push_notifications import PushNotificationHandler, make_push_envelope, parse_push_envelope
+
+
+def envelope_with_data(data: str):
+    return {"message": {"data": data, "messageId": "m-1"}, "subscription": "projects/local/subscriptions/test"}
+
+
+@pytest.fixture
+def handler():
+    accounts = {"me@example.com": "default"}
+    return PushNotificationHandler(lambda email_address: accounts.get(email_address.lower()))
+
+
+def test_envelope_parsing():
+    assert parse_push_envelope(make_push_envelope("me@example.com", 42, "m-1")) == ("m-1", "me@example.com", 42)
+
+
+@pytest.mark.parametrize("data", [
+    "%%% not base64 %%%",
+    base64.b64encode(b"not json").decode("ascii"),
+    base64.b64encode(json.dumps({"historyId": 42}).encode("utf-8")).decode("ascii"),
+    base64.b64encode(json.dumps({"emailAddress": "me@example.com", "historyId": "x"}).encode("utf-8")).decode("ascii"),
+])
+def test_malformed_envelopes_are_rejected(handler, data):
+    assert parse_push_envelope(envelope_with_data(data)) is None
+    assert handler.handle(envelope_with_data(data)) == "invalid"
+    assert handler.snapshot()["received"] == 0
+
+
+def test_unknown_mailboxes_are_not_queued(handler):
+    assert handler.handle(make_push_envelope("someone@else.com", 42)) == "unknown_mailbox"
+    assert handler.snapshot()["pending_syncs"] == 0
+
+
+def test_redelivered_messages_are_ignored(handler):
+    assert handler.handle(make_push_envelope("me@example.com", 42, "m-1")) == "queued"
+    assert handler.handle(make_push_envelope("me@example.com", 43, "m-1")) == "duplicate"
+    assert handler.snapshot()["duplicates"] == 1
+
+
+def test_stale_history_ids_are_ignored(handler):
+    assert handler.handle(make_push_envelope("me@example.com", 42)) == "queued"
+    assert handler.handle(make_push_envelope("me@example.com", 42)) == "duplicate"
+    assert handler.handle(make_push_envelope("me@example.com", 41)) == "duplicate"
+    assert handler.handle(make_push_envelope("me@example.com", 43)) == "queued"
+    assert handler.snapshot()["duplicates"] == 2
+
+
+def test_a_burst_of_pushes_collapses_into_one_sync(handler):
+    synced = []
+
+    async def sync_account(account_id):
+        synced.append(account_id)
+
+    async def scenario():
+        statuses = [handler.handle(make_push_envelope("me@example.com", history_id)) for history_id in range(1, 11)]
+        assert statuses == ["queued"] * 10
+        assert handler.snapshot()["pending_syncs"] == 1
+        worker = asyncio.create_task(handler.run_sync_worker(sync_account))
+        await asyncio.sleep(0.01)
+        # A push arriving after the sync started queues one follow-up sync
+        handler.handle(make_push_envelope("me@example.com", 11))
+        await asyncio.sleep(0.01)
+        worker.cancel()
+
+    asyncio.run(scenario())
+    assert synced == ["default", "default"]
+    assert handler.snapshot()["pending_syncs"] == 0
+
+
+def test_push_endpoint_acknowledges_and_relaxes_polling(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import main
+    from poll_scheduler import PollScheduler
+
+    monkeypatch.setattr(main, "push_handler", PushNotificationHandler(lambda email_address: "default"))
+    monkeypatch.setattr(main, "poll_scheduler", PollScheduler(min_interval=30, check_frequency_minutes=15))
+    client = TestClient(main.app)
+
+    assert client.post("/gmail/push", json=envelope_with_data("%%%")).json() == {"status": "invalid"}
+    assert not main.poll_scheduler.push_active()
+    assert client.post("/gmail/push", json=make_push_envelope("me@example.com", 42)).json() == {"status": "queued"}
+    assert main.poll_scheduler.push_active()
+    assert main.poll_scheduler.next_interval == main.poll_scheduler.max_interval
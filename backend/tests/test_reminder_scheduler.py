@@ -0,0 +1,101 @@
+import datetime
+
+import pytest
+
+from reminder_scheduler import ReminderScheduler
+
+
+class Clock:
+    def __init__(self, now: datetime.datetime):
+        self.now = now
+
+    def __call__(self) -> datetime.datetime:
+        return self.now
+
+    def set(self, hour: int, minute: int = 0):
+        self.now = self.now.replace(hour=hour, minute=minute)
+
+
+def event(hour: int, minute: int = 0, description: str = "Meeting"):
+    return {"formatted_date": f"2025-03-03 {hour:02d}:{minute:02d}", "description": description, "event_type": "meeting"}
+
+
+@pytest.fixture
+def clock():
+    return Clock(datetime.datetime(2025, 3, 3, 9, 0))
+
+
+@pytest.fixture
+def scheduler(clock):
+    return ReminderScheduler(lead_minutes=30, clock=clock)
+
+
+def fired(reminders):
+    return [(reminder.email_id, reminder.event_at.hour) for reminder in reminders]
+
+
+def test_reminders_fire_in_order_of_their_reminder_time(scheduler, clock):
+    assert scheduler.schedule("e1", [event(12), event(10)]) == 2
+    assert scheduler.schedule("e2", [event(11)]) == 1
+    assert scheduler.schedule("e3", [event(8), {"description": "undated"}]) == 0  # Past and undated events are skipped
+
+    assert scheduler.seconds_until_next() == 30 * 60
+    assert scheduler.pop_due() == []
+    clock.set(11, 30)
+    assert fired(scheduler.pop_due()) == [("e1", 10), ("e2", 11), ("e1", 12)]
+    assert scheduler.snapshot()["pending"] == 0
+
+
+def test_rescheduling_an_unchanged_email_keeps_the_heap(scheduler):
+    scheduler.schedule("e1", [event(12)])
+    heap = list(scheduler._heap)
+    assert scheduler.schedule("e1", [event(12)]) == 1
+    assert scheduler._heap == heap
+    assert scheduler.snapshot()["scheduled"] == 1
+
+
+def test_rescheduled_reminders_are_replaced_and_skipped_lazily(scheduler, clock):
+    scheduler.schedule("e1", [event(12)])
+    scheduler.schedule("e1", [event(14)])
+    # The superseded entry stays in the heap but is skipped when it surfaces
+    assert len(scheduler._heap) == 2
+    assert scheduler.seconds_until_next() == 4.5 * 3600
+    assert len(scheduler._heap) == 1
+
+    clock.set(12)
+    assert scheduler.pop_due() == []
+    clock.set(13, 30)
+    assert fired(scheduler.pop_due()) == [("e1", 14)]
+
+
+def test_cancelled_entries_at_the_top_are_dropped_by_pop_due(scheduler, clock):
+    scheduler.schedule("e1", [event(10)])
+    scheduler.cancel("e1")
+    clock.set(10)
+    assert scheduler.pop_due() == []
+    assert scheduler.seconds_until_next() is None
+
+
+def test_fired_reminders_do_not_fire_again_when_the_email_is_seen_again(scheduler, clock):
+    scheduler.schedule("e1", [event(10), event(12)])
+    clock.set(9, 45)
+    assert fired(scheduler.pop_due()) == [("e1", 10)]
+
+    # The next poll serializes the same events again
+    assert scheduler.schedule("e1", [event(10), event(12)]) == 1
+    assert scheduler.pop_due() == []
+    clock.set(11, 30)
+    assert fired(scheduler.pop_due()) == [("e1", 12)]
+    assert scheduler.snapshot()["fired"] == 2
+
+
+def test_a_longer_lead_fires_reminders_that_become_due(scheduler, clock):
+    scheduler.schedule("e1", [event(12)])
+    scheduler.schedule("e2", [event(15)])
+    clock.set(11)
+    assert scheduler.pop_due() == []
+
+    scheduler.set_lead(90)
+    assert fired(scheduler.pop_due()) == [("e1", 12)]
+    assert scheduler.seconds_until_next() == 2.5 * 3600
+    assert scheduler.snapshot()["lead_minutes"] == 90
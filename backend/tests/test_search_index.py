@@ -0,0 +1,74 @@
+import pytest
+
+import search_index
+from search_index import SearchIndex, build_match_query
+
+
+def record(email_id, subject, summary="", sender="a@example.com", events=()):
+    return {"id": email_id, "subject": subject, "sender": sender, "summary": summary, "category": "Work",
+            "importance": 2, "processed_at": "2025-03-03T10:00:00",
+            "events": [{"description": description} for description in events]}
+
+
+@pytest.fixture
+def index(tmp_path):
+    return SearchIndex(str(tmp_path / "search.sqlite3"))
+
+
+def ids(page):
+    return [result["id"] for result in page["results"]]
+
+
+def test_terms_match_as_prefixes(index):
+    index.index_records([
+        record("e1", "Team meeting moved", "The weekly sync is now on Thursday"),
+        record("e2", "Invoice", "Payment due", events=["Meetup downtown"]),
+        record("e3", "Lunch", "Sandwiches"),
+    ])
+    assert sorted(ids(index.search("meet"))) == ["e1", "e2"]
+    assert ids(index.search("meet thurs")) == ["e1"]
+    # Subject matches outrank matches in other fields
+    assert ids(index.search("meet"))[0] == "e1"
+
+
+def test_operators_and_quotes_in_queries_stay_literal(index):
+    assert build_match_query('subject:budget OR "draft') == '"subject"* "budget"* "or"* "draft"*'
+    assert build_match_query('NEAR(a b) -x *') == '"near"* "a"* "b"* "x"*'
+    assert build_match_query('*** ""') == ""
+
+    index.index_records([record("e1", "Budget draft", "Subject of the draft or not")])
+    assert ids(index.search('subject:budget OR "draft')) == ["e1"]
+    assert index.search('NEAR(budget') == {"total": 0, "truncated": False, "results": []}
+    assert index.search('***') == {"total": 0, "truncated": False, "results": []}
+
+
+def test_reindexing_an_email_replaces_its_terms(index):
+    index.index_records([record("e1", "Quarterly report")])
+    index.index_records([record("e1", "Holiday schedule")])
+
+    assert index.search("quarterly")["total"] == 0
+    assert ids(index.search("holiday")) == ["e1"]
+    assert index.count() == 1
+
+
+def test_pages_are_offsets_into_the_ranking(index):
+    index.index_records([record(f"e{n}", f"Report {n}") for n in range(5)])
+    everything = ids(index.search("report", limit=5))
+    assert len(everything) == 5
+    assert ids(index.search("report", limit=2, offset=0)) == everything[:2]
+    assert ids(index.search("report", limit=2, offset=2)) == everything[2:4]
+    assert ids(index.search("report", limit=2, offset=4)) == everything[4:]
+    assert index.search("report", limit=2, offset=6)["results"] == []
+
+
+def test_broad_queries_rank_only_the_newest_candidates(index, monkeypatch):
+    monkeypatch.setattr(search_index, "SEARCH_RANK_CANDIDATES", 3)
+    index.index_records([record(f"e{n}", f"Report {n}") for n in range(5)])
+
+    page = index.search("report", limit=10)
+    assert page["truncated"] is True
+    assert page["total"] == 3
+    assert sorted(ids(page)) == ["e2", "e3", "e4"]
+
+    narrow = index.search("report 1")
+    assert narrow["truncated"] is False and ids(narrow) == ["e1"]
@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def main_app(monkeypatch):
+    import main
+
+    summarized = []
+
+    async def summarize_email_async(subject, sender, snippet, body):
+        summarized.append(subject)
+        await asyncio.sleep(0.05)
+        return f"Summary of {subject}"
+
+    def get_full_email_content(email_id, service=None):
+        return {"id": email_id, "threadId": email_id, "subject": f"Subject {email_id}", "sender": "a@example.com",
+                "snippet": "Hello", "body": "Hello there", "date": "", "is_full": True}
+
+    monkeypatch.setattr(main, "summarize_email_async", summarize_email_async)
+    monkeypatch.setattr(main, "get_full_email_content", get_full_email_content)
+    monkeypatch.setattr(main.ingestor, "pool_for", lambda account_id: None)
+    main.summarized = summarized
+    return main
+
+
+def test_concurrent_requests_for_one_email_summarize_it_once(main_app):
+    email_id = "single-flight-1"
+
+    async def scenario():
+        email = main_app.get_full_email_content(email_id)
+        return await asyncio.gather(
+            *(main_app.get_email_details(email_id) for _ in range(10)),
+            *(main_app.process_and_store_email(dict(email)) for _ in range(10)),
+        )
+
+    results = asyncio.run(scenario())
+    assert main_app.summarized == [f"Subject {email_id}"]
+    assert {result["summary"] for result in results} == {f"Summary of Subject {email_id}"}
+    assert main_app.email_flights.snapshot()["in_flight"] == 0
@@ -0,0 +1,94 @@
+import pytest
+
+import summarizer
+from prompt_encoder import PromptEncoder
+from summarizer import Seq2SeqSummarizer, build_prompt
+
+
+class WordTokenizer:
+    """One token per whitespace-separated word."""
+
+    eos_token_id = None
+
+    def __init__(self):
+        self.vocab = {}
+        self.words = []
+
+    def _ids(self, text):
+        ids = []
+        for word in text.split():
+            if word not in self.vocab:
+                self.vocab[word] = len(self.words)
+                self.words.append(word)
+            ids.append(self.vocab[word])
+        return ids
+
+    def __call__(self, text, add_special_tokens=False):
+        if isinstance(text, list):
+            return {"input_ids": [self._ids(item) for item in text]}
+        return {"input_ids": self._ids(text)}
+
+    def decode(self, ids, skip_special_tokens=True):
+        return " ".join(self.words[token] for token in ids)
+
+
+class CharTokenizer:
+    """One token per character, so separators count."""
+
+    eos_token_id = 0
+
+    def __call__(self, text, add_special_tokens=False):
+        if isinstance(text, list):
+            return {"input_ids": [[ord(char) for char in item] for item in text]}
+        return {"input_ids": [ord(char) for char in text]}
+
+
+class RecordingSummarizer(Seq2SeqSummarizer):
+    """Summarizes a prompt as its first chunk name plus two filler words, recording every prompt."""
+
+    def __init__(self):
+        super().__init__(WordTokenizer(), model=None)
+        self.calls = []
+
+    def generate(self, encoded, max_length=250, min_length=60):
+        self.calls.append([len(ids) for ids in encoded])
+        return [next(word for word in self.tokenizer.decode(ids).split() if word.startswith("chunk")) + " gist gist"
+                for ids in encoded]
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = RecordingSummarizer()
+    # The instruction and headers take 15 tokens, leaving 9 for the body
+    assert len(model.prompt_encoder.encode("Subject", "a@example.com", "snippet", "")) == 15
+    monkeypatch.setattr(summarizer, "MAX_INPUT_TOKENS", 24)
+    monkeypatch.setattr(summarizer, "CHUNK_SUMMARY_MAX_LENGTH", 4)
+    monkeypatch.setattr(summarizer, "CHUNK_TOKENS", 4)
+    monkeypatch.setattr(summarizer, "MAX_CHUNKS", 3)
+    return model
+
+
+def test_groups_are_built_by_token_length(model):
+    # 3-token summaries plus a newline each: two fit in 9 tokens, three do not
+    texts = [f"chunk{n} gist gist" for n in range(5)]
+    assert model.group_by_tokens(texts, 9) == [
+        "chunk0 gist gist\nchunk1 gist gist", "chunk2 gist gist\nchunk3 gist gist", "chunk4 gist gist",
+    ]
+
+
+def test_long_body_is_reduced_hierarchically_within_the_input_limit(model):
+    # 10 chunks of 4 words; each chunk's first word names the chunk
+    body = " ".join(f"chunk{n} filler filler filler" for n in range(10))
+    summary = model.summarize("Subject", "a@example.com", "snippet", body)
+
+    assert summary == "chunk0 gist gist"
+    # Map: 10 chunks in calls of 3; reduce: 10 -> 5 -> 3 -> 2 summaries, then the final pass
+    assert [len(call) for call in model.calls] == [3, 3, 3, 1, 3, 2, 3, 2, 1]
+    # No prompt is ever truncated
+    assert max(length for call in model.calls for length in call) <= summarizer.MAX_INPUT_TOKENS
+
+
+def test_encoded_prompts_match_the_text_prompt():
+    encoder = PromptEncoder(CharTokenizer(), summarizer.PROMPT_PREFIX)
+    fields = ("Plans", "a@example.com", "Lunch?", "Lunch on Friday?")
+    assert encoder.encode(*fields) == CharTokenizer()(build_prompt(*fields))["input_ids"] + [0]
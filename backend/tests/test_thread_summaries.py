@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+import thread_summaries
+from storage_manager import JSONStorageManager
+from thread_summaries import ThreadSummarizer, thread_update_text
+
+
+def message(message_id, date, sender="alice@example.com", snippet="", summary="", subject="Re: Plans"):
+    return {"id": message_id, "threadId": "t1", "subject": subject, "sender": sender, "date": date,
+            "snippet": snippet, "summary": summary, "importance": 1}
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    async def summarize_email_async(subject, sender, snippet, body):
+        calls.append(body)
+        await asyncio.sleep(0)
+        return f"Summary {len(calls)}"
+
+    monkeypatch.setattr(thread_summaries, "summarize_email_async", summarize_email_async)
+    monkeypatch.setattr(thread_summaries, "should_shed", lambda: False)
+    return calls
+
+
+@pytest.fixture
+def threads(tmp_path):
+    return ThreadSummarizer(JSONStorageManager(str(tmp_path / "thread_summaries.json")))
+
+
+def test_the_first_message_reuses_its_summary(threads, calls):
+    thread = asyncio.run(threads.update(message("m1", "2025-03-03T10:00:00+00:00", summary="Lunch on Friday?",
+                                                subject="Plans")))
+    assert calls == []
+    assert thread["summary"] == "Lunch on Friday?"
+    assert thread["subject"] == "Plans"
+    assert thread["message_ids"] == ["m1"]
+
+
+def test_a_reply_feeds_only_its_new_text(threads, calls, monkeypatch):
+    monkeypatch.setattr(thread_summaries, "THREAD_MAX_REPLY_CHARS", 20)
+    asyncio.run(threads.update(message("m1", "2025-03-03T10:00:00+00:00", summary="Lunch on Friday?")))
+    body = "Friday works for me, see you at noon.\n\nOn Mon, Alice wrote:\n> Lunch on Friday?"
+    thread = asyncio.run(threads.update(message("m2", "2025-03-03T11:00:00+00:00", sender="bob@example.com"), body))
+
+    assert calls == [thread_update_text("Lunch on Friday?", "bob@example.com", "Friday works for me,")]
+    assert thread["summary"] == "Summary 1"
+    assert thread["participants"] == ["alice@example.com", "bob@example.com"]
+    assert threads.snapshot()["avg_reply_chars"] == 20
+
+
+def test_an_already_folded_message_is_not_applied_again(threads, calls):
+    asyncio.run(threads.update(message("m1", "2025-03-03T10:00:00+00:00", summary="Lunch?")))
+    asyncio.run(threads.update(message("m2", "2025-03-03T11:00:00+00:00", snippet="Yes")))
+    thread = asyncio.run(threads.update(message("m2", "2025-03-03T11:00:00+00:00", snippet="Yes")))
+
+    assert len(calls) == 1
+    assert thread["message_ids"] == ["m1", "m2"]
+    assert thread["message_count"] == 2
+
+
+def test_the_thread_keeps_its_latest_date_when_older_messages_arrive_last(threads, calls):
+    # Backfill lists newest first
+    asyncio.run(threads.update(message("m2", "2025-03-03T11:00:00+00:00", sender="bob@example.com",
+                                       snippet="See you", summary="Bob confirms")))
+    thread = asyncio.run(threads.update(message("m1", "Mon, 3 Mar 2025 10:00:00 +0000", snippet="Lunch?")))
+
+    assert thread["date"] == "2025-03-03T11:00:00+00:00"
+    assert thread["last_message_id"] == "m2"
+    assert thread["last_sender"] == "bob@example.com"
+    assert thread["snippet"] == "See you"
+    assert thread["message_ids"] == ["m2", "m1"]
@@ -0,0 +1,33 @@
+import time
+
+import work_queue
+from work_queue import STATE_FAILED, STATE_QUEUED, STATE_STORED, WorkQueue
+
+
+def finish(queue, email_id, state, age):
+    queue.enqueue({"id": email_id})
+    queue._execute("UPDATE jobs SET state = ?, updated_at = ? WHERE email_id = ?",
+                   (state, time.time() - age, email_id))
+
+
+def test_prune_deletes_only_old_finished_jobs(tmp_path):
+    queue = WorkQueue(str(tmp_path / "work_queue.sqlite3"))
+    finish(queue, "old-stored", STATE_STORED, age=7200)
+    finish(queue, "old-failed", STATE_FAILED, age=7200)
+    finish(queue, "new-stored", STATE_STORED, age=10)
+    finish(queue, "old-queued", STATE_QUEUED, age=7200)
+
+    assert queue.prune(retention=3600) == 2
+    assert queue.counts() == {STATE_STORED: 1, STATE_QUEUED: 1}
+    # A pruned email can be queued again; the handler skips it if it is already stored
+    assert queue.enqueue({"id": "old-stored"})
+
+
+def test_recover_prunes_finished_jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(work_queue, "WORK_QUEUE_RETENTION_SECONDS", 3600)
+    queue = WorkQueue(str(tmp_path / "work_queue.sqlite3"))
+    finish(queue, "old-stored", STATE_STORED, age=7200)
+    finish(queue, "interrupted", work_queue.STATE_SUMMARIZING, age=60)
+
+    assert queue.recover() == 1
+    assert queue.counts() == {STATE_QUEUED: 1}
@@ -0,0 +1,156 @@
+"""
+Incremental per-thread summaries.
+
+Each Gmail thread gets one summary record, stored next to the per-message
+summaries (its own JSON file or Firestore collection). A thread's first
+message reuses that message's summary. Every later reply updates the thread
+summary from the previous thread summary plus only the reply's non-quoted
+text, so the model never re-reads the conversation history and each reply
+costs roughly one message's worth of tokens.
+"""
+
+import asyncio
+import logging
+import os
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from dateutil import parser as date_parser
+
+from extractive_summarizer import summarize_extractive
+from mime_extractor import strip_quoted_text
+from storage_manager import StorageManager, get_storage_manager
+from summarizer import should_shed, summarize_email_async
+
+logger = logging.getLogger(__name__)
+
+# Where thread summaries are kept, next to LOCAL_STORAGE_PATH / FIRESTORE_COLLECTION
+THREAD_STORAGE_PATH = os.getenv("THREAD_STORAGE_PATH", "../thread_summaries.json")
+THREAD_FIRESTORE_COLLECTION = os.getenv("THREAD_FIRESTORE_COLLECTION", "thread_summaries")
+# Characters of a reply's new text fed into a thread update
+THREAD_MAX_REPLY_CHARS = int(os.getenv("THREAD_MAX_REPLY_CHARS", "4000"))
+
+_REPLY_PREFIX = re.compile(r'^\s*((re|fwd?|aw|sv)\s*(\[\d+\])?\s*:\s*)+', re.IGNORECASE)
+
+
+def thread_subject(subject: str) -> str:
+    """Subject without Re:/Fwd: prefixes."""
+    return _REPLY_PREFIX.sub('', subject or '').strip() or subject or ''
+
+
+def is_newer(date: str, than: Optional[str]) -> bool:
+    """Whether message date `date` is at least as recent as `than` (a missing or unreadable `than` is older)."""
+    if not than:
+        return True
+    try:
+        # Naive dates (fallbacks set to datetime.now()) are local time
+        return date_parser.parse(date).astimezone() >= date_parser.parse(than).astimezone()
+    except (ValueError, TypeError, OverflowError):
+        return date >= than
+
+
+def thread_update_text(previous_summary: str, sender: str, reply_text: str) -> str:
+    """Model input for a thread update: the summary so far plus the new reply."""
+    return f"Conversation so far: {previous_summary}\n\nNew reply from {sender}:\n{reply_text}"
+
+
+class ThreadSummarizer:
+    """Keeps one incrementally updated summary per thread ID."""
+
+    def __init__(self, storage: Optional[StorageManager] = None):
+        self.storage = storage or get_storage_manager(THREAD_STORAGE_PATH, THREAD_FIRESTORE_COLLECTION)
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}  # Callers holding or waiting for each thread's lock
+        self.updates = 0
+        self.reply_chars = 0
+
+    async def _summarize(self, subject: str, sender: str, body: str) -> Tuple[str, str]:
+        # Same shedding rule as message summaries; extractive thread summaries stay as they are
+        if should_shed():
+            return summarize_extractive(subject, sender, '', body), 'extractive'
+        return await summarize_email_async(subject, sender, '', body), 'abstractive'
+
+    async def update(self, record: Dict[str, Any], body: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Fold a stored message record (and its body, if fetched) into its thread's summary.
+
+        Returns the updated thread record, or None if the message has no thread ID.
+        Replies to one thread are applied one at a time; a message already in the
+        thread is not applied twice.
+        """
+        thread_id = record.get('threadId')
+        if not thread_id:
+            return None
+        lock = self._locks.setdefault(thread_id, asyncio.Lock())
+        self._users[thread_id] = self._users.get(thread_id, 0) + 1
+        try:
+            async with lock:
+                return await self._update(thread_id, record, body)
+        finally:
+            self._users[thread_id] -= 1
+            if not self._users[thread_id]:
+                del self._users[thread_id], self._locks[thread_id]
+
+    async def _update(self, thread_id: str, record: Dict[str, Any], body: Optional[str]) -> Dict[str, Any]:
+        thread = await asyncio.to_thread(self.storage.get_summary, thread_id)
+        if thread and record['id'] in thread.get('message_ids', []):
+            return thread
+
+        if not thread:
+            summary, summary_kind = record.get('summary', ''), record.get('summary_kind', 'abstractive')
+            thread = {
+                'id': thread_id,
+                'threadId': thread_id,
+                'account_id': record.get('account_id'),
+                'subject': thread_subject(record.get('subject', '')),
+                'participants': [],
+                'message_ids': [],
+                'importance': 0,
+                'events': [],
+                'original_link': f"https://mail.google.com/mail/u/0/#inbox/{thread_id}",
+            }
+        else:
+            # Only the reply's own text: quoted history is already in the thread summary
+            reply_text = strip_quoted_text(body or record.get('snippet', ''))[:THREAD_MAX_REPLY_CHARS]
+            summary, summary_kind = await self._summarize(
+                thread['subject'], record.get('sender', ''),
+                thread_update_text(thread.get('summary', ''), record.get('sender', ''), reply_text)
+            )
+            self.updates += 1
+            self.reply_chars += len(reply_text)
+
+        sender = record.get('sender', '')
+        date = record.get('date') or datetime.now().isoformat()
+        if is_newer(date, thread.get('date')):
+            # Messages can arrive oldest-last (e.g. backfill runs newest-first); the card shows the latest one
+            thread.update({'last_message_id': record['id'], 'last_sender': sender, 'date': date,
+                           'snippet': record.get('snippet', '')})
+        thread.update({
+            'summary': summary,
+            'summary_kind': summary_kind,
+            'message_ids': thread['message_ids'] + [record['id']],
+            'message_count': len(thread['message_ids']) + 1,
+            'participants': thread['participants'] + ([sender] if sender and sender not in thread['participants'] else []),
+            'category': record.get('category', thread.get('category', 'Uncategorized')),
+            'icon': record.get('icon', thread.get('icon', '')),
+            'importance': max(thread.get('importance', 0), record.get('importance', 0)),
+            'events': thread['events'] + (record.get('events') or []),
+            'processed_at': datetime.now().isoformat(),
+        })
+        await asyncio.to_thread(self.storage.store_summary, thread_id, thread)
+        return thread
+
+    def get_thread(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        return self.storage.get_summary(thread_id)
+
+    def recent_threads(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recently active threads, one card per conversation."""
+        return self.storage.get_recent_summaries(limit)
+
+    def snapshot(self) -> Dict:
+        """Update counters for the metrics endpoint."""
+        return {
+            "updates": self.updates,
+            "avg_reply_chars": round(self.reply_chars / self.updates) if self.updates else 0,
+            "in_progress": len(self._locks),
+        }
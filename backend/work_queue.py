@@ -0,0 +1,222 @@
+"""
+Durable work queue for email processing.
+
+Every email picked up by ingestion is recorded in a local SQLite database
+before any work starts, and moves through the states
+
+    queued -> fetching -> summarizing -> stored    (or failed)
+
+so that a restart can put interrupted jobs back in the queue and a drain
+loop can finish them at a controlled rate. Handlers must be idempotent;
+process_and_store_email is, since it checks storage first. Stored and failed
+jobs are deleted after WORK_QUEUE_RETENTION_SECONDS, on recovery and
+periodically from the drain loop, so the table only holds recent work.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STATE_QUEUED = "queued"
+STATE_FETCHING = "fetching"
+STATE_SUMMARIZING = "summarizing"
+STATE_STORED = "stored"
+STATE_FAILED = "failed"
+IN_FLIGHT_STATES = (STATE_FETCHING, STATE_SUMMARIZING)
+FINISHED_STATES = (STATE_STORED, STATE_FAILED)
+
+# Relative paths are resolved against the backend directory
+WORK_QUEUE_PATH = os.getenv("WORK_QUEUE_PATH", "../work_queue.sqlite3")
+# Jobs processed concurrently by the drain loop
+WORK_QUEUE_WORKERS = int(os.getenv("WORK_QUEUE_WORKERS", "2"))
+# Upper bound on jobs started per second by the drain loop
+WORK_QUEUE_RATE = float(os.getenv("WORK_QUEUE_RATE", "2"))
+# Attempts before a job is left in the failed state
+WORK_QUEUE_MAX_ATTEMPTS = int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", "5"))
+# Idle wait between drain passes when the queue is empty
+WORK_QUEUE_IDLE_SECONDS = float(os.getenv("WORK_QUEUE_IDLE_SECONDS", "5"))
+# Delay before retrying a failed job, doubled per attempt
+WORK_QUEUE_RETRY_SECONDS = float(os.getenv("WORK_QUEUE_RETRY_SECONDS", "30"))
+# Stored and failed jobs are deleted once they have been finished this long
+WORK_QUEUE_RETENTION_SECONDS = float(os.getenv("WORK_QUEUE_RETENTION_SECONDS", "86400"))
+# How often the drain loop deletes finished jobs
+WORK_QUEUE_PRUNE_SECONDS = float(os.getenv("WORK_QUEUE_PRUNE_SECONDS", "3600"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    email_id TEXT PRIMARY KEY,
+    account_id TEXT,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    available_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state_available ON jobs (state, available_at);
+"""
+
+
+class WorkQueue:
+    """SQLite-backed job table keyed by email ID."""
+
+    def __init__(self, path: str = WORK_QUEUE_PATH):
+        db_path = Path(path)
+        if not db_path.is_absolute():
+            db_path = (Path(__file__).resolve().parent / db_path).resolve()
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        # WAL keeps readers unblocked and makes each commit durable without rewriting the file
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        logger.info(f"Work queue ready at {db_path}")
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def enqueue(self, email_metadata: Dict[str, Any]) -> bool:
+        """Record an email as queued; returns False if it is already known (idempotent)."""
+        now = time.time()
+        cursor = self._execute(
+            "INSERT OR IGNORE INTO jobs (email_id, account_id, payload, state, available_at, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (email_metadata['id'], email_metadata.get('account_id'), json.dumps(email_metadata),
+             STATE_QUEUED, now, now, now),
+        )
+        return cursor.rowcount == 1
+
+    def claim(self, email_id: str) -> bool:
+        """Take ownership of a queued job; False if it is missing, in flight or finished."""
+        cursor = self._execute(
+            "UPDATE jobs SET state = ?, attempts = attempts + 1, updated_at = ? WHERE email_id = ? AND state = ?",
+            (STATE_FETCHING, time.time(), email_id, STATE_QUEUED),
+        )
+        return cursor.rowcount == 1
+
+    def claim_next(self, limit: int) -> List[Dict[str, Any]]:
+        """Claim up to `limit` due jobs, oldest first, and return their email metadata."""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT email_id, payload FROM jobs WHERE state = ? AND available_at <= ? "
+                "ORDER BY created_at LIMIT ?",
+                (STATE_QUEUED, now, limit),
+            ).fetchall()
+            claimed = []
+            for email_id, payload in rows:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET state = ?, attempts = attempts + 1, updated_at = ? WHERE email_id = ? AND state = ?",
+                    (STATE_FETCHING, now, email_id, STATE_QUEUED),
+                )
+                if cursor.rowcount == 1:
+                    claimed.append(json.loads(payload))
+        return claimed
+
+    def set_state(self, email_id: str, state: str):
+        """Advance an in-flight job (no-op for emails that are not in flight)."""
+        self._execute(
+            f"UPDATE jobs SET state = ?, updated_at = ? WHERE email_id = ? AND state IN ({','.join('?' * len(IN_FLIGHT_STATES))})",
+            (state, time.time(), email_id, *IN_FLIGHT_STATES),
+        )
+
+    def complete(self, email_id: str):
+        """Mark an in-flight job as stored."""
+        self.set_state(email_id, STATE_STORED)
+
+    def fail(self, email_id: str, error: str = ""):
+        """Requeue with exponential delay, or mark failed once attempts run out."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT attempts FROM jobs WHERE email_id = ?", (email_id,)).fetchone()
+            if row is None:
+                return
+            attempts = row[0]
+            if attempts >= WORK_QUEUE_MAX_ATTEMPTS:
+                state, available_at = STATE_FAILED, now
+            else:
+                state, available_at = STATE_QUEUED, now + WORK_QUEUE_RETRY_SECONDS * (2 ** max(0, attempts - 1))
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, last_error = ?, available_at = ?, updated_at = ? WHERE email_id = ?",
+                (state, error[:500], available_at, now, email_id),
+            )
+
+    def recover(self) -> int:
+        """Put jobs interrupted by a crash or restart back in the queue; returns how many."""
+        cursor = self._execute(
+            f"UPDATE jobs SET state = ?, updated_at = ? WHERE state IN ({','.join('?' * len(IN_FLIGHT_STATES))})",
+            (STATE_QUEUED, time.time(), *IN_FLIGHT_STATES),
+        )
+        if cursor.rowcount:
+            logger.info(f"Requeued {cursor.rowcount} interrupted jobs.")
+        self.prune()
+        return cursor.rowcount
+
+    def prune(self, retention: Optional[float] = None) -> int:
+        """Delete jobs that were stored or failed more than `retention` seconds ago; returns how many."""
+        retention = WORK_QUEUE_RETENTION_SECONDS if retention is None else retention
+        # Safe for late re-enqueues: the handler finds the email in storage and skips the work
+        cursor = self._execute(
+            f"DELETE FROM jobs WHERE state IN ({','.join('?' * len(FINISHED_STATES))}) AND updated_at < ?",
+            (*FINISHED_STATES, time.time() - retention),
+        )
+        if cursor.rowcount:
+            logger.info(f"Pruned {cursor.rowcount} finished jobs.")
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per state."""
+        rows = self._execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return {state: count for state, count in rows}
+
+
+async def drain(queue: WorkQueue, handler: Callable[[Dict], Awaitable[Optional[Dict]]],
+                on_results: Optional[Callable[[List[Dict]], Awaitable[None]]] = None,
+                workers: int = WORK_QUEUE_WORKERS, rate: float = WORK_QUEUE_RATE):
+    """Process queued jobs forever with `workers` in flight, starting at most `rate` jobs per second."""
+    limit = asyncio.Semaphore(workers)
+    spacing = 1.0 / rate if rate > 0 else 0.0
+    pruned_at = time.monotonic()
+
+    async def run(email_metadata: Dict) -> Optional[Dict]:
+        async with limit:
+            email_id = email_metadata['id']
+            try:
+                result = await handler(email_metadata)
+            except Exception as e:
+                queue.fail(email_id, str(e))
+                return None
+            if result:
+                queue.complete(email_id)
+            else:
+                queue.fail(email_id, "handler returned no result")
+            return result
+
+    while True:
+        if time.monotonic() - pruned_at >= WORK_QUEUE_PRUNE_SECONDS:
+            queue.prune()
+            pruned_at = time.monotonic()
+        jobs = queue.claim_next(workers)
+        if not jobs:
+            await asyncio.sleep(WORK_QUEUE_IDLE_SECONDS)
+            continue
+        tasks = []
+        for email_metadata in jobs:
+            tasks.append(asyncio.create_task(run(email_metadata)))
+            if spacing:
+                await asyncio.sleep(spacing)
+        results = [result for result in await asyncio.gather(*tasks) if result]
+        if results and on_results:
+            await on_results(results)
@@ -156,9 +156,25 @@ function Settings() {
     setSnackbar({ open: true, message: 'Category removed', severity: 'info' });
   };
 
-  const handleSaveSettings = () => {
-    // In a real app, this would save to backend
-    setSnackbar({ open: true, message: 'Settings saved successfully', severity: 'success' });
+  const handleSaveSettings = async () => {
+    // Only the settings the backend acts on are sent; the rest stay client-side for now
+    try {
+      const response = await fetch('/api/settings', {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          checkFrequency: settings.email.checkFrequency,
+          reminderTime: settings.notifications.reminderTime,
+        }),
+      });
+      if (!response.ok) {
+        throw new Error('Failed to save settings');
+      }
+      setSnackbar({ open: true, message: 'Settings saved successfully', severity: 'success' });
+    } catch (error) {
+      console.error('Error saving settings:', error);
+      setSnackbar({ open: true, message: 'Failed to save settings', severity: 'error' });
+    }
   };
 
   const handleCloseSnackbar = () => {